@@ -41,7 +41,7 @@ bl_info = {
     "description": "Import of .xyz and .pdb files",
     "author": "Florian Altvater",
     "version": (0,1),
-    "blender": (2,6),
+    "blender": (2,70),
     "location": "File -> Import -> XYZ/PDB (.xyz, .pdb)",
     "warning": "",
     "wiki_url": "",
@@ -59,6 +59,8 @@ else:
     from . import import_molecule
     from . import export_molecule
     print("Imported multifiles")
+from .core import profile
+from .core.background import Cancelled, Task
 
 import bpy
 from bpy.types import Operator
@@ -74,9 +76,127 @@ from bpy.props import (StringProperty,
 
 
 
+# -----------------------------------------------------------------------------
+#                                                                        Import
+
+def frame_selection(settings):
+    '''
+    The frames of an import: the frame numbers of select_frames (empty for
+    all frames) and the indices of the frames that are used (None for all
+    frames).
+    '''
+    # check if select_frames is ok, otherwise stop right here
+    error_msg = ''
+    frame_list = []
+    if settings.use_select_frames:
+        try:
+            for item in settings.select_frames.split(','):
+                if '-' in item:
+                    start, end = map(int, item.split('-'))
+                    frame_list.extend(range(start, end+1))
+                elif '+' in item:
+                    frame_list.extend(map(int, item.split('+')))
+                else:
+                    frame_list.append(int(item))
+        except (ValueError, TypeError):
+            error_msg = 'Format error in the frame list. Using first frame only.'
+            frame_list.append(1)
+        if not frame_list:
+            error_msg = 'Frame list was empty. Using first frame only.'
+            frame_list.append(1)
+    if error_msg: print(error_msg)
+    
+    # The frames that are used: all frames (with skip_frames), the frames in
+    # the list, or the first frame only. The file is only read up to the last
+    # of them.
+    if settings.use_all_frames and not settings.use_select_frames:
+        frame_list = []
+        frame_indices = None
+    elif frame_list:
+        frame_indices = [j - 1 for j in frame_list]
+    else:
+        frame_indices = [0]
+    return frame_list, frame_indices
+
+
+def import_file(filepath, settings, structure=None):
+    '''
+    Import one file. 'settings' is any object with the properties of ImportXYZ
+    as attributes, the operator itself or, in a batch import, a plain object.
+    'structure' is the structure of the file, if it was read already (see
+    import_molecule.read_molecule).
+    '''
+    frame_list, frame_indices = frame_selection(settings)
+    
+    # Execute main routine
+    molecule = import_molecule.import_molecule(
+                  settings.style,
+                  settings.ball,
+                  settings.mesh_azimuth,
+                  settings.mesh_zenith,
+                  settings.scale_ballradius,
+                  settings.radiustype,
+                  settings.scale_distances,
+                  settings.stick,
+                  settings.bond_radius,
+                  settings.bond_sectors,
+                  settings.bond_guess,
+                  settings.bond_material,
+                  settings.bond_color,
+                  settings.use_center,
+                  settings.use_center_all,
+                  settings.use_camera,
+                  settings.use_lamp,
+                  filepath,
+                  settings.use_index_cache,
+                  settings.bond_mode,
+                  settings.use_mass_weights,
+                  frame_indices,
+                  structure)
+    
+    # Load frames (all frames, with skip_frames, if no list is given)
+    if (len(molecule.structure.frames) > 1
+        and (settings.use_all_frames or frame_list and frame_list != [1])):
+        
+        if settings.animation == 'MESH_CACHE':
+            import_molecule.build_mesh_cache(molecule, settings.images_per_key,
+                                settings.skip_frames, frame_list,
+                                settings.interpolation, settings.workers,
+                                bpy.path.abspath(settings.cache_dir)
+                                if settings.cache_dir else "",
+                                settings.bond_frames)
+        else:
+            import_molecule.build_frames(molecule, settings.images_per_key,
+                                settings.skip_frames, frame_list,
+                                settings.interpolation, settings.workers,
+                                settings.bond_frames)
+    
+    # release the memory map of the file
+    molecule.close()
+    return molecule
+
+
+def profile_report(filepath, settings):
+    '''
+    The report of core.profile on the last import, with the versions of the
+    addon and of Blender and the settings that change the work done.
+    '''
+    return profile.report(
+                file=filepath,
+                version=".".join(map(str, bl_info["version"])),
+                blender=bpy.app.version_string,
+                settings={key: getattr(settings, key) for key in (
+                            "style", "ball", "bond_mode", "bond_guess",
+                            "bond_frames", "animation", "use_all_frames",
+                            "skip_frames", "workers", "use_index_cache")})
+
+
 # -----------------------------------------------------------------------------
 #                                                                           GUI
 
+# Seconds between the progress updates of an import in the background.
+TIMER_STEP = 0.1
+
 
 class Style_radii(bpy.types.PropertyGroup):
     balls = FloatProperty(default=1.0)
@@ -100,10 +220,10 @@ def callback_style(self, context):
 # This is the class for the file dialog.
 class ImportXYZ(Operator, ImportHelper):
     bl_idname = "molimport.xyz"
-    bl_label  = "Import XYZ/PDB (*.xyz,*.pdb)"
+    bl_label  = "Import XYZ/PDB (*.xyz,*.pdb,*.molb)"
     bl_options = {'PRESET', 'UNDO'}
     
-    filename_ext = "*.pdb;*.xyz"
+    filename_ext = "*.pdb;*.xyz;*.molb"
     filter_glob  = StringProperty(default=filename_ext, options={'HIDDEN'},)
     
     use_camera = BoolProperty(
@@ -158,6 +278,14 @@ class ImportXYZ(Operator, ImportHelper):
                #('2', "Meta" , "Metaballs")
                ),
                default='NURBS',) 
+    bond_mode = EnumProperty(
+        name="Bond objects",
+        description="Choose how bonds are put into the scene",
+        items=(('OBJECTS', "Objects", "One object per half bond, stretched "
+                                      "to the bonded atom by a constraint"),
+               ('MESH', "Single mesh", "All half bonds of one element in one "
+                                       "mesh, fast for large structures")),
+               default='OBJECTS',)
     bond_radius = FloatProperty(
         name = "Bond radius", default=0.15, min=0.0001,
         description = "Scale factor for bond radii")
@@ -167,6 +295,10 @@ class ImportXYZ(Operator, ImportHelper):
     bond_guess = BoolProperty(
         name = "Guess bonds", default=True,
         description = "Guess bonds that are not in the file.")
+    bond_frames = BoolProperty(
+        name = "Bonds per frame", default=False,
+        description = "Recompute the bonds in every frame of a trajectory "
+                      "(single mesh only)")
     bond_material = EnumProperty(
         name="Bond material",
         description="Choose bond material",
@@ -181,6 +313,10 @@ class ImportXYZ(Operator, ImportHelper):
     use_center_all = BoolProperty(
         name = "Object to origin (all frames)", default=False,
         description = "Put the object into the global origin, all frames") 
+    use_mass_weights = BoolProperty(
+        name = "Center of mass", default=False,
+        description = "Weight the atoms by their masses when putting the "
+                      "object into the origin")
     datafile = StringProperty(
         name = "", description="Path to your custom data file",
         maxlen = 256, default = "", subtype='FILE_PATH')    
@@ -206,6 +342,35 @@ class ImportXYZ(Operator, ImportHelper):
                ('LINEAR', "Linear", "Linear interpolation between keyframes"),
                ('CONSTANT', "Constant", "Step-function like interpolation")),
                default='BEZIER',)
+    animation = EnumProperty(
+        name="Animation",
+        description="Choose how the frames are stored",
+        items=(('SHAPE_KEYS', "Shape keys", "One shape key per frame, stored "
+                                            "in the .blend file"),
+               ('MESH_CACHE', "Mesh cache", "Frames in a PC2 file per object, "
+                                            "read by Mesh Cache modifiers")),
+               default='SHAPE_KEYS',)
+    cache_dir = StringProperty(
+        name = "Cache", description="Directory of the PC2 files (default: "
+                                     "next to the imported file)",
+        maxlen = 1024, default = "", subtype='DIR_PATH')
+    workers = IntProperty(
+        name = "Workers", default=0, min=0,
+        description = "Number of processes that read the frames, 0: one per "
+                      "core for large files, none for small ones")
+    use_index_cache = BoolProperty(
+        name = "Cache frame index", default=True,
+        description = "Keep the positions of the frames of large files in a "
+                      "cache, so they open faster next time")
+    use_background = BoolProperty(
+        name = "Read in background", default=True,
+        description = "Read the file and guess the bonds while Blender stays "
+                      "responsive, with a progress bar (Esc cancels)")
+    profile_report = StringProperty(
+        name = "Profile", description="Append the times, sizes and memory of "
+                                       "the stages of each import to this "
+                                       "JSON file (empty: no report)",
+        maxlen = 1024, default = "", subtype='FILE_PATH')
 
     def draw(self, context):
         layout = self.layout
@@ -239,7 +404,11 @@ class ImportXYZ(Operator, ImportHelper):
         row = box.row()
         row.label(text="Bonds")
         row = box.row()
+        col = row.column()
+        col.prop(self, "bond_mode")
+        row = box.row()
         #row.active = (self.style != "0") # no bonds in balls style
+        row.active = (self.bond_mode == 'OBJECTS') # single mesh is a mesh
         col = row.column()
         col.prop(self, "stick")
         row = box.row()
@@ -247,13 +416,18 @@ class ImportXYZ(Operator, ImportHelper):
         col = row.column()
         col.prop(self, "bond_radius")
         row = box.row()
-        row.active = (self.stick == 'MESH') # bond sectors only for mesh
+        # bond sectors only for mesh
+        row.active = (self.stick == 'MESH' or self.bond_mode == 'MESH')
         col = row.column()
         col.prop(self, "bond_sectors")
         row = box.row()
         col = row.column()
         col.prop(self, "bond_guess")
         row = box.row()
+        row.active = (self.bond_mode == 'MESH')
+        col = row.column()
+        col.prop(self, "bond_frames")
+        row = box.row()
         col = row.column()
         col.prop(self, "bond_material")
         row = box.row()
@@ -275,6 +449,9 @@ class ImportXYZ(Operator, ImportHelper):
         row = box.row()
         row.active = (self.use_all_frames or self.use_select_frames)
         row.prop(self, "use_center_all")
+        row = box.row()
+        row.active = (self.use_center or self.use_center_all)
+        row.prop(self, "use_mass_weights")
         
         box = layout.box()
         row = box.row()
@@ -301,67 +478,89 @@ class ImportXYZ(Operator, ImportHelper):
         row = box.row()
         row.active = (self.use_all_frames or self.use_select_frames)
         row.prop(self, "interpolation")
+        row = box.row()
+        row.active = (self.use_all_frames or self.use_select_frames)
+        row.prop(self, "animation")
+        row = box.row()
+        row.active = (self.animation == 'MESH_CACHE')
+        row.prop(self, "cache_dir")
+        row = box.row()
+        row.active = (self.use_all_frames or self.use_select_frames)
+        row.prop(self, "workers")
+        row = box.row()
+        row.prop(self, "use_index_cache")
+        row = box.row()
+        row.prop(self, "use_background")
+        row = box.row()
+        row.prop(self, "profile_report")
         
     def execute(self, context):
-
-        import_molecule.ALL_FRAMES[:] = []
-        import_molecule.ELEMENTS[:] = []
-        import_molecule.STRUCTURE[:] = []
-
         # This is to determine the path.
         filepath = bpy.path.abspath(self.filepath)
+        if self.use_background and context.window and not bpy.app.background:
+            return self.start_reading(context, filepath)
+        import_file(filepath, self)
+        self.write_profile(filepath)
+        return {'FINISHED'}
+    
+    # The file is read, and the bonds are guessed, in a background thread
+    # (core.background), while the modal operator shows the progress. The
+    # scene is built from the structure in the main thread.
+    
+    def start_reading(self, context, filepath):
+        frame_list, frame_indices = frame_selection(self)
+        self._filepath = filepath
+        self._task = Task(import_molecule.read_molecule, filepath,
+                          self.radiustype,
+                          self.style != 'BALLS' and self.bond_guess,
+                          self.use_index_cache, frame_indices).start()
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(TIMER_STEP, context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        task = self._task
+        if event.type == 'ESC':
+            task.cancel()
+            return {'RUNNING_MODAL'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        context.window_manager.progress_update(int(task.fraction * 100))
+        if not task.done():
+            return {'PASS_THROUGH'}
         
-        # check if select_frames is ok, otherwise stop right here
-        error_msg = ''
-        frame_list = []
-        if self.use_select_frames:
-            try:
-                for item in self.select_frames.split(','):
-                    if '-' in item:
-                        start, end = map(int, item.split('-'))
-                        frame_list.extend(range(start, end+1))
-                    elif '+' in item:
-                        frame_list.extend(map(int, item.split('+'))
-                    else:
-                        frame_list.append(int(item))
-            except (ValueError, TypeError):
-                error_msg = 'Format error in the frame list. Using first frame only.'
-                frame_list.append(1)
-            if not frame_list:
-                error_msg = 'Frame list was empty. Using first frame only.'
-                frame_list.append(1)
-        if error_msg: print(error_msg)
-        
-        # Execute main routine
-        import_molecule.import_molecule(
-                      self.style,
-                      self.ball,
-                      self.mesh_azimuth,
-                      self.mesh_zenith,
-                      self.scale_ballradius,
-                      self.radiustype,
-                      self.scale_distances,
-                      self.stick,
-                      self.bond_radius,
-                      self.bond_sectors,
-                      self.bond_guess,
-                      self.bond_material,
-                      self.bond_color,
-                      self.use_center,
-                      self.use_center_all,
-                      self.use_camera,
-                      self.use_lamp,
-                      filepath)
-        
-        if use_all_frames:
-            frame_list.extend(range(1, len(import_molecule.ALL_FRAMES)+1))
-        # Load frames                  
-        if len(import_molecule.ALL_FRAMES) > 1 and frame_list and frame_list != [1]:
-            
-            import_molecule.build_frames(self.images_per_key, self.skip_frames,
-                                    frame_list, self.interpolation)
-        
+        self.stop_reading(context)
+        if task.cancelled() or isinstance(task.error, Cancelled):
+            if task.result is not None:
+                task.result.close()
+            self.report({'INFO'}, "Import cancelled")
+            return {'CANCELLED'}
+        if task.error is not None:
+            self.report({'ERROR'}, "Import failed: {}".format(task.error))
+            return {'CANCELLED'}
+        import_file(self._filepath, self, task.result)
+        self.write_profile(self._filepath)
         return {'FINISHED'}
+    
+    def cancel(self, context):
+        # The operator is stopped by Blender, e.g. when the file is closed.
+        self._task.cancel()
+        self._task.join()
+        if self._task.result is not None:
+            self._task.result.close()
+        self.stop_reading(context)
+    
+    def stop_reading(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+    
+    def write_profile(self, filepath):
+        if self.profile_report:
+            profile.write_report(bpy.path.abspath(self.profile_report),
+                                 profile_report(filepath, self))
 
 
 # This is the class for the file dialog of the exporter.
@@ -380,19 +579,47 @@ class ExportXYZ(Operator, ExportHelper):
                ('1', "Elements", "Export only those active objects which have"
                                  " a proper element name")),
                default='1',) 
+    use_frames = BoolProperty(
+        name = "All frames", default=False,
+        description = "Export every frame of the scene")
 
     def draw(self, context):
         layout = self.layout
         row = layout.row()
         row.prop(self, "atom_xyz_export_type")
+        row = layout.row()
+        row.prop(self, "use_frames")
 
     def execute(self, context):
-        export_xyz.export_xyz(self.atom_xyz_export_type, 
-                              bpy.path.abspath(self.filepath))
+        export_molecule.export_molecule(self.atom_xyz_export_type,
+                                        bpy.path.abspath(self.filepath),
+                                        self.use_frames)
 
         return {'FINISHED'}
 
 
+# This is the class for the file dialog of the pdb exporter, the same as for
+# XYZ. The bonds are written as CONECT records.
+class ExportPDB(ExportXYZ):
+    bl_idname = "molexport.pdb"
+    bl_label  = "Export PDB (*.pdb)"
+    filename_ext = ".pdb"
+
+    filter_glob  = StringProperty(
+        default="*.pdb", options={'HIDDEN'},)
+
+
+# This is the class for the file dialog of the exporter into the binary format
+# (see core/binary.py), which is re-imported without parsing.
+class ExportBinary(ExportXYZ):
+    bl_idname = "molexport.molb"
+    bl_label  = "Export binary molecule (*.molb)"
+    filename_ext = ".molb"
+
+    filter_glob  = StringProperty(
+        default="*.molb", options={'HIDDEN'},)
+
+
 # The entry into the menu 'file -> import'
 def menu_func(self, context):
     self.layout.operator(ImportXYZ.bl_idname, text="XYZ (.xyz)")
@@ -400,6 +627,8 @@ def menu_func(self, context):
 # The entry into the menu 'file -> export'
 def menu_func_export(self, context):
     self.layout.operator(ExportXYZ.bl_idname, text="XYZ (.xyz)")
+    self.layout.operator(ExportPDB.bl_idname, text="PDB (.pdb)")
+    self.layout.operator(ExportBinary.bl_idname, text="Binary molecule (.molb)")
 
 def register():
     bpy.utils.register_module(__name__)
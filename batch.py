@@ -0,0 +1,254 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Import many files without the GUI, e.g. on a render farm:
+#
+#   blender -b -P batch.py -- --settings settings.json --save-dir out/ *.xyz
+#
+# The settings file is a JSON object with the properties of the import
+# operator (see ImportXYZ in __init__.py), e.g.
+#
+#   {"style": "BAS", "ball": "MESH", "bond_mode": "MESH",
+#    "use_all_frames": true}
+#
+# Properties that are not given keep their defaults. Each file is imported into
+# the emptied scene. The element tables and the prototypes of the balls are
+# kept from file to file, so they are built only once. With --check a file
+# fails if its bonds do not join their atoms at the last frame.
+
+import sys
+import os
+import glob
+import json
+import time
+import argparse
+import importlib
+import traceback
+
+import bpy
+from mathutils import Vector
+
+if __name__ == "__main__":
+    # Run as a script by Blender: import the addon this file belongs to, and
+    # let its batch module do the work.
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(addon_dir))
+    batch = importlib.import_module(os.path.basename(addon_dir) + ".batch")
+    if "--" in sys.argv:
+        argv = sys.argv[sys.argv.index("--") + 1:]
+    else:
+        argv = []
+    sys.exit(batch.main(argv))
+
+from . import (import_molecule, import_file, profile_report, ImportXYZ,
+               register)
+from .core import profile
+
+
+# The largest distance (in Blender units) between the end of a bond and its
+# atom that --check accepts.
+CHECK_TOLERANCE = 1e-3
+
+
+# This is the class, which holds the settings of one batch import. It has the
+# properties of ImportXYZ as attributes, just like the operator.
+class Settings(object):
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+
+def default_settings():
+    '''
+    The defaults of the properties of ImportXYZ, taken from the registered
+    operator.
+    '''
+    values = {}
+    for prop in ImportXYZ.bl_rna.properties:
+        if prop.identifier in {'rna_type', 'filepath', 'filter_glob'}:
+            continue
+        if prop.type == 'POINTER':
+            continue
+        if getattr(prop, 'is_array', False):
+            values[prop.identifier] = tuple(prop.default_array)
+        else:
+            values[prop.identifier] = prop.default
+    return values
+
+
+def read_settings(filepath):
+    '''
+    The defaults, updated with the settings file. Unknown properties raise
+    a KeyError, so that typos don't pass silently.
+    '''
+    values = default_settings()
+    if filepath:
+        with open(filepath) as settings_file:
+            custom = json.load(settings_file)
+        for key, value in custom.items():
+            if key not in values:
+                raise KeyError("Unknown setting '{}' in {}".format(key, filepath))
+            if isinstance(value, list):
+                value = tuple(value)
+            values[key] = value
+    return Settings(values)
+
+
+def expand_files(patterns):
+    '''The files matching the patterns, in the given order, without repeats.'''
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for filepath in matches:
+            if filepath not in files:
+                files.append(filepath)
+    return files
+
+
+def clear_scene(scene):
+    '''
+    Remove all objects from the scene, and the data that is left without
+    users. The prototypes of the balls are kept for the next file.
+    '''
+    for ob in list(scene.objects):
+        scene.objects.unlink(ob)
+    for ob in list(bpy.data.objects):
+        if ob.users == 0:
+            bpy.data.objects.remove(ob)
+    keep = set(import_molecule.PROTOTYPES.values())
+    for data in (bpy.data.meshes, bpy.data.curves, bpy.data.metaballs,
+                 bpy.data.materials, bpy.data.cameras, bpy.data.lamps,
+                 bpy.data.actions):
+        for block in list(data):
+            if block.users == 0 and block.name not in keep:
+                data.remove(block)
+
+
+def evaluated_vertices(ob, scene, cache):
+    '''
+    The world positions of the vertices of 'ob' with its shape keys and
+    modifiers (e.g. a Mesh Cache) applied, at the current frame.
+    '''
+    if ob.name not in cache:
+        mesh = ob.to_mesh(scene, True, 'PREVIEW')
+        cache[ob.name] = [ob.matrix_world * vertex.co
+                          for vertex in mesh.vertices]
+        bpy.data.meshes.remove(mesh)
+    return cache[ob.name]
+
+
+def bond_end_error(scene, frame):
+    '''
+    The largest distance at 'frame' between a bond object and the atoms it
+    joins: its start must be at the atom it is parented to (by vertex), the
+    end of the half bond halfway to the target of its Stretch To constraint.
+    0.0 if there are no bond objects.
+    '''
+    scene.frame_set(frame)
+    cache = {}
+    error = 0.0
+    for ob in scene.objects:
+        if ob.parent is None or ob.parent_type != 'VERTEX':
+            continue
+        atom1 = evaluated_vertices(ob.parent, scene, cache)[
+                                                    ob.parent_vertices[0]]
+        error = max(error, (ob.matrix_world.translation - atom1).length)
+        for constraint in ob.constraints:
+            if constraint.type == 'STRETCH_TO' and constraint.target:
+                atom2 = evaluated_vertices(constraint.target, scene, cache)[
+                                                    int(constraint.subtarget)]
+                # the half bond is 0.5 long along y, with a rest length of 1
+                end = ob.matrix_world * Vector((0.0, 0.5, 0.0))
+                error = max(error, (end - (atom1 + atom2) / 2.0).length)
+    return error
+
+
+def import_one(filepath, settings, save_dir=None):
+    '''
+    Import one file into the emptied scene and save it, if 'save_dir' is
+    given. Returns the seconds spent in each stage.
+    '''
+    start = time.perf_counter()
+    clear_scene(bpy.context.scene)
+    timings = [('clear', time.perf_counter() - start)]
+    
+    import_file(os.path.abspath(filepath), settings)
+    timings.extend(profile.stage_times().items())
+    
+    if save_dir:
+        start = time.perf_counter()
+        name = os.path.splitext(os.path.basename(filepath))[0] + ".blend"
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.join(save_dir, name),
+                                    copy=True)
+        timings.append(('save', time.perf_counter() - start))
+    return timings
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+                prog="blender -b -P batch.py --",
+                description="Import XYZ/PDB files without the GUI.")
+    parser.add_argument("files", nargs="+",
+                        help="files or glob patterns (*.xyz, *.pdb)")
+    parser.add_argument("--settings", default="",
+                        help="JSON file with the properties of the importer")
+    parser.add_argument("--save-dir", default="",
+                        help="save each imported file as .blend into this "
+                             "directory")
+    parser.add_argument("--report", default="",
+                        help="write the timings of all files to this JSON file")
+    parser.add_argument("--check", action="store_true",
+                        help="check that the bond objects join their atoms "
+                             "at the last frame, a file fails otherwise")
+    args = parser.parse_args(argv)
+    
+    # The operator is only needed for its properties (the defaults).
+    if not ImportXYZ.is_registered:
+        register()
+    settings = read_settings(args.settings)
+    if args.save_dir and not os.path.isdir(args.save_dir):
+        os.makedirs(args.save_dir)
+    
+    report = []
+    failed = 0
+    for filepath in expand_files(args.files):
+        try:
+            timings = import_one(filepath, settings, args.save_dir)
+        except Exception:
+            traceback.print_exc()
+            print("{}: failed".format(filepath))
+            failed += 1
+            continue
+        if args.check:
+            scene = bpy.context.scene
+            error = bond_end_error(scene, scene.frame_end)
+            if error > CHECK_TOLERANCE:
+                print("{}: bonds are {:.4f} away from their atoms at frame "
+                      "{}".format(filepath, error, scene.frame_end))
+                failed += 1
+                continue
+        total = sum(seconds for stage, seconds in timings)
+        print("{}: {:.3f} s ({})".format(filepath, total, ", ".join(
+                "{} {:.3f}".format(stage, seconds) for stage, seconds in timings)))
+        report.append({"file": filepath, "total": total,
+                       "stages": dict(timings),
+                       "profile": profile_report(filepath, settings)})
+    
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    return 1 if failed else 0
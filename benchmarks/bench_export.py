@@ -0,0 +1,90 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Benchmark of the XYZ and pdb writers in core.writers, which format a whole
+# frame with one % operation, against the line by line writing of the old
+# exporter. Runs without Blender:
+#
+#   python benchmarks/bench_export.py [--frames 20] [--atoms 100000]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import writers
+
+
+def line_write_xyz(filepath, names, frames):
+    # The writing as it was in export_xyz, one write per atom.
+    xyz_file_p = open(filepath, "w")
+    for coords in frames:
+        xyz_file_p.write("%d\n" % len(names))
+        xyz_file_p.write(writers.XYZ_COMMENT + "\n")
+        for name, location in zip(names, coords):
+            string = "%3s%15.5f%15.5f%15.5f\n" % (name, location[0],
+                                                  location[1], location[2])
+            xyz_file_p.write(string)
+    xyz_file_p.close()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the writers of the exporter.")
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--atoms', type=int, default=100000)
+    args = parser.parse_args()
+    
+    rng = numpy.random.RandomState(0)
+    names = rng.choice(['H', 'C', 'N', 'O', 'S'], args.atoms).tolist()
+    frames = rng.random_sample((args.frames, args.atoms, 3)) * 100
+    print("{} frames x {} atoms".format(args.frames, args.atoms))
+    
+    directory = tempfile.mkdtemp()
+    old_path = os.path.join(directory, "old.xyz")
+    new_path = os.path.join(directory, "new.xyz")
+    t_lines = timed(line_write_xyz, old_path, names, frames)
+    t_xyz = timed(writers.write_xyz, new_path, names, frames)
+    with open(old_path) as old_file, open(new_path) as new_file:
+        if old_file.read() != new_file.read():
+            sys.exit("Output mismatch")
+    t_pdb = timed(writers.write_pdb, os.path.join(directory, "new.pdb"),
+                  names[:writers.PDB_MAX_ATOMS],
+                  frames[:, :writers.PDB_MAX_ATOMS])
+    for filename in os.listdir(directory):
+        os.remove(os.path.join(directory, filename))
+    os.rmdir(directory)
+    
+    print("xyz, line by line   {:10.2f} s".format(t_lines))
+    print("xyz, frame by frame {:10.2f} s".format(t_xyz))
+    print("pdb, frame by frame {:10.2f} s".format(t_pdb))
+    print("speedup xyz         {:10.1f}".format(t_lines / t_xyz))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Benchmark of the bond guessing: the cell list engine in core.bonds against
+# the all-pairs scan it replaced. Runs without Blender:
+#
+#   python benchmarks/bench_find_bonds.py [--sizes 1000 10000 100000]
+#
+# The scan is quadratic, above --scan-limit atoms (10k by default) it is not
+# run: its time is extrapolated from the largest size that was measured, and
+# the row is marked as extrapolated. Pass a larger --scan-limit to measure it.
+
+import argparse
+import os
+import random
+import sys
+import time
+from math import sqrt
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import bonds
+from core.structure import ElementGroup, Structure, group_atoms
+
+
+class Atom(object):
+    __slots__ = ('short_name', 'location', 'bonds')
+    def __init__(self, short_name, location):
+        self.short_name = short_name
+        self.location = location
+        self.bonds = []
+
+
+def make_structure(number_atoms, seed=0):
+    '''
+    Jittered cubic lattice of heavy atoms with a 1.5 A spacing, every third
+    heavy atom carries an H atom. Returns a core.structure.Structure.
+    '''
+    rng = random.Random(seed)
+    heavy_names = ('C', 'C', 'C', 'N', 'O', 'S')
+    names = []
+    coords = []
+    n_heavy = number_atoms * 3 // 4
+    edge = int(round(n_heavy ** (1.0 / 3.0))) + 1
+    count = 0
+    for i in range(edge):
+        for j in range(edge):
+            for k in range(edge):
+                if count >= number_atoms:
+                    break
+                x, y, z = (1.5 * i + rng.uniform(-0.1, 0.1),
+                           1.5 * j + rng.uniform(-0.1, 0.1),
+                           1.5 * k + rng.uniform(-0.1, 0.1))
+                names.append(rng.choice(heavy_names))
+                coords.append((x, y, z))
+                count += 1
+                if count % 4 == 3 and count < number_atoms:
+                    names.append('H')
+                    coords.append((x, y, z + 1.0))
+                    count += 1
+    short_names, elements = group_atoms(names)
+    groups = [ElementGroup(name, name, 1.0, None) for name in short_names]
+    return Structure(groups, elements, numpy.array(coords), None)
+
+
+def make_atoms(structure):
+    '''The structure as a list of lists of atoms of one type, for the scan.'''
+    return [[Atom(group.short_name, tuple(structure.coords[i]))
+             for i in index.tolist()]
+            for group, index in zip(structure.groups, structure.indices)]
+
+
+def scan_pairs(structure, atoms):
+    '''The bonds of the scan as pairs of atom indices, each bond once.'''
+    element_index = dict((group.short_name, k)
+                         for k, group in enumerate(structure.groups))
+    pairs = set()
+    for atoms_of_one_type, index in zip(atoms, structure.indices):
+        for atom, i in zip(atoms_of_one_type, index.tolist()):
+            for bond in atom.bonds:
+                short_name2, id2 = bond.split('_')
+                j = int(structure.indices[element_index[short_name2]][int(id2)])
+                pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+def scan_find_bonds(structure):
+    # The all-pairs search as it was in import_molecule.find_bonds.
+    def distance(a, b):
+        return sqrt((a[0]-b[0])**2 + (a[1]-b[1])**2 + (a[2]-b[2])**2)
+    for atoms_of_one_type in structure:
+        if atoms_of_one_type[0].short_name == 'H':
+            short_name1 = 'H'
+            for h, H1 in enumerate(atoms_of_one_type):
+                if not H1.bonds:
+                    FOUND = False
+                    for atoms_of_type2 in structure:
+                        if not FOUND and atoms_of_type2[0].short_name != 'H':
+                            short_name2 = atoms_of_type2[0].short_name
+                            for i, atom2 in enumerate(atoms_of_type2):
+                                d = distance(H1.location, atom2.location)
+                                if (0.6 < d < 1.6
+                                   or ((short_name1 == 'S' or short_name2 == 'S') and 0.6 < d < 1.9)):
+                                    H1.bonds.append('{0}_{1}'.format(short_name2, i))
+                                    atom2.bonds.append('{0}_{1}'.format("H", h))
+                                    FOUND = True
+                                    break
+    for atoms_of_one_type in structure:
+        if atoms_of_one_type[0].short_name != 'H':
+            for j, atom1 in enumerate(atoms_of_one_type):
+                b = atom1.bonds
+                short_name1 = atom1.short_name
+                if not ((short_name1 == 'C' and len(b) == 4)
+                    or (short_name1 == 'N' and len(b) == 3)
+                    or (short_name1 == 'O' and len(b) == 2)):
+                    FOUND = False
+                    for atoms_of_type2 in structure:
+                        if not FOUND and atoms_of_type2[0].short_name != 'H':
+                            short_name2 = atoms_of_type2[0].short_name
+                            for i, atom2 in enumerate(atoms_of_type2):
+                                d = distance(atom1.location, atom2.location)
+                                if (0.6 < d < 1.6
+                                or ((short_name1 == 'S' or short_name2 == 'S') and 0.6 < d < 1.9)):
+                                    bond_name = '{0}_{1}'.format(short_name2, i)
+                                    if bond_name not in b:
+                                        b.append(bond_name)
+                                        if ((short_name1 == 'C' and len(b) == 4)
+                                            or (short_name1 == 'N' and len(b) == 3)
+                                            or (short_name1 == 'O' and len(b) == 2)):
+                                            FOUND = True
+                                            break
+                                    reverse_bond = '{0}_{1}'.format(short_name1, j)
+                                    if reverse_bond not in atom2.bonds:
+                                        atom2.bonds.append(reverse_bond)
+
+
+def timed(function, structure):
+    start = time.perf_counter()
+    function(structure)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the bond guessing.")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--scan-limit', type=int, default=10000,
+                        help="largest size for which the scan is run")
+    args = parser.parse_args()
+    
+    print("{:>8}  {:>10}  {:>12}  {:>8}".format("atoms", "grid [s]",
+                                                 "scan [s]", "speedup"))
+    last_scan = None
+    for size in args.sizes:
+        note = ''
+        structure = make_structure(size)
+        t_grid = timed(bonds.find_bonds, structure)
+        
+        if size <= args.scan_limit:
+            atoms = make_atoms(structure)
+            t_scan = timed(scan_find_bonds, atoms)
+            last_scan = (size, t_scan)
+            scan_label = "{:12.3f}".format(t_scan)
+            # both engines have to produce the same bonds
+            if (set(map(tuple, structure.bonds.pairs().tolist()))
+                != scan_pairs(structure, atoms)):
+                sys.exit("Bond mismatch at {} atoms".format(size))
+        elif last_scan:
+            t_scan = last_scan[1] * (size / last_scan[0]) ** 2
+            scan_label = "{:11.1f}*".format(t_scan)
+            note = "  (scan extrapolated, not measured)"
+        else:
+            t_scan = None
+            scan_label = "{:>12}".format("-")
+        
+        speedup = "{:8.1f}".format(t_scan / t_grid) if t_scan else ""
+        print("{:>8}  {:10.3f}  {}  {}{}".format(size, t_grid, scan_label,
+                                                 speedup, note))
+    if last_scan and any(size > args.scan_limit for size in args.sizes):
+        print("* extrapolated quadratically from the scan measured at {} "
+              "atoms".format(last_scan[0]))
+
+
+if __name__ == '__main__':
+    main()
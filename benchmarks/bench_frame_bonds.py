@@ -0,0 +1,90 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Benchmark of the bonds per frame in core.bonds: the BondTracker, which only
+# searches the atoms that left the skin, against a new neighbour search in
+# every frame. The trajectory is a random walk of a liquid-like structure, so
+# bonds form and break all the time. Runs without Blender:
+#
+#   python benchmarks/bench_frame_bonds.py [--frames 50] [--atoms 20000]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import bonds
+
+
+def make_trajectory(number_frames, number_atoms, step, seed=0):
+    '''
+    Atoms at a density of 0.1 per cubic A (about the one of water), moved by
+    a random walk with a step of 'step' A per frame.
+    '''
+    rng = numpy.random.RandomState(seed)
+    edge = (number_atoms / 0.1) ** (1.0 / 3.0)
+    names = rng.choice(['H', 'H', 'C', 'N', 'O', 'S'], number_atoms)
+    frames = numpy.empty((number_frames, number_atoms, 3))
+    frames[0] = rng.random_sample((number_atoms, 3)) * edge
+    for k in range(1, number_frames):
+        frames[k] = frames[k - 1] + rng.normal(0.0, step, (number_atoms, 3))
+    return names, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the bonds per frame.")
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--atoms', type=int, default=20000)
+    parser.add_argument('--step', type=float, default=0.03)
+    parser.add_argument('--skin', type=float, default=bonds.SKIN)
+    args = parser.parse_args()
+    
+    names, frames = make_trajectory(args.frames, args.atoms, args.step)
+    print("{} frames x {} atoms, step {} A, skin {} A".format(
+                args.frames, args.atoms, args.step, args.skin))
+    
+    start = time.perf_counter()
+    tracked = [formed.size + broken.size for index, formed, broken
+               in bonds.iter_bond_changes(names, enumerate(frames), args.skin)]
+    t_tracker = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    previous = numpy.empty(0, dtype=numpy.int64)
+    changes = []
+    for frame in frames:
+        current = bonds.BondTracker(names, frame, args.skin).update(frame)
+        changes.append(numpy.setxor1d(previous, current).size)
+        previous = current
+    t_search = time.perf_counter() - start
+    
+    # both have to find the same bonds in every frame
+    if tracked != changes:
+        sys.exit("Bond mismatch")
+    
+    print("changed bonds       {:10d}".format(sum(changes[1:])))
+    print("search every frame  {:10.3f} s".format(t_search))
+    print("tracker             {:10.3f} s".format(t_tracker))
+    print("speedup             {:10.1f}".format(t_search / t_tracker))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Benchmark of opening a trajectory for a few selected frames: the scan over
+# the whole file for its frame index, against the index of core.trajectory,
+# which reads the file only up to the last selected frame, or not at all for
+# frames of equal size. Both are timed on an xyz file with frames of equal
+# size and on one with a frame number in the comment line (sizes differ), and
+# then with decoding the selected frames. Runs without Blender:
+#
+#   python benchmarks/bench_frame_select.py [--atoms 20000] [--frames 100]
+#                                           [--select 1 25 50]
+
+import argparse
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import trajectory, writers
+from generators import iter_trajectory, water
+
+
+def write_files(directory, number_atoms, number_frames):
+    names, coords, pairs = water(number_atoms)
+    uniform = os.path.join(directory, "uniform.xyz")
+    writers.write_xyz(uniform, names, iter_trajectory(coords, number_frames))
+    numbered = os.path.join(directory, "numbered.xyz")
+    with open(numbered, "w") as xyz_file:
+        for k, frame in enumerate(iter_trajectory(coords, number_frames)):
+            xyz_file.write(writers.format_xyz(names, frame, "frame {}".format(k)))
+    return uniform, numbered
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def scan_and_decode(filepath, indices):
+    # the whole file is indexed, as it was before
+    with open(filepath, "rb") as xyz_file:
+        buffer = mmap.mmap(xyz_file.fileno(), 0, access=mmap.ACCESS_READ)
+        offsets, number_atoms, end, complete = trajectory.index_xyz(buffer)
+        frames = []
+        for i in indices:
+            start = int(offsets[i])
+            stop = int(offsets[i + 1]) if i + 1 < len(offsets) else len(buffer)
+            frames.append(trajectory.decode_xyz_frame(
+                    trajectory.decode_lines(buffer, start, stop), number_atoms))
+        del offsets
+        buffer.close()
+    return frames
+
+
+def select_and_decode(filepath, indices):
+    with trajectory.Trajectory(filepath, use_cache=False,
+                               frames=indices) as frames:
+        return [frames.decode_checked(i) for i in indices]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of opening a trajectory for selected frames.")
+    parser.add_argument('--atoms', type=int, default=20000)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--select', type=int, nargs='+', default=[1, 25, 50],
+                        help="frame numbers, starting at 1")
+    args = parser.parse_args()
+    indices = [j - 1 for j in args.select if 0 < j <= args.frames]
+    
+    directory = tempfile.mkdtemp()
+    try:
+        files = write_files(directory, args.atoms, args.frames)
+        size = os.path.getsize(files[0])
+        print("{} frames of {} atoms, {:.0f} MB, frames {}".format(
+                args.frames, args.atoms, size / 1e6, args.select))
+        print("{:10s} {:>10s} {:>10s} {:>8s}".format(
+                "file", "scan [s]", "select [s]", "speedup"))
+        for filepath in files:
+            t_scan, old = timed(scan_and_decode, filepath, indices)
+            t_select, new = timed(select_and_decode, filepath, indices)
+            if any((a != b).any() for a, b in zip(old, new)):
+                sys.exit("The frames differ.")
+            print("{:10s} {:10.3f} {:10.3f} {:8.1f}".format(
+                    os.path.basename(filepath)[:-4], t_scan, t_select,
+                    t_scan / t_select))
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Memory per atom of a structure: the arrays of core.structure against the
+# AtomProp objects they replaced (one object per atom with a view into the
+# coordinates and a list of bond strings like 'C_12'). Measured
+# with tracemalloc, bonds included. Runs without Blender:
+#
+#   python benchmarks/bench_memory.py [--atoms 100000]
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_find_bonds import make_structure
+from core import bonds
+
+
+class AtomProp(object):
+    # The class as it was in core.structure.
+    __slots__ = ('long_name', 'short_name', 'location', 'radius', 'color',
+                 'material', 'bonds')
+    def __init__(self, long_name, short_name, location, radius, color,
+                 material, bonds):
+        self.long_name = long_name
+        self.short_name = short_name
+        self.location = location
+        self.radius = radius
+        self.color = color
+        self.material = material
+        self.bonds = bonds
+
+
+def make_atom_props(structure):
+    '''The atoms of the structure as they were read before: lists of AtomProps.'''
+    local = structure.local_indices()
+    atoms = []
+    for group, index in zip(structure.groups, structure.indices):
+        # the color of an element was shared by its atoms
+        color = (0.5, 0.5, 0.5)
+        atoms_one_type = []
+        for i in index.tolist():
+            bond_ids = []
+            for j in structure.bonds.partners(i).tolist():
+                bond_ids.append('{0}_{1}'.format(
+                    structure.groups[structure.elements[j]].short_name, local[j]))
+            atoms_one_type.append(AtomProp(group.long_name, group.short_name,
+                                           structure.coords[i],
+                                           float(group.radius),
+                                           color, None, bond_ids))
+        atoms.append(atoms_one_type)
+    return atoms
+
+
+def measured(function, *args):
+    '''The result of function and the memory it holds, in bytes.'''
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Memory per atom of a structure.")
+    parser.add_argument('--atoms', type=int, default=100000)
+    args = parser.parse_args()
+    
+    # the coordinates of the first frame are shared by both
+    def arrays():
+        structure = make_structure(args.atoms)
+        bonds.find_bonds(structure)
+        return structure
+    structure, t_arrays = measured(arrays)
+    atoms, t_objects = measured(make_atom_props, structure)
+    t_objects += structure.coords.nbytes
+    
+    number_atoms = len(structure)
+    print("{} atoms, {} bonds".format(number_atoms, len(structure.bonds)))
+    print("AtomProp objects  {:8.1f} bytes/atom".format(t_objects / number_atoms))
+    print("arrays            {:8.1f} bytes/atom".format(t_arrays / number_atoms))
+    print("ratio             {:8.1f}".format(t_objects / t_arrays))
+
+
+if __name__ == '__main__':
+    main()
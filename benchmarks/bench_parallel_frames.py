@@ -0,0 +1,80 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Benchmark of the parallel frame decoding in core.parallel: decodes all frames
+# of a synthetic XYZ trajectory with 1, 2, 4, ... worker processes. Runs
+# without Blender:
+#
+#   python benchmarks/bench_parallel_frames.py [--frames 2000] [--atoms 5000]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import parallel, trajectory
+
+
+def write_trajectory(filepath, number_frames, number_atoms, seed=0):
+    rng = random.Random(seed)
+    with open(filepath, 'w') as xyz_file:
+        for frame in range(number_frames):
+            xyz_file.write("{}\nframe {}\n".format(number_atoms, frame))
+            xyz_file.write("".join(
+                "C {:12.5f}{:12.5f}{:12.5f}\n".format(
+                    rng.uniform(0, 50), rng.uniform(0, 50), rng.uniform(0, 50))
+                for i in range(number_atoms)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the parallel frame decoding.")
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--atoms', type=int, default=5000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    
+    print("{} cores, with 'workers' 0 a pool is used from {} MB".format(
+                os.cpu_count(), parallel.PARALLEL_MIN_BYTES >> 20))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, "bench.xyz")
+        write_trajectory(filepath, args.frames, args.atoms)
+        with trajectory.Trajectory(filepath, use_cache=False) as frames:
+            print("{} frames x {} atoms".format(len(frames), frames.number_atoms))
+            reference = None
+            workers = 1
+            while workers <= args.max_workers:
+                start = time.perf_counter()
+                coords = parallel.read_frames(frames, range(len(frames)), workers)
+                seconds = time.perf_counter() - start
+                if reference is None:
+                    reference = seconds
+                elif not (coords == previous).all():
+                    sys.exit("Frames differ with {} workers".format(workers))
+                previous = coords
+                print("{:3d} workers {:8.2f} s   speedup {:5.2f}".format(
+                            workers, seconds, reference / seconds))
+                workers *= 2
+
+
+if __name__ == '__main__':
+    main()
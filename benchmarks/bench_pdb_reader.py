@@ -0,0 +1,139 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Benchmark of the pdb reader: the record decoding of core.pdb, which decodes
+# the columns of all lines of a model as arrays, against the reader it
+# replaced. Reads the first model with its CONECT records, then all models, of
+# a synthetic protein trajectory (about a million lines by default). The
+# previous reader is the core package of the baseline revision, checked out
+# from git into a temporary directory (by default the revision before
+# core/pdb.py was added). Runs without Blender, in a git checkout:
+#
+#   python benchmarks/bench_pdb_reader.py [--atoms 99999] [--frames 10]
+#                                         [--baseline REVISION]
+
+import argparse
+import importlib
+import importlib.util
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+import numpy
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ADDON_DIR)
+from core import elements, readers
+from generators import write_molecule
+
+
+def git(*args):
+    return subprocess.check_output(("git",) + args, cwd=ADDON_DIR)
+
+
+def default_baseline():
+    '''The revision before core/pdb.py was added.'''
+    added = git("log", "--diff-filter=A", "--format=%H", "--",
+                "core/pdb.py").split()
+    return added[-1].decode() + "^"
+
+
+def load_baseline(revision, directory):
+    '''
+    Check out the core package of 'revision' into directory and import it
+    as the package 'baseline_core'. Returns its readers module.
+    '''
+    archive = git("archive", "--format=tar", revision, "core")
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    package_dir = os.path.join(directory, "core")
+    spec = importlib.util.spec_from_file_location(
+                "baseline_core", os.path.join(package_dir, "__init__.py"),
+                submodule_search_locations=[package_dir])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["baseline_core"] = package
+    spec.loader.exec_module(package)
+    importlib.import_module("baseline_core.elements").read_elements()
+    return importlib.import_module("baseline_core.readers")
+
+
+def read_pdb(reader, filepath):
+    # the first model with the bonds, then all models as one block
+    structure = reader.read_pdb_file(filepath, '0', use_cache=False)
+    frames = structure.frames
+    return structure, frames.frames(range(len(frames)))
+
+
+def timed(reader, filepath, repeat):
+    '''The best of 'repeat' reads, and the result of the last one.'''
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = read_pdb(reader, filepath)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+        if i + 1 < repeat:
+            result[0].close()
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the pdb reader.")
+    parser.add_argument('--atoms', type=int, default=99999)
+    parser.add_argument('--frames', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=None,
+                        help="git revision of the previous reader")
+    args = parser.parse_args()
+    
+    elements.read_elements()
+    work_dir = tempfile.mkdtemp()
+    filepath = os.path.join(work_dir, "bench.pdb")
+    try:
+        revision = args.baseline or default_baseline()
+        baseline = load_baseline(revision, os.path.join(work_dir, "baseline"))
+        write_molecule(filepath, 'protein', args.atoms, args.frames)
+        with open(filepath, 'rb') as pdb_file:
+            number_lines = sum(1 for line in pdb_file)
+        t_old, (old, old_models) = timed(baseline, filepath, args.repeat)
+        t_new, (new, new_models) = timed(readers, filepath, args.repeat)
+        same = (numpy.array_equal(old.elements, new.elements)
+                and numpy.array_equal(old.bonds.pairs(), new.bonds.pairs())
+                and numpy.array_equal(old_models, new_models))
+        old.close()
+        new.close()
+        if not same:
+            sys.exit("The readers disagree.")
+    finally:
+        shutil.rmtree(work_dir)
+    
+    print("{} lines, {} atoms, {} models, {} bonds".format(
+            number_lines, len(new), len(new_models), len(new.bonds)))
+    print("baseline {:8.3f} s  ({})".format(t_old, revision))
+    print("records  {:8.3f} s".format(t_new))
+    print("speedup  {:8.1f}".format(t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
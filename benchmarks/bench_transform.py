@@ -0,0 +1,93 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Benchmark of centering, scaling and the size of the object in core.transform,
+# on a (frames, atoms, 3) block of coordinates, against the per-atom loop over
+# Vectors it replaced. Runs without Blender:
+#
+#   python benchmarks/bench_transform.py [--frames 5000] [--atoms 20000]
+#
+# The loop is timed on --loop-frames frames and extrapolated to all frames.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import transform
+
+
+def loop_transform(frame, scale):
+    # The loops as they were, with tuples instead of mathutils Vectors:
+    # sum up the locations, substract the mean from every atom, scale every
+    # atom, and find the farthest atom.
+    locations = [tuple(co) for co in frame.tolist()]
+    total = [0.0, 0.0, 0.0]
+    for location in locations:
+        total = [t + c for t, c in zip(total, location)]
+    mean = [t / len(locations) for t in total]
+    locations = [[(c - m) * scale for c, m in zip(location, mean)]
+                 for location in locations]
+    size = 0.0
+    for location in locations:
+        size = max(size, sum(c * c for c in location) ** 0.5)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of centering and scaling all frames.")
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--atoms', type=int, default=20000)
+    parser.add_argument('--loop-frames', type=int, default=2)
+    parser.add_argument('--dtype', default='float32',
+                        choices=('float32', 'float64'))
+    args = parser.parse_args()
+    
+    rng = numpy.random.RandomState(0)
+    coords = (rng.random_sample((args.frames, args.atoms, 3)) * 100).astype(
+                                                                args.dtype)
+    masses = rng.random_sample(args.atoms) * 30 + 1
+    print("{} frames x {} atoms, {:.0f} MB".format(
+                args.frames, args.atoms, coords.nbytes / 2**20))
+    
+    start = time.perf_counter()
+    for frame in coords[:args.loop_frames]:
+        loop_transform(frame, 1.5)
+    t_loop = (time.perf_counter() - start) / args.loop_frames * args.frames
+    
+    start = time.perf_counter()
+    transform.transform(coords, center=True, scale=1.5)
+    size = transform.bounding_size(coords, 0.0)
+    t_array = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    transform.transform(coords, center=True, weights=masses.astype(args.dtype))
+    t_mass = time.perf_counter() - start
+    
+    print("loop (extrapolated) {:10.2f} s".format(t_loop))
+    print("arrays              {:10.2f} s".format(t_array))
+    print("arrays, mass center {:10.2f} s".format(t_mass))
+    print("size {:.2f}".format(size))
+
+
+if __name__ == '__main__':
+    main()
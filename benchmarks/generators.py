@@ -0,0 +1,177 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Synthetic inputs for the benchmarks: molecules of any size and trajectories
+# of any length, reproducible from a seed. Runs without Blender, e.g. to write
+# a test file:
+#
+#   python benchmarks/generators.py water --atoms 30000 --frames 100 out.xyz
+#
+# Each generator returns the short names of the atoms, their coordinates
+# (atoms, 3) and the bonds as pairs of atom indices (k, 2):
+#
+#   water    a box of water molecules at the density of liquid water
+#   protein  alpha helices (backbone, carbonyl O, side chain C or S) side by
+#            side, the kind of file that comes with CONECT records
+#   crystal  rock salt (NaCl) with a fraction of the sites empty (X), without
+#            bonds
+
+import argparse
+import os
+import sys
+from math import cos, pi, sin
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import writers
+
+
+# -----------------------------------------------------------------------------
+#                                                                  Molecules
+
+def lattice(number_sites, spacing):
+    '''The first 'number_sites' points of a cubic lattice, (sites, 3).'''
+    edge = int(numpy.ceil(number_sites ** (1.0 / 3.0)))
+    grid = numpy.indices((edge, edge, edge)).reshape(3, -1).T
+    return grid[:number_sites] * float(spacing)
+
+
+def water(number_atoms, seed=0):
+    '''Randomly turned water molecules on a jittered lattice (3.1 A).'''
+    rng = numpy.random.RandomState(seed)
+    number_molecules = max(number_atoms // 3, 1)
+    oxygens = lattice(number_molecules, 3.1)
+    oxygens += rng.uniform(-0.2, 0.2, oxygens.shape)
+    # the hydrogens at 0.96 A and 104.5 degrees, in the xy plane ...
+    half = 104.5 / 360.0 * pi
+    local = 0.96 * numpy.array([[cos(half), sin(half), 0.0],
+                                [cos(half), -sin(half), 0.0]])
+    # ... turned by a random rotation per molecule
+    rotations = numpy.linalg.qr(rng.normal(size=(number_molecules, 3, 3)))[0]
+    hydrogens = oxygens[:, None, :] + numpy.matmul(local, rotations)
+    coords = numpy.concatenate((oxygens[:, None, :], hydrogens), axis=1)
+    names = ['O', 'H', 'H'] * number_molecules
+    first = numpy.arange(number_molecules) * 3
+    pairs = numpy.concatenate((numpy.stack((first, first + 1), axis=1),
+                               numpy.stack((first, first + 2), axis=1)))
+    return names, coords.reshape(-1, 3), pairs
+
+
+def protein(number_atoms, seed=0, helix_residues=60):
+    '''
+    Helices of 'helix_residues' residues on a square grid (10 A apart). A
+    residue has the backbone N, CA, C, the carbonyl O and a side chain atom
+    at CA, every tenth of which is an S.
+    '''
+    rng = numpy.random.RandomState(seed)
+    number_residues = max(number_atoms // 5, 1)
+    # backbone atom k of a helix: 100 degrees and 0.75 A further along z
+    # than atom k-1, 0.8 A from the axis, which gives 1.44 A bonds
+    k = numpy.arange(3 * number_residues)
+    position = k % (3 * helix_residues)
+    helix = k // (3 * helix_residues)
+    columns = int(numpy.ceil(numpy.sqrt(helix.max() + 1)))
+    angle = numpy.radians(100.0) * position
+    radial = numpy.stack((numpy.cos(angle), numpy.sin(angle),
+                          numpy.zeros(len(k))), axis=1)
+    backbone = 0.8 * radial
+    backbone[:, 0] += 10.0 * (helix % columns)
+    backbone[:, 1] += 10.0 * (helix // columns)
+    backbone[:, 2] = 0.75 * position
+    backbone += rng.uniform(-0.05, 0.05, backbone.shape)
+    # the O of C and the side chain of CA point away from the axis
+    outward = backbone + 1.23 * radial
+    n, ca, c = (numpy.arange(number_residues) * 3 + i for i in range(3))
+    coords = numpy.concatenate((backbone, outward[c], outward[ca]))
+    side = numpy.where(numpy.arange(number_residues) % 10 == 9, 'S', 'C')
+    names = ['N', 'C', 'C'] * number_residues + ['O'] * number_residues \
+            + side.tolist()
+    # along the backbone, but not from one helix to the next
+    chain = numpy.flatnonzero(position[1:] > 0)
+    first_o = 3 * number_residues
+    first_side = 4 * number_residues
+    residues = numpy.arange(number_residues)
+    pairs = numpy.concatenate((numpy.stack((chain, chain + 1), axis=1),
+                    numpy.stack((c, first_o + residues), axis=1),
+                    numpy.stack((ca, first_side + residues), axis=1)))
+    return names, coords, pairs
+
+
+def crystal(number_atoms, seed=0, vacancies=0.02):
+    '''Rock salt with 2.82 A between Na and Cl, 'vacancies' of the sites X.'''
+    rng = numpy.random.RandomState(seed)
+    coords = lattice(number_atoms, 2.82)
+    odd = (numpy.rint(coords / 2.82).astype(int).sum(axis=1) % 2).astype(bool)
+    names = numpy.where(odd, 'Cl', 'Na')
+    names[rng.random_sample(len(names)) < vacancies] = 'X'
+    return names.tolist(), coords, numpy.empty((0, 2), dtype=int)
+
+
+MOLECULES = {'water': water, 'protein': protein, 'crystal': crystal}
+
+
+# -----------------------------------------------------------------------------
+#                                                               Trajectories
+
+def iter_trajectory(coords, number_frames, step=0.02, seed=0):
+    '''
+    Yield 'number_frames' frames, starting with coords, the atoms moved by a
+    random walk with steps of 'step' A per frame.
+    '''
+    rng = numpy.random.RandomState(seed)
+    frame = numpy.array(coords, dtype=numpy.float64)
+    for i in range(number_frames):
+        if i:
+            frame = frame + rng.normal(0.0, step, frame.shape)
+        yield frame
+
+
+def write_molecule(filepath, kind, number_atoms, number_frames=1, seed=0):
+    '''
+    Write a molecule of the given kind with 'number_frames' frames into an
+    xyz or pdb file (depending on the extension), a pdb file with the bonds
+    as CONECT records. Returns the number of atoms.
+    '''
+    names, coords, pairs = MOLECULES[kind](number_atoms, seed)
+    frames = iter_trajectory(coords, number_frames, seed=seed)
+    if filepath.endswith('.pdb'):
+        writers.write_pdb(filepath, names, frames, pairs)
+    else:
+        writers.write_xyz(filepath, names, frames)
+    return len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic molecule or trajectory.")
+    parser.add_argument('kind', choices=sorted(MOLECULES))
+    parser.add_argument('output', help="an .xyz or .pdb file")
+    parser.add_argument('--atoms', type=int, default=10000)
+    parser.add_argument('--frames', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    number_atoms = write_molecule(args.output, args.kind, args.atoms,
+                                  args.frames, args.seed)
+    print("{}: {} atoms, {} frames".format(args.output, number_atoms,
+                                           args.frames))
+
+
+if __name__ == '__main__':
+    main()
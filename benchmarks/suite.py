@@ -0,0 +1,270 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# The benchmark suite of the importer: writes synthetic files (see
+# generators.py) and times the stages of reading them one by one. Each run is
+# appended to a history file, and compared with the last run of the same case,
+# so that a slowdown of a stage shows up. Runs without Blender:
+#
+#   python benchmarks/suite.py [--cases water protein crystal] [--atoms 10000]
+#                              [--frames 20] [--history history.jsonl]
+#
+# The history is kept in the user cache directory by default (next to the
+# frame index cache, see core.index_cache), outside of the source tree.
+#
+# or headless in Blender, which adds the stages of a whole import (core.profile,
+# with build_frames as 'frames'):
+#
+#   blender -b -P benchmarks/suite.py -- [options]
+#
+# Stages without Blender:
+#
+#   read_xyz           readers.read_xyz_file
+#   read_pdb           readers.read_pdb_file of the multi-model pdb file, with
+#                      the index of its models and the CONECT records
+#   make_structure     readers.make_structure from the parsed first frame
+#   find_bonds         bonds.find_bonds on a structure without bonds
+#   decode_frames      all frames of the xyz file as one block
+#   decode_pdb_frames  all models of the pdb file as one block
+#
+# The exit status is 1 if a stage got slower than --threshold times its last
+# time, e.g. to fail a CI job.
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ADDON_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+from core import bonds, elements, index_cache, readers
+from generators import MOLECULES, write_molecule
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+DEFAULT_HISTORY = os.path.join(
+        os.path.dirname(index_cache.default_cache_dir()), "history.jsonl")
+
+# Stages shorter than this (in seconds) are too noisy to count as regressions.
+MIN_SECONDS = 0.005
+
+
+# -----------------------------------------------------------------------------
+#                                                                     Stages
+
+def best_time(function, repeat, setup=None):
+    '''
+    The shortest of 'repeat' runs of function(), and its last result. With
+    'setup', function(setup()) is timed, with a new setup() for every run,
+    which is not timed.
+    '''
+    best = None
+    for i in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def time_core(xyz_path, pdb_path, repeat):
+    '''The stages of reading the files, without Blender.'''
+    times = {}
+    times['read_xyz'], structure = best_time(
+            lambda: readers.read_xyz_file(xyz_path, '0', use_cache=False),
+            repeat)
+    times['read_pdb'], pdb_structure = best_time(
+            lambda: readers.read_pdb_file(pdb_path, '0', use_cache=False),
+            repeat)
+    models = pdb_structure.frames
+    times['decode_pdb_frames'] = best_time(
+            lambda: models.frames(range(len(models))), repeat)[0]
+    pdb_structure.close()
+    
+    frames = structure.frames
+    symbols = frames.symbols
+    coords = structure.coords
+    times['make_structure'], structure = best_time(
+            lambda: readers.make_structure(symbols, coords, frames, '0'),
+            repeat)
+    # Every run gets a structure without bonds: with the bonds of the last
+    # run the saturated atoms would be skipped.
+    times['find_bonds'] = best_time(
+            bonds.find_bonds, repeat,
+            lambda: readers.make_structure(symbols, coords, frames, '0'))[0]
+    times['decode_frames'] = best_time(
+            lambda: frames.frames(range(len(frames))), repeat)[0]
+    structure.close()
+    return times
+
+
+def time_blender(xyz_path, repeat):
+    '''
+    The stages of a whole import of the xyz file with all frames and the
+    single mesh bonds, as they are recorded by core.profile.
+    '''
+    # the addon, imported as a package like batch.py does
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    batch = importlib.import_module(os.path.basename(ADDON_DIR) + ".batch")
+    if not batch.ImportXYZ.is_registered:
+        batch.register()
+    values = batch.default_settings()
+    values.update(bond_guess=True, bond_mode='MESH', use_all_frames=True,
+                  use_index_cache=False)
+    settings = batch.Settings(values)
+    times = {}
+    for i in range(repeat):
+        for stage, seconds in batch.import_one(xyz_path, settings):
+            times[stage] = min(times.get(stage, seconds), seconds)
+    return dict(("import_" + stage, seconds)
+                for stage, seconds in times.items())
+
+
+# -----------------------------------------------------------------------------
+#                                                                    History
+
+def git_commit():
+    '''The commit of the addon, or None outside of a git checkout.'''
+    try:
+        output = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                         cwd=ADDON_DIR, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().strip()
+
+
+def read_history(filepath):
+    '''The runs in the history file, oldest first.'''
+    if not os.path.exists(filepath):
+        return []
+    with open(filepath) as history_file:
+        return [json.loads(line) for line in history_file if line.strip()]
+
+
+def last_run(history, run):
+    '''The last run in history of the same case on the same machine.'''
+    keys = ('case', 'atoms', 'frames', 'blender', 'machine')
+    for previous in reversed(history):
+        if all(previous.get(key) == run[key] for key in keys):
+            return previous
+    return None
+
+
+def compare(run, previous, threshold):
+    '''
+    Print the stages of the run, with the ratio to the previous run. Returns
+    the names of the stages that got slower than 'threshold' times (and
+    longer than MIN_SECONDS).
+    '''
+    slower = []
+    for stage, seconds in sorted(run['stages'].items()):
+        line = "  {:24s} {:9.4f} s".format(stage, seconds)
+        before = previous['stages'].get(stage) if previous else None
+        if before:
+            ratio = seconds / before
+            line += "  {:5.2f}x of {}".format(ratio, previous['commit'])
+            if ratio > threshold and seconds > MIN_SECONDS:
+                line += "  SLOWER"
+                slower.append(stage)
+        print(line)
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="suite.py",
+        description="Benchmark suite of the importer.")
+    parser.add_argument('--cases', nargs='+', default=sorted(MOLECULES),
+                        choices=sorted(MOLECULES))
+    parser.add_argument('--atoms', type=int, default=10000)
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="the best of this many runs is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', default=DEFAULT_HISTORY,
+                        help="JSON lines file the runs are appended to")
+    parser.add_argument('--no-history', action='store_true',
+                        help="compare, but don't append this run")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="a stage slower than this times its last time "
+                             "is a regression")
+    args = parser.parse_args(argv)
+    
+    elements.read_elements()
+    history = read_history(args.history)
+    runs = []
+    slower = []
+    work_dir = tempfile.mkdtemp()
+    try:
+        for case in args.cases:
+            xyz_path = os.path.join(work_dir, case + ".xyz")
+            pdb_path = os.path.join(work_dir, case + ".pdb")
+            number_atoms = write_molecule(xyz_path, case, args.atoms,
+                                          args.frames, args.seed)
+            write_molecule(pdb_path, case, args.atoms, args.frames,
+                           args.seed)
+            
+            stages = time_core(xyz_path, pdb_path, args.repeat)
+            if bpy is not None:
+                stages.update(time_blender(xyz_path, args.repeat))
+            run = {'case': case, 'atoms': number_atoms, 'frames': args.frames,
+                   'blender': bpy.app.version_string if bpy else None,
+                   'machine': platform.node(), 'commit': git_commit(),
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'python': platform.python_version(),
+                   'numpy': numpy.__version__, 'stages': stages}
+            print("{}: {} atoms, {} frames".format(case, number_atoms,
+                                                  args.frames))
+            slower += [case + "/" + stage for stage in compare(
+                        run, last_run(history, run), args.threshold)]
+            runs.append(run)
+    finally:
+        shutil.rmtree(work_dir)
+    
+    if not args.no_history:
+        history_dir = os.path.dirname(os.path.abspath(args.history))
+        if not os.path.isdir(history_dir):
+            os.makedirs(history_dir)
+        with open(args.history, "a") as history_file:
+            for run in runs:
+                history_file.write(json.dumps(run, sort_keys=True) + "\n")
+    if slower:
+        print("Slower: " + ", ".join(slower))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    if "--" in sys.argv:
+        # run by Blender, the options follow '--'
+        sys.exit(main(sys.argv[sys.argv.index("--") + 1:]))
+    sys.exit(main())
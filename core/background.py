@@ -0,0 +1,107 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import threading
+
+
+# -----------------------------------------------------------------------------
+#                                                            Background tasks
+
+# The parts of an import that don't touch bpy (reading the file, guessing the
+# bonds) run in a thread, while Blender keeps handling events. A modal
+# operator polls the task for its progress and its result, and may cancel it.
+# The task is cancelled at its next progress report, by raising Cancelled in
+# the thread.
+
+
+class Cancelled(Exception):
+    '''Raised in the thread of a task that was cancelled.'''
+
+
+# This is the class, which runs function(*args, task=task) in a thread. The
+# function reports its progress through the task (report, or a TaskProgress
+# for a loop), the caller reads 'stage' and 'fraction' and, when done(),
+# 'result' or 'error'.
+class Task(object):
+    __slots__ = ('function', 'args', 'stage', 'fraction', 'result', 'error',
+                 '_cancelled', '_thread')
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+        self.stage = ''
+        self.fraction = 0.0
+        self.result = None
+        self.error = None
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+    
+    def _run(self):
+        try:
+            self.result = self.function(*self.args, task=self)
+        except BaseException as error:
+            self.error = error
+        self.fraction = 1.0
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def done(self):
+        return not self._thread.is_alive()
+    
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+    
+    def cancel(self):
+        self._cancelled.set()
+    
+    def cancelled(self):
+        return self._cancelled.is_set()
+    
+    def report(self, stage, fraction):
+        '''
+        Called in the thread: the task is at 'fraction' (0 to 1) of its work,
+        in 'stage'. Raises Cancelled if the task was cancelled.
+        '''
+        if self._cancelled.is_set():
+            raise Cancelled(stage)
+        self.stage = stage
+        self.fraction = fraction
+
+
+# This is the class, which reports the progress of a loop to a task, in place
+# of a core.progress.Progress: update(count) puts the task at count/total of
+# the part of the work from 'first' to 'last'.
+class TaskProgress(object):
+    __slots__ = ('task', 'stage', 'total', 'first', 'last')
+    def __init__(self, task, stage, total, first=0.0, last=1.0):
+        self.task = task
+        self.stage = stage
+        self.total = total
+        self.first = first
+        self.last = last
+        task.report(stage, first)
+    
+    def update(self, count):
+        fraction = float(count) / self.total if self.total else 1.0
+        self.task.report(self.stage,
+                         self.first + (self.last - self.first) * fraction)
+    
+    def finish(self):
+        self.task.report(self.stage, self.last)
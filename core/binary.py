@@ -0,0 +1,189 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# A compact binary format for structures and trajectories, which is read
+# without parsing: every section is an array, taken from a memory map with
+# numpy.frombuffer. All numbers are little-endian. The file consists of
+#
+#   header   magic, version, the number of atoms, elements, bonds and frames
+#            and the position of the frame offsets
+#   elements the short names of the elements, 8 bytes each
+#   atoms    the element of each atom, uint8 (index into the elements)
+#   bonds    pairs of atom indices, int32 (bonds, 2)
+#   frames   the coordinates of each frame, float32 (atoms, 3)
+#   offsets  the byte offset of each frame, int64
+#
+# Every section starts at a multiple of 8 bytes. The offsets come last, so a
+# trajectory is written frame by frame, without knowing the number of frames.
+
+import struct
+
+import numpy
+
+EXTENSION = '.molb'
+MAGIC = b'MOLB'
+VERSION = 1
+
+# magic, version, atoms, elements, bonds, frames, offsets position
+HEADER = struct.Struct('<4sIIIIIQ')
+NAME_SIZE = 8
+COORD_TYPE = numpy.dtype('<f4')
+BOND_TYPE = numpy.dtype('<i4')
+OFFSET_TYPE = numpy.dtype('<i8')
+
+
+def _padding(size):
+    return -size % 8
+
+
+def _sections(number_atoms, number_elements, number_bonds):
+    '''The byte offsets of the element, atom, bond and frame sections.'''
+    elements = HEADER.size + _padding(HEADER.size)
+    atoms = elements + NAME_SIZE * number_elements
+    bonds = atoms + number_atoms + _padding(number_atoms)
+    frames = bonds + 2 * BOND_TYPE.itemsize * number_bonds
+    return elements, atoms, bonds, frames + _padding(frames)
+
+
+# -----------------------------------------------------------------------------
+#                                                                      Writer
+
+# This is the class, which writes a binary file frame by frame. The header
+# and the offsets are written by close().
+class BinaryWriter(object):
+    __slots__ = ('filepath', 'number_atoms', 'number_elements', 'number_bonds',
+                 'offsets', '_file')
+    def __init__(self, filepath, short_names, bonds=None):
+        '''
+        short_names: the short name of the element of each atom
+        bonds:       the bonds as pairs of atom indices (bonds, 2), or None
+        '''
+        elements, atom_elements = numpy.unique(numpy.asarray(short_names,
+                                               dtype=str), return_inverse=True)
+        if len(elements) > 256:
+            raise ValueError("At most 256 elements, not {}.".format(
+                                                                len(elements)))
+        bonds = numpy.asarray(bonds if bonds is not None else (),
+                              dtype=BOND_TYPE).reshape(-1, 2)
+        self.filepath = filepath
+        self.number_atoms = len(atom_elements)
+        self.number_elements = len(elements)
+        self.number_bonds = len(bonds)
+        self.offsets = []
+        
+        self._file = open(filepath, 'wb')
+        self._file.write(b'\0' * (HEADER.size + _padding(HEADER.size)))
+        self._file.write(numpy.array([name.encode('utf-8') for name in elements],
+                                     dtype='S{}'.format(NAME_SIZE)).tobytes())
+        self._file.write(atom_elements.astype(numpy.uint8).tobytes())
+        self._file.write(b'\0' * _padding(self.number_atoms))
+        self._file.write(bonds.tobytes())
+        self._file.write(b'\0' * _padding(self._file.tell()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, coords):
+        coords = numpy.asarray(coords)
+        if coords.shape != (self.number_atoms, 3):
+            raise ValueError("Expected {} atoms, got an array of shape {}."
+                             .format(self.number_atoms, coords.shape))
+        self.offsets.append(self._file.tell())
+        self._file.write(coords.astype(COORD_TYPE).tobytes())
+
+    def close(self):
+        if self._file.closed:
+            return
+        position = self._file.tell()
+        self._file.write(numpy.array(self.offsets, dtype=OFFSET_TYPE).tobytes())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.number_atoms,
+                                     self.number_elements, self.number_bonds,
+                                     len(self.offsets), position))
+        self._file.close()
+
+
+def write_binary(filepath, short_names, frames, bonds=None):
+    '''Write all frames (an iterable of (atoms, 3) arrays). Returns their number.'''
+    with BinaryWriter(filepath, short_names, bonds) as writer:
+        for coords in frames:
+            writer.write(coords)
+    return len(writer.offsets)
+
+
+# -----------------------------------------------------------------------------
+#                                                                      Reader
+
+def read_header(buffer):
+    '''
+    The header of a binary file in 'buffer' (bytes or a memory map) as a dict.
+    '''
+    if len(buffer) < HEADER.size:
+        raise ValueError("Not a binary structure file.")
+    (magic, version, number_atoms, number_elements, number_bonds,
+     number_frames, offsets) = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("Not a binary structure file.")
+    if version > VERSION:
+        raise ValueError("Binary structure file of version {}, only up to {} "
+                         "is supported.".format(version, VERSION))
+    return {'number_atoms': number_atoms, 'number_elements': number_elements,
+            'number_bonds': number_bonds, 'number_frames': number_frames,
+            'offsets': offsets}
+
+
+def read_topology(buffer):
+    '''
+    The short names of the atoms and the bonds (bonds, 2) of a binary file.
+    Nothing refers to 'buffer' afterwards, so a memory map can be closed.
+    '''
+    header = read_header(buffer)
+    number_atoms = header['number_atoms']
+    elements, atoms, bonds, frames = _sections(number_atoms,
+                                               header['number_elements'],
+                                               header['number_bonds'])
+    names = numpy.frombuffer(buffer, 'S{}'.format(NAME_SIZE),
+                             header['number_elements'], elements)
+    atom_elements = numpy.frombuffer(buffer, numpy.uint8, number_atoms, atoms)
+    short_names = [name.decode('utf-8') for name in names.tolist()]
+    return ([short_names[k] for k in atom_elements.tolist()],
+            numpy.frombuffer(buffer, BOND_TYPE, 2 * header['number_bonds'],
+                             bonds).reshape(-1, 2).astype(numpy.int64))
+
+
+def build_index(buffer):
+    '''
+    The frame index of a binary file, as trajectory.build_index returns it.
+    '''
+    header = read_header(buffer)
+    offsets = numpy.frombuffer(buffer, OFFSET_TYPE, header['number_frames'],
+                               header['offsets']).astype(numpy.int64)
+    spans = numpy.empty((len(offsets), 2), dtype=numpy.int64)
+    spans[:, 0] = offsets
+    spans[:, 1] = offsets + header['number_atoms'] * 3 * COORD_TYPE.itemsize
+    return {'spans': spans, 'number_atoms': header['number_atoms'],
+            'conect': -1}
+
+
+def decode_frame(buffer, start, number_atoms, dtype=numpy.float64):
+    '''A frame as a new array (atoms, 3) of 'dtype'.'''
+    return numpy.frombuffer(buffer, COORD_TYPE, number_atoms * 3,
+                            start).reshape(-1, 3).astype(dtype)
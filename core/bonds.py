@@ -0,0 +1,337 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+from itertools import product
+from math import floor
+import numpy
+from .structure import make_bonds
+
+# -----------------------------------------------------------------------------
+#                                                              Bond criteria
+
+# Two atoms are bonded if their distance lies between BOND_MIN and BOND_MAX.
+# Bonds involving sulfur may be as long as BOND_MAX_SULFUR.
+BOND_MIN = 0.6
+BOND_MAX = 1.6
+BOND_MAX_SULFUR = 1.9
+
+# The search stops early for atoms that have reached their usual valence.
+SATURATION = {'C': 4, 'N': 3, 'O': 2}
+
+_MIN_SQ = BOND_MIN * BOND_MIN
+_MAX_SQ = BOND_MAX * BOND_MAX
+_MAX_SULFUR_SQ = BOND_MAX_SULFUR * BOND_MAX_SULFUR
+
+
+def is_bond(short_name1, short_name2, distance_sq):
+    if distance_sq <= _MIN_SQ:
+        return False
+    if distance_sq < _MAX_SQ:
+        return True
+    # long sulfur bonds
+    return ((short_name1 == 'S' or short_name2 == 'S')
+            and distance_sq < _MAX_SULFUR_SQ)
+
+
+def is_saturated(short_name, bonds):
+    return len(bonds) == SATURATION.get(short_name, -1)
+
+
+# -----------------------------------------------------------------------------
+#                                                                 Cell list
+
+# This is the class, which bins atoms into a uniform grid of cubic cells. With
+# the cell size set to the largest bond cutoff, all possible bonding partners of
+# an atom lie in the 3x3x3 block of cells around it.
+class CellGrid(object):
+    __slots__ = ('cell_size', 'cells', 'neighbour_cache')
+    def __init__(self, coords, indices, cell_size=BOND_MAX_SULFUR):
+        self.cell_size = cell_size
+        self.cells = {}
+        # neighbouring atoms are the same for all atoms in one cell
+        self.neighbour_cache = {}
+        # indices are added in increasing order, so every cell stays sorted
+        for i in indices:
+            self.cells.setdefault(self.cell_of(coords[i]), []).append(i)
+
+    def cell_of(self, co):
+        size = self.cell_size
+        return (floor(co[0] / size), floor(co[1] / size), floor(co[2] / size))
+
+    def neighbours(self, co):
+        '''
+        Return the sorted indices of all binned atoms in the 27 cells around co.
+        '''
+        key = self.cell_of(co)
+        candidates = self.neighbour_cache.get(key)
+        if candidates is None:
+            cx, cy, cz = key
+            candidates = []
+            for x in (cx - 1, cx, cx + 1):
+                for y in (cy - 1, cy, cy + 1):
+                    for z in (cz - 1, cz, cz + 1):
+                        cell = self.cells.get((x, y, z))
+                        if cell:
+                            candidates.extend(cell)
+            candidates.sort()
+            self.neighbour_cache[key] = candidates
+        return candidates
+
+
+# -----------------------------------------------------------------------------
+#                                                             Bond guessing
+
+# find_bonds reports its progress every this many atoms.
+PROGRESS_ATOMS = 4096
+
+
+def find_bonds(structure, progress=None):
+    '''
+    Guess the bonds of a structure (a core.structure.Structure) from the
+    interatomic distances and add them to structure.bonds. 'progress' (e.g.
+    a core.progress.Progress) gets the number of atoms visited out of twice
+    the number of atoms.
+    
+    The atoms are visited element by element. Candidate partners are visited
+    in the same order as in a scan over the whole structure, so the result is
+    identical to the all-pairs search, but only the atoms in neighbouring
+    cells are checked.
+    '''
+    # the global index g runs over the atoms element by element, atom[g] is
+    # the index of the atom in a frame
+    atom = numpy.concatenate(structure.indices + [numpy.empty(0, numpy.intp)])
+    group_names = [group.short_name for group in structure.groups]
+    names = [group_names[k] for k in structure.elements[atom].tolist()]
+    coords = structure.coords[atom].tolist()
+    g_of_atom = numpy.empty(len(atom), dtype=numpy.intp)
+    g_of_atom[atom] = numpy.arange(len(atom))
+    
+    # the partners of each atom (global indices), starting with the bonds
+    # from the file
+    partners = [[] for g in range(len(atom))]
+    for i, j in structure.bonds.half_bonds().tolist():
+        partners[g_of_atom[i]].append(int(g_of_atom[j]))
+    
+    # H atoms never bond to other H atoms, so only heavy atoms are binned
+    heavy = [g for g, name in enumerate(names) if name != 'H']
+    grid = CellGrid(coords, heavy)
+    
+    # do H atoms first, they get exactly one bond
+    for g, name in enumerate(names):
+        if progress is not None and not g % PROGRESS_ATOMS:
+            progress.update(g)
+        if name != 'H' or partners[g]: # if there is already a bond recorded
+            continue
+        x1, y1, z1 = coords[g]
+        for k in grid.neighbours(coords[g]):
+            x2, y2, z2 = coords[k]
+            distance_sq = (x1-x2)*(x1-x2) + (y1-y2)*(y1-y2) + (z1-z2)*(z1-z2)
+            if is_bond('H', names[k], distance_sq):
+                # append the one bond and break the loop
+                partners[g].append(k)
+                partners[k].append(g)
+                break
+    
+    # now go through the other elements
+    for count, g in enumerate(heavy):
+        if progress is not None and not count % PROGRESS_ATOMS:
+            progress.update(len(atom) + g)
+        bonds = partners[g]
+        short_name1 = names[g]
+        # preliminary check if bonds are already saturated
+        if is_saturated(short_name1, bonds):
+            continue
+        x1, y1, z1 = coords[g]
+        for k in grid.neighbours(coords[g]):
+            x2, y2, z2 = coords[k]
+            distance_sq = (x1-x2)*(x1-x2) + (y1-y2)*(y1-y2) + (z1-z2)*(z1-z2)
+            if not is_bond(short_name1, names[k], distance_sq):
+                continue
+            if k not in bonds:
+                bonds.append(k)
+                # check number of bonds to speed up calculation
+                if is_saturated(short_name1, bonds):
+                    break
+            if g not in partners[k]:
+                partners[k].append(g)
+    
+    pairs = [(g, k) for g, bonds in enumerate(partners) for k in bonds]
+    pairs = atom[numpy.array(pairs, dtype=numpy.intp).reshape(-1, 2)]
+    structure.bonds = make_bonds(pairs, len(structure))
+    if progress is not None:
+        progress.finish()
+
+
+# -----------------------------------------------------------------------------
+#                                                     Bonds along a trajectory
+
+# In a trajectory the bonds are recomputed in every frame. Only the distance
+# criterion is used (no saturation), so that a bond does not depend on the
+# order of the atoms. The candidate pairs are kept in a Verlet list: all pairs
+# closer than BOND_MAX_SULFUR + SKIN at the reference positions. As long as no
+# atom moved more than SKIN / 2 away from its reference position, no pair
+# outside the list can have come closer than BOND_MAX_SULFUR.
+SKIN = 0.4
+
+# Above this fraction of moved atoms the list is rebuilt from scratch.
+REBUILD_FRACTION = 0.25
+
+# neighbour_pairs numbers its cells by int64 keys, with at most this many
+# cells along each axis.
+MAX_CELLS = 1 << 20
+
+
+def neighbour_pairs(coords, cutoff, queries=None):
+    '''
+    All pairs (i, j), i < j, of atoms closer than cutoff, as sorted keys
+    i*n + j (n atoms). With 'queries' (indices) only the pairs with at least
+    one of these atoms are returned. The atoms are binned into cells of size
+    cutoff and the 27 neighbouring cells are searched, array by array.
+    '''
+    coords = numpy.asarray(coords, dtype=numpy.float64)
+    number_atoms = len(coords)
+    if queries is None:
+        queries = numpy.arange(number_atoms)
+    if not number_atoms or not len(queries):
+        return numpy.empty(0, dtype=numpy.int64)
+    
+    # One empty layer of cells on each side, so that neighbouring cells never
+    # wrap around. The cells grow beyond the cutoff if there would be more
+    # than MAX_CELLS along an axis, so that the keys fit into int64.
+    lowest = coords.min(axis=0)
+    extent = float((coords.max(axis=0) - lowest).max())
+    cell_size = max(cutoff, extent / (MAX_CELLS - 3))
+    cells = numpy.floor((coords - lowest) / cell_size).astype(numpy.int64) + 1
+    dims = cells.max(axis=0) + 2
+    def cell_keys(cells):
+        return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    keys = cell_keys(cells)
+    order = numpy.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    
+    query_cells = cells[queries]
+    cutoff_sq = cutoff * cutoff
+    found = []
+    for offset in product((-1, 0, 1), repeat=3):
+        neighbour_keys = cell_keys(query_cells + offset)
+        first = numpy.searchsorted(sorted_keys, neighbour_keys, 'left')
+        counts = numpy.searchsorted(sorted_keys, neighbour_keys, 'right') - first
+        total = counts.sum()
+        if not total:
+            continue
+        # all atoms of the neighbouring cell for each query atom
+        rows = numpy.repeat(queries, counts)
+        run_starts = numpy.cumsum(counts) - counts
+        cols = order[numpy.repeat(first - run_starts, counts)
+                     + numpy.arange(total)]
+        delta = coords[rows] - coords[cols]
+        close = numpy.einsum('ij,ij->i', delta, delta) < cutoff_sq
+        close &= rows != cols
+        rows = rows[close]
+        cols = cols[close]
+        found.append(numpy.minimum(rows, cols) * number_atoms
+                     + numpy.maximum(rows, cols))
+    if not found:
+        return numpy.empty(0, dtype=numpy.int64)
+    return numpy.unique(numpy.concatenate(found))
+
+
+def split_keys(keys, number_atoms):
+    '''The pairs (k, 2) of the keys i*n + j.'''
+    keys = numpy.asarray(keys, dtype=numpy.int64)
+    return numpy.stack((keys // number_atoms, keys % number_atoms), axis=1)
+
+
+# This is the class, which follows the bonds of a structure from frame to
+# frame. It keeps the Verlet list of candidate pairs and the reference
+# positions, and after each frame only the atoms that moved more than SKIN / 2
+# are searched again.
+class BondTracker(object):
+    __slots__ = ('hydrogen', 'sulfur', 'skin', 'reference', 'keys', 'pairs',
+                 'searches')
+    def __init__(self, short_names, coords, skin=SKIN):
+        names = numpy.array(short_names)
+        self.hydrogen = names == 'H'
+        self.sulfur = names == 'S'
+        self.skin = skin
+        self.reference = numpy.array(coords, dtype=numpy.float64)
+        # number of atoms searched, for statistics
+        self.searches = 0
+        self.set_candidates(self.candidates(None))
+
+    def candidates(self, queries):
+        '''The pairs in reach of the queries at the reference positions.'''
+        keys = neighbour_pairs(self.reference, BOND_MAX_SULFUR + self.skin,
+                               queries)
+        self.searches += len(self.reference) if queries is None else len(queries)
+        # H atoms never bond to other H atoms
+        pairs = split_keys(keys, len(self.reference))
+        return keys[~(self.hydrogen[pairs[:, 0]] & self.hydrogen[pairs[:, 1]])]
+
+    def set_candidates(self, keys):
+        self.keys = keys
+        self.pairs = split_keys(keys, len(self.reference))
+
+    def update(self, coords):
+        '''
+        Return the keys of the bonded pairs in the frame 'coords', sorted.
+        '''
+        coords = numpy.asarray(coords, dtype=numpy.float64)
+        delta = coords - self.reference
+        half_skin = 0.5 * self.skin
+        moved = numpy.flatnonzero(numpy.einsum('ij,ij->i', delta, delta)
+                                  > half_skin * half_skin)
+        if len(moved):
+            # The moved atoms get new reference positions and are searched
+            # against the reference positions of all atoms, so the list stays
+            # valid for every pair.
+            self.reference[moved] = coords[moved]
+            if len(moved) > REBUILD_FRACTION * len(coords):
+                self.set_candidates(self.candidates(None))
+            else:
+                is_moved = numpy.zeros(len(coords), dtype=bool)
+                is_moved[moved] = True
+                keep = ~(is_moved[self.pairs[:, 0]] | is_moved[self.pairs[:, 1]])
+                self.set_candidates(numpy.union1d(self.keys[keep],
+                                                  self.candidates(moved)))
+        
+        pairs = self.pairs
+        delta = coords[pairs[:, 0]] - coords[pairs[:, 1]]
+        distance_sq = numpy.einsum('ij,ij->i', delta, delta)
+        sulfur = self.sulfur[pairs[:, 0]] | self.sulfur[pairs[:, 1]]
+        bonded = (distance_sq > _MIN_SQ) & ((distance_sq < _MAX_SQ)
+                     | (sulfur & (distance_sq < _MAX_SULFUR_SQ)))
+        return self.keys[bonded]
+
+
+def iter_bond_changes(short_names, frames, skin=SKIN):
+    '''
+    Follow the bonds through 'frames', which yields (index, coords). Yields
+    (index, formed, broken) for each frame: the keys of the bonds that appear
+    and disappear compared to the frame before. In the first frame all bonds
+    are formed.
+    '''
+    tracker = None
+    previous = numpy.empty(0, dtype=numpy.int64)
+    for index, coords in frames:
+        if tracker is None:
+            tracker = BondTracker(short_names, coords, skin)
+        bonds = tracker.update(coords)
+        yield (index, numpy.setdiff1d(bonds, previous, assume_unique=True),
+               numpy.setdiff1d(previous, bonds, assume_unique=True))
+        previous = bonds
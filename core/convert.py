@@ -0,0 +1,87 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Convert .xyz and .pdb files into the binary format of core.binary, for fast
+# re-imports. Runs without Blender, from the directory of the addon:
+#
+#   python -m core.convert [--output-dir out/] files...
+#
+# All frames are converted, bonds are taken from the CONECT records of a pdb
+# file (or guessed with --guess-bonds).
+
+import argparse
+import os
+import sys
+import time
+
+from . import binary
+from .bonds import find_bonds
+from .elements import ELEMENTS, read_elements
+from .readers import read_structure
+
+
+def convert(filepath, target=None, guess_bonds=False, use_cache=True):
+    '''
+    Write all frames of an .xyz or .pdb file into a binary file, by default
+    next to it. Returns the path of the binary file.
+    '''
+    if not ELEMENTS:
+        read_elements()
+    if target is None:
+        target = os.path.splitext(filepath)[0] + binary.EXTENSION
+    structure = read_structure(filepath, '0', use_cache)
+    try:
+        if guess_bonds:
+            find_bonds(structure)
+        # the frames as they are in the file, one at a time
+        binary.write_binary(target, structure.short_names(),
+                            (coords for i, coords
+                             in structure.frames.iter_frames()),
+                            structure.bonds.pairs())
+    finally:
+        structure.close()
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert .xyz and .pdb files into the binary format.")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--output-dir', default=None,
+                        help="directory of the binary files (default: next "
+                             "to the files)")
+    parser.add_argument('--guess-bonds', action='store_true',
+                        help="guess the bonds in the first frame")
+    args = parser.parse_args(argv)
+    
+    if args.output_dir and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+    for filepath in args.files:
+        target = None
+        if args.output_dir:
+            target = os.path.join(args.output_dir, os.path.splitext(
+                        os.path.basename(filepath))[0] + binary.EXTENSION)
+        start = time.perf_counter()
+        target = convert(filepath, target, args.guess_bonds)
+        print("{} -> {} ({:.2f} s)".format(filepath, target,
+                                           time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import numpy
+
+
+# -----------------------------------------------------------------------------
+#                                                                  Half bonds
+
+# A half bond is an open cylinder from an atom to the middle of the bond. All
+# half bonds of one element are put into one mesh: bond i owns the vertices
+# 2*sectors*i to 2*sectors*(i+1), the ring around the atom first, then the ring
+# in the middle of the bond.
+
+
+def _perpendiculars(axes):
+    '''Two unit vectors perpendicular to each (unit) axis and to each other.'''
+    # cross with the z axis, or the x axis for bonds that are almost parallel
+    # to z
+    reference = numpy.zeros_like(axes)
+    parallel = numpy.abs(axes[:, 2]) > 0.9
+    reference[~parallel, 2] = 1.0
+    reference[parallel, 0] = 1.0
+    first = numpy.cross(axes, reference)
+    first /= numpy.linalg.norm(first, axis=1)[:, None]
+    second = numpy.cross(axes, first)
+    return first, second
+
+
+def half_bond_vertices(starts, ends, radius, sectors):
+    '''
+    Vertices of the half bonds from starts towards ends, (n*2*sectors, 3).
+    The radius is one value for all bonds or an array with one per bond.
+    '''
+    if numpy.ndim(radius):
+        radius = numpy.asarray(radius, dtype=numpy.float64)[:, None, None]
+    starts = numpy.asarray(starts, dtype=numpy.float64)
+    ends = numpy.asarray(ends, dtype=numpy.float64)
+    half = (ends - starts) * 0.5
+    length = numpy.linalg.norm(half, axis=1)
+    axes = numpy.zeros_like(half)
+    axes[:, 2] = 1.0
+    # bonds of zero length keep the z axis, they are invisible anyway
+    nonzero = length > 0.0
+    axes[nonzero] = half[nonzero] / length[nonzero, None]
+    first, second = _perpendiculars(axes)
+
+    angles = numpy.linspace(0.0, 2.0 * numpy.pi, sectors, endpoint=False)
+    # (n, sectors, 3) offsets of the ring vertices from the axis
+    ring = radius * (first[:, None, :] * numpy.cos(angles)[None, :, None]
+                     + second[:, None, :] * numpy.sin(angles)[None, :, None])
+
+    vertices = numpy.empty((len(starts), 2, sectors, 3))
+    vertices[:, 0] = starts[:, None, :] + ring
+    vertices[:, 1] = (starts + half)[:, None, :] + ring
+    return vertices.reshape(-1, 3)
+
+
+def half_bond_faces(number_bonds, sectors):
+    '''Quads of the half bonds, (number_bonds*sectors, 4) vertex indices.'''
+    k = numpy.arange(sectors)
+    k_next = (k + 1) % sectors
+    # quads of the first bond, the others are shifted by 2*sectors each
+    quads = numpy.stack((k, k_next, k_next + sectors, k + sectors), axis=1)
+    offsets = numpy.arange(number_bonds) * 2 * sectors
+    return (offsets[:, None, None] + quads[None, :, :]).reshape(-1, 4)
+
+
+# -----------------------------------------------------------------------------
+#                                                                  Atom balls
+
+# The balls and cubes of the atoms are built from arrays as well, so no
+# operator has to be called. Faces are returned in groups of equal size: quads
+# (m, 4) and triangles (k, 3).
+
+
+def uv_sphere(segments, rings, radius):
+    '''
+    Vertices, quads and triangles of a UV sphere around the origin, like the
+    one of primitive_uv_sphere_add (segments around, rings from pole to pole).
+    '''
+    segments = max(segments, 3)
+    rings = max(rings, 3)
+    # polar and azimuthal angles of the vertices between the poles
+    theta = numpy.linspace(0.0, numpy.pi, rings + 1)[1:-1]
+    phi = numpy.linspace(0.0, 2.0 * numpy.pi, segments, endpoint=False)
+    ring = numpy.empty((rings - 1, segments, 3))
+    ring[..., 0] = numpy.sin(theta)[:, None] * numpy.cos(phi)[None, :]
+    ring[..., 1] = numpy.sin(theta)[:, None] * numpy.sin(phi)[None, :]
+    ring[..., 2] = numpy.cos(theta)[:, None]
+    vertices = numpy.vstack(((0.0, 0.0, 1.0), ring.reshape(-1, 3),
+                             (0.0, 0.0, -1.0))) * radius
+
+    # index of the vertex at ring r and segment s, the north pole is 0
+    index = 1 + numpy.arange((rings - 1) * segments).reshape(rings - 1, segments)
+    index_next = numpy.roll(index, -1, axis=1)
+    south = len(vertices) - 1
+    quads = numpy.stack((index[:-1], index[1:], index_next[1:], index_next[:-1]),
+                        axis=2).reshape(-1, 4)
+    triangles = numpy.vstack((
+        numpy.stack((numpy.zeros(segments, dtype=int), index[0], index_next[0]),
+                    axis=1),
+        numpy.stack((index[-1], numpy.full(segments, south), index_next[-1]),
+                    axis=1)))
+    return vertices, quads, triangles
+
+
+def cube(radius):
+    '''Vertices and quads of a cube with edges of length 2*radius.'''
+    vertices = numpy.array([(x, y, z) for x in (-1.0, 1.0)
+                                      for y in (-1.0, 1.0)
+                                      for z in (-1.0, 1.0)]) * radius
+    quads = numpy.array([(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1),
+                         (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)])
+    return vertices, quads
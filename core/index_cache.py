@@ -0,0 +1,140 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# A persistent cache for the frame index of trajectory files. The index of a
+# file is stored in the user cache directory, keyed by the path, size and
+# modification time of the file, so it is invalidated as soon as the file
+# changes.
+
+import hashlib
+import os
+import sys
+import tempfile
+
+import numpy
+
+# Files smaller than this are indexed faster than the cache is read.
+MIN_FILE_SIZE = 1 << 20
+# Upper limit for the total size of the cache, least recently used entries
+# are removed first.
+MAX_CACHE_SIZE = 64 << 20
+
+
+def default_cache_dir():
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(base, 'molecule_importer', 'frame_index')
+
+
+def file_key(filepath):
+    '''
+    Return the key of a file: its absolute path, size and modification time.
+    '''
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    return filepath, stat.st_size, stat.st_mtime_ns
+
+
+def cache_path(key, cache_dir=None):
+    name = hashlib.sha1(key[0].encode('utf-8')).hexdigest() + '.npz'
+    return os.path.join(cache_dir or default_cache_dir(), name)
+
+
+def load_index(filepath, cache_dir=None):
+    '''
+    Return the cached index of a file as a dict of arrays, or None if there is
+    no valid entry.
+    '''
+    try:
+        key = file_key(filepath)
+        path = cache_path(key, cache_dir)
+        with numpy.load(path, allow_pickle=False) as entry:
+            if (str(entry['path']) != key[0] or int(entry['size']) != key[1]
+                or int(entry['mtime']) != key[2]):
+                return None
+            index = dict((name, entry[name]) for name in entry.files)
+        # mark the entry as recently used
+        os.utime(path, None)
+        return index
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_index(filepath, index, cache_dir=None, max_size=MAX_CACHE_SIZE):
+    '''
+    Store the index of a file (a dict of arrays) and evict old entries. Files
+    smaller than MIN_FILE_SIZE are not cached.
+    '''
+    try:
+        key = file_key(filepath)
+        if key[1] < MIN_FILE_SIZE:
+            return
+        path = cache_path(key, cache_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first, so an entry is never half written.
+        # Its name is unique, so that imports of the same file at the same
+        # time (e.g. on a render farm) don't write into the same file.
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path),
+                                         suffix='.tmp',
+                                         delete=False) as tmp_file:
+            try:
+                numpy.savez(tmp_file, path=key[0], size=key[1],
+                            mtime=key[2], **index)
+            except BaseException:
+                tmp_file.close()
+                os.remove(tmp_file.name)
+                raise
+        os.replace(tmp_file.name, path)
+        evict(os.path.dirname(path), max_size)
+    except OSError as error:
+        print("Frame index not cached: {}".format(error))
+
+
+def evict(cache_dir, max_size=MAX_CACHE_SIZE):
+    '''
+    Remove the least recently used entries until the cache fits into max_size.
+    '''
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.npz'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def clear(cache_dir=None):
+    evict(cache_dir or default_cache_dir(), 0)
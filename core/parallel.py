@@ -0,0 +1,183 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import mmap
+import os
+import sys
+import types
+import multiprocessing
+import multiprocessing.spawn
+import numpy
+
+from . import trajectory, transform
+
+
+# -----------------------------------------------------------------------------
+#                                                      Parallel frame decoding
+
+# The frames of a trajectory decode independently of each other, so they are
+# split into chunks of CHUNK_FRAMES frames, which are decoded by a pool of
+# processes. The workers are spawned, not forked: Blender runs other threads
+# (the UI, timers, the background reads of core.background), and a forked
+# child can hang on a lock that one of them held. A worker gets the path of
+# the file and the positions of its frames, maps the file itself and sends
+# back the coordinate arrays. It only imports numpy and this package, not the
+# addon (and bpy), see WORKER_SETUP.
+CHUNK_FRAMES = 16
+
+# With 'workers' set to 0 (automatic) a pool is only used on a machine with
+# more than one core, for files of at least this size (in bytes). Starting
+# the workers takes about a second, for smaller files the frames are decoded
+# faster in this process.
+PARALLEL_MIN_BYTES = 64 << 20
+
+# The Python interpreter that runs the workers, None: sys.executable. Blender
+# 2.7x is its own sys.executable, the addon sets this to the Python binary
+# that comes with Blender.
+EXECUTABLE = None
+
+# Run by each worker before it gets the first chunk. The workers get the
+# sys.path of this process. If this package is part of an addon, the package
+# of the addon is put into sys.modules as an empty package first, so that its
+# __init__ (which imports bpy) is not run when core is imported.
+WORKER_SETUP = """
+import sys, types
+name, path = {package!r}, {path!r}
+if name and name not in sys.modules:
+    package = types.ModuleType(name)
+    package.__path__ = [path]
+    sys.modules[name] = package
+"""
+
+
+def _decode(task):
+    # in a worker: decode the frames between the offsets in 'spans'
+    filepath, file_format, spans, number_atoms, dtype = task
+    coords = numpy.empty((len(spans), number_atoms, 3), dtype=dtype)
+    with open(filepath, "rb") as frame_file:
+        buffer = mmap.mmap(frame_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for k, (start, end) in enumerate(spans):
+                frame = trajectory.decode_frame(buffer, file_format,
+                                                int(start), int(end),
+                                                number_atoms, dtype)
+                if len(frame) != number_atoms:
+                    raise ValueError("A frame has {} atoms instead of "
+                                     "{}.".format(len(frame), number_atoms))
+                coords[k] = frame
+        finally:
+            buffer.close()
+    return coords
+
+
+def number_workers(frames, number_frames, workers=0):
+    '''
+    The number of processes that decode number_frames frames of 'frames' (a
+    trajectory.Trajectory). 0 (automatic) uses one per core for files of at
+    least PARALLEL_MIN_BYTES, and decodes smaller files in this process.
+    '''
+    cores = os.cpu_count() or 1
+    if workers <= 0:
+        size = os.path.getsize(frames.filepath)
+        workers = cores if cores > 1 and size >= PARALLEL_MIN_BYTES else 1
+    if number_frames <= CHUNK_FRAMES:
+        return 1
+    return workers
+
+
+def start_pool(workers):
+    '''
+    Spawn a pool of 'workers' processes with WORKER_SETUP. Any main module of
+    this process (e.g. a script run by blender -P) is hidden from them: they
+    would run it again, and it may need bpy.
+    '''
+    context = multiprocessing.get_context('spawn')
+    package, path = None, None
+    parts = __name__.split('.')
+    if len(parts) > 2:
+        package = parts[0]
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    setup = WORKER_SETUP.format(package=package, path=path)
+    
+    main = sys.modules['__main__']
+    executable = multiprocessing.spawn.get_executable()
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        if EXECUTABLE:
+            context.set_executable(EXECUTABLE)
+        return context.Pool(workers, exec, (setup,))
+    finally:
+        sys.modules['__main__'] = main
+        context.set_executable(executable)
+
+
+def iter_frames(frames, indices, workers=1, chunk_size=CHUNK_FRAMES):
+    '''
+    Yield (index, coordinates) for the frames of 'frames' (a
+    trajectory.Trajectory) with the given indices, in order. 'workers' is the
+    number of processes, 0 chooses it by number_workers.
+    '''
+    indices = list(indices)
+    workers = number_workers(frames, len(indices), workers)
+    if workers == 1 or len(indices) <= chunk_size:
+        for item in frames.iter_frames(indices):
+            yield item
+        return
+    
+    chunks = [indices[k:k + chunk_size]
+              for k in range(0, len(indices), chunk_size)]
+    tasks = [(frames.filepath, frames.format, frames.spans[chunk],
+              frames.number_atoms, frames.dtype) for chunk in chunks]
+    workers = min(workers, len(chunks))
+    # One chunk per worker at a time: the next block is decoded while the
+    # frames of the current one are used, and at most two blocks of frames
+    # are held in memory.
+    blocks = [range(k, min(k + workers, len(chunks)))
+              for k in range(0, len(chunks), workers)]
+    
+    pool = start_pool(workers)
+    try:
+        pending = pool.map_async(_decode, [tasks[c] for c in blocks[0]])
+        for b, block in enumerate(blocks):
+            results = pending.get()
+            if b + 1 < len(blocks):
+                pending = pool.map_async(_decode,
+                                         [tasks[c] for c in blocks[b + 1]])
+            for c, coords in zip(block, results):
+                # centered and scaled here, as by Trajectory.frames
+                transform.transform(coords, frames.center, frames.weights,
+                                    frames.scale)
+                for i, frame in zip(chunks[c], coords):
+                    yield i, frame
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def read_frames(frames, indices, workers=1, chunk_size=CHUNK_FRAMES):
+    '''
+    Return the coordinates of the frames with the given indices as one array
+    of shape (frames, atoms, 3), decoded by 'workers' processes.
+    '''
+    indices = list(indices)
+    coords = numpy.empty((len(indices), frames.number_atoms, 3),
+                         dtype=frames.dtype)
+    for k, (i, frame) in enumerate(iter_frames(frames, indices, workers,
+                                               chunk_size)):
+        coords[k] = frame
+    return coords
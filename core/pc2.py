@@ -0,0 +1,112 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import struct
+
+import numpy
+
+
+# -----------------------------------------------------------------------------
+#                                                              Point cache (PC2)
+
+# A PC2 file is what Blender's Mesh Cache modifier reads: a header, followed by
+# the vertex coordinates of all samples (frames) as little endian float32,
+# sample after sample. The file is written frame by frame, so a trajectory
+# never has to be held in memory, and reading one frame means reading one
+# block of the file.
+#
+# header: 'POINTCACHE2\0', version (1), number of points, start frame,
+#         sample rate, number of samples
+PC2_HEADER = struct.Struct('<12siiffi')
+PC2_MAGIC = b'POINTCACHE2\0'
+
+
+class PC2Writer(object):
+    def __init__(self, filepath, number_points, number_samples,
+                 start_frame=0.0, sample_rate=1.0):
+        self.filepath = filepath
+        self.number_points = number_points
+        self.number_samples = number_samples
+        self.start_frame = start_frame
+        self.sample_rate = sample_rate
+        self.count = 0
+        self._file = open(filepath, 'wb')
+        self._write_header()
+    
+    def _write_header(self):
+        self._file.write(PC2_HEADER.pack(PC2_MAGIC, 1, self.number_points,
+                                         self.start_frame, self.sample_rate,
+                                         self.number_samples))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def write(self, coords):
+        '''Append one sample, the coordinates of all points (points, 3).'''
+        coords = numpy.ascontiguousarray(coords, dtype='<f4')
+        if coords.shape != (self.number_points, 3):
+            raise ValueError("Expected {} points, got an array of shape {}."
+                             .format(self.number_points, coords.shape))
+        self._file.write(coords.tobytes())
+        self.count += 1
+    
+    def close(self):
+        if self._file.closed:
+            return
+        # fix the header, if fewer samples were written than announced
+        if self.count != self.number_samples:
+            self.number_samples = self.count
+            self._file.seek(0)
+            self._write_header()
+        self._file.close()
+
+
+def read_header(pc2_file):
+    '''
+    Return (number of points, start frame, sample rate, number of samples) of
+    an open PC2 file.
+    '''
+    pc2_file.seek(0)
+    magic, version, points, start, rate, samples = PC2_HEADER.unpack(
+                                        pc2_file.read(PC2_HEADER.size))
+    if magic != PC2_MAGIC:
+        raise ValueError("Not a PC2 file: {}".format(pc2_file.name))
+    return points, start, rate, samples
+
+
+def read_sample(filepath, i):
+    '''Read only sample i of a PC2 file, as an array (points, 3).'''
+    with open(filepath, 'rb') as pc2_file:
+        points, start, rate, samples = read_header(pc2_file)
+        if not 0 <= i < samples:
+            raise IndexError("Sample {} of {}".format(i, samples))
+        pc2_file.seek(PC2_HEADER.size + i * points * 12)
+        return numpy.fromfile(pc2_file, dtype='<f4',
+                              count=points * 3).reshape(points, 3)
+
+
+def read_pc2(filepath):
+    '''Read all samples of a PC2 file, as an array (samples, points, 3).'''
+    with open(filepath, 'rb') as pc2_file:
+        points, start, rate, samples = read_header(pc2_file)
+        return numpy.fromfile(pc2_file, dtype='<f4',
+                              count=samples * points * 3).reshape(samples,
+                                                                  points, 3)
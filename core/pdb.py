@@ -0,0 +1,250 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+
+# -----------------------------------------------------------------------------
+#                                                               Fixed columns
+
+# The records of a pdb file have fixed columns. Instead of slicing every line
+# into strings, the columns of all lines of a span of the file are copied into
+# one byte array (lines, width) by a single fancy index, and decoded as
+# arrays: the coordinates from their digits, the rest as numpy strings.
+# Columns beyond the end of a line read as blanks.
+
+BLANK = ord(' ')
+
+# The columns are copied in blocks of this many lines, which keeps the index
+# arrays small.
+CHUNK_LINES = 1 << 16
+
+# The kind of each record name, the records of one kind are decoded together.
+# Other records are skipped. A name matches the first columns of a line, as
+# many as it is long: 'ATOM' is matched on 4 columns, as files without the
+# blanks after it exist.
+RECORDS = {b'ATOM': 'atom', b'HETATM': 'atom', b'CONECT': 'conect'}
+
+# The columns (first, end) of the fields that are read, counted from 0.
+SERIAL = (6, 11)
+COORDS = (30, 54)
+ELEMENT = (76, 78)
+# CONECT: the atom, followed by its partners in fields of 5 columns
+CONECT_ATOM = (6, 11)
+CONECT_FIRST = 11
+CONECT_WIDTH = 5
+
+
+def line_spans(data, start, end):
+    '''
+    The (starts, ends) of the lines in data[start:end] (a uint8 array), the
+    ends without the line break.
+    '''
+    breaks = numpy.flatnonzero(data[start:end] == 10) + start
+    starts = numpy.concatenate(([start], breaks + 1))
+    ends = numpy.concatenate((breaks, [end]))
+    keep = starts < ends
+    starts, ends = starts[keep], ends[keep]
+    # Windows line breaks
+    if len(ends):
+        ends -= data[ends - 1] == 13
+    return starts, ends
+
+
+def column_block(data, starts, ends, first, last):
+    '''The columns first:last of the lines as bytes, (lines, last - first).'''
+    width = last - first
+    if len(data) >= width and ((ends - starts) >= last).all():
+        # Every line has the columns: they are rows of a view of data, which
+        # holds the 'width' bytes from each offset.
+        windows = as_strided(data, shape=(len(data) - width + 1, width),
+                             strides=(data.strides[0], data.strides[0]))
+        return windows[starts + first]
+    block = numpy.empty((len(starts), width), dtype=numpy.uint8)
+    offsets = numpy.arange(first, last)
+    for k in range(0, len(starts), CHUNK_LINES):
+        index = starts[k:k + CHUNK_LINES, None] + offsets
+        inside = index < ends[k:k + CHUNK_LINES, None]
+        block[k:k + CHUNK_LINES] = numpy.where(
+                inside, data[numpy.minimum(index, len(data) - 1)], BLANK)
+    return block
+
+
+def columns(data, starts, ends, first, last):
+    '''
+    The columns first:last of the lines as a numpy array of byte strings of
+    width last - first.
+    '''
+    block = column_block(data, starts, ends, first, last)
+    return block.view('S{}'.format(last - first)).ravel()
+
+
+def to_float(block, dtype=numpy.float64):
+    '''
+    The numbers in the rows of block (fields, width), fixed point numbers
+    with the dot in the same column, like '  -12.345' in the coordinates of
+    a pdb file. The digits are weighted by their place values in one matrix
+    product, which is much faster than converting strings. Returns None for
+    any other layout, then the caller converts the strings.
+    '''
+    if not len(block):
+        return numpy.empty(0, dtype=dtype)
+    width = block.shape[1]
+    digits = block - numpy.uint8(48)
+    is_digit = digits < 10
+    # '.' and '-' are below '0'
+    is_dot = digits == 254
+    is_minus = digits == 253
+    dots = numpy.flatnonzero(is_dot[0])
+    if len(dots) != 1:
+        return None
+    dot = int(dots[0])
+    # one dot per field, in the same column, and nothing but digits, signs
+    # and blanks (the masks don't overlap, so their counts add up)
+    if not (is_dot[:, dot].all() and numpy.count_nonzero(is_dot) == len(block)
+            and numpy.count_nonzero(is_digit) + len(block)
+                + numpy.count_nonzero(is_minus)
+                + numpy.count_nonzero(block == BLANK) == block.size):
+        return None
+    # Place values of the columns without the dot, as integers (e.g. 1000,
+    # 100, 10, 1, 0, 100, 10, 1), so that the sums are exact. The decimals
+    # are divided out at the end. Sums of up to 7 digits are exact in
+    # float32, which halves the work of the product.
+    right = numpy.arange(width - 1, -1, -1) - (numpy.arange(width) < dot)
+    sum_type = numpy.float32 if width <= 8 else numpy.float64
+    weights = (10.0 ** right).astype(sum_type)
+    weights[dot] = 0.0
+    digits *= is_digit
+    value = numpy.matmul(digits.astype(sum_type), weights).astype(numpy.float64)
+    value /= 10.0 ** (width - 1 - dot)
+    # a field with a minus sign, for 8 columns one 64 bit word per field
+    if width == 8:
+        signs = is_minus.view(numpy.uint64).ravel()
+    else:
+        signs = numpy.matmul(is_minus.view(numpy.uint8),
+                             numpy.ones(width, dtype=numpy.uint8))
+    numpy.negative(value, out=value, where=signs > 0)
+    return value.astype(dtype, copy=False)
+
+
+def to_int(block):
+    '''
+    Integers of the rows of block (fields, width), right aligned numbers like
+    the serial numbers of a pdb file, blank fields are 0. The digits are
+    weighted by their place values in one matrix product, any other layout
+    (e.g. signs, hexadecimal serials) is converted as strings.
+    '''
+    if not len(block):
+        return numpy.empty(0, dtype=numpy.int64)
+    width = block.shape[1]
+    digits = block - numpy.uint8(48)
+    is_digit = digits < 10
+    # only blanks before the digits
+    if ((is_digit | (block == BLANK)).all()
+        and not (is_digit[:, :-1] & ~is_digit[:, 1:]).any()):
+        digits *= is_digit
+        weights = 10.0 ** numpy.arange(width - 1, -1, -1)
+        return numpy.matmul(digits, weights).astype(numpy.int64)
+    fields = numpy.char.strip(block.view('S{}'.format(width)).ravel())
+    fields[fields == b''] = b'0'
+    return fields.astype(numpy.int64)
+
+
+def dispatch(data, start, end):
+    '''
+    Sort the lines in data[start:end] by the kind of their record (RECORDS),
+    in one pass. Returns a dict of kind: (starts, ends) of its lines, in the
+    order of the file.
+    '''
+    starts, ends = line_spans(data, start, end)
+    # the first columns of the lines, for each length of a name
+    names = {}
+    kinds = {}
+    for name, kind in RECORDS.items():
+        if len(name) not in names:
+            names[len(name)] = columns(data, starts, ends, 0, len(name))
+        is_kind = names[len(name)] == name
+        kinds[kind] = kinds[kind] | is_kind if kind in kinds else is_kind
+    return dict((kind, (starts[mask], ends[mask]))
+                for kind, mask in kinds.items())
+
+
+# -----------------------------------------------------------------------------
+#                                                                    Records
+
+def decode_coords(data, starts, ends, dtype=numpy.float64):
+    '''The coordinates of ATOM/HETATM records, (atoms, 3).'''
+    block = column_block(data, starts, ends, *COORDS).reshape(-1, 8)
+    values = to_float(block, dtype)
+    if values is None:
+        values = block.view('S8').astype(dtype)
+    return values.reshape(-1, 3)
+
+
+def decode_atoms(data, starts, ends):
+    '''
+    The serial numbers and the element symbols (capitalized, e.g. 'Fe') of
+    ATOM/HETATM records.
+    '''
+    serials = to_int(column_block(data, starts, ends, *SERIAL))
+    # The symbols are decoded once per kind, not once per atom.
+    elements, codes = numpy.unique(columns(data, starts, ends, *ELEMENT),
+                                   return_inverse=True)
+    symbols = numpy.array([element.decode('ascii', 'replace').strip()
+                           .capitalize() for element in elements.tolist()],
+                          dtype=str)
+    return serials, symbols[codes.ravel()]
+
+
+def decode_conect(data, starts, ends):
+    '''
+    The bonds of CONECT records as pairs of serial numbers (k, 2). Partners
+    0 (written by HyperChem) are dropped.
+    '''
+    if not len(starts):
+        return numpy.empty((0, 2), dtype=numpy.int64)
+    atoms = to_int(column_block(data, starts, ends, *CONECT_ATOM))
+    number_fields = max(int((ends - starts).max()) - CONECT_FIRST, 0) \
+                    // CONECT_WIDTH
+    if not number_fields:
+        return numpy.empty((0, 2), dtype=numpy.int64)
+    last = CONECT_FIRST + number_fields * CONECT_WIDTH
+    partners = to_int(column_block(data, starts, ends, CONECT_FIRST,
+                                   last).reshape(-1, CONECT_WIDTH))
+    partners = partners.reshape(-1, number_fields)
+    pairs = numpy.empty((partners.size, 2), dtype=numpy.int64)
+    pairs[:, 0] = numpy.repeat(atoms, number_fields)
+    pairs[:, 1] = partners.ravel()
+    return pairs[(pairs[:, 0] > 0) & (pairs[:, 1] > 0)]
+
+
+def serial_pairs_to_indices(pairs, serials):
+    '''
+    The bonds given as serial numbers as pairs of atom indices (the position
+    of the serial in 'serials'). Bonds to atoms that are not in serials are
+    dropped.
+    '''
+    if not len(serials):
+        return numpy.empty((0, 2), dtype=numpy.int64)
+    order = numpy.argsort(serials, kind='stable')
+    sorted_serials = serials[order]
+    position = numpy.minimum(numpy.searchsorted(sorted_serials, pairs),
+                             len(serials) - 1)
+    found = (sorted_serials[position] == pairs).all(axis=1)
+    return order[position[found]]
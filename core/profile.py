@@ -0,0 +1,167 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    # not on Windows
+    resource = None
+
+# Version of the report written by write_report, raised when its keys change.
+REPORT_VERSION = 2
+
+# If False, stage_done records nothing, so the instrumentation costs a call to
+# the clock per stage.
+ENABLED = True
+
+
+# -----------------------------------------------------------------------------
+#                                                                      Stages
+
+# This is the class, which holds what is known about one stage (span) of an
+# import: the seconds spent in it, how often it was entered, the number of
+# items it worked on (e.g. atoms, bonds or frames) and the memory it took: by
+# how much the resident set size of the process changed ('memory_change') and
+# by how much its largest resident set size grew ('peak_increase') during the
+# stage, in bytes. The memory is measured from the end of the previous stage,
+# None if the platform does not tell.
+class Span(object):
+    __slots__ = ('name', 'seconds', 'calls', 'counts', 'memory_change',
+                 'peak_increase')
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.counts = OrderedDict()
+        self.memory_change = None
+        self.peak_increase = None
+    
+    def as_dict(self):
+        return OrderedDict((('name', self.name), ('seconds', self.seconds),
+                            ('calls', self.calls), ('counts', self.counts),
+                            ('memory_change', self.memory_change),
+                            ('peak_increase', self.peak_increase)))
+
+
+# The stages of the last import (and its frames), in the order they were
+# entered first.
+SPANS = OrderedDict()
+
+# The memory (current_memory(), peak_memory()) at the end of the last stage.
+_MEMORY = [None, None]
+
+
+def peak_memory():
+    '''
+    The largest resident set size of the process so far in bytes, or None if
+    the platform does not tell.
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_memory():
+    '''
+    The resident set size of the process in bytes, or None if the platform
+    does not tell (only read from /proc, on Linux).
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def _difference(after, before):
+    return None if after is None or before is None else after - before
+
+
+def reset():
+    '''Forget the stages of the previous import.'''
+    SPANS.clear()
+    _MEMORY[:] = current_memory(), peak_memory()
+
+
+def stage_done(name, start, **counts):
+    '''
+    Add the time since 'start' to the stage 'name', and the numbers of items
+    in 'counts' (e.g. atoms=...) to its counts. Returns the current time, the
+    start of the next stage.
+    '''
+    current = time.perf_counter()
+    if not ENABLED:
+        return current
+    span = SPANS.get(name)
+    if span is None:
+        span = SPANS[name] = Span(name)
+    span.seconds += current - start
+    span.calls += 1
+    for key, value in counts.items():
+        span.counts[key] = span.counts.get(key, 0) + int(value)
+    memory = current_memory(), peak_memory()
+    # added up, like the seconds, if the stage is entered again
+    for field, after, before in zip(('memory_change', 'peak_increase'),
+                                    memory, _MEMORY):
+        change = _difference(after, before)
+        if change is not None:
+            setattr(span, field, (getattr(span, field) or 0) + change)
+    _MEMORY[:] = memory
+    # the bookkeeping is not part of the next stage
+    return time.perf_counter()
+
+
+def stage_times():
+    '''The seconds spent in each stage, in the order of the stages.'''
+    return OrderedDict((name, span.seconds) for name, span in SPANS.items())
+
+
+# -----------------------------------------------------------------------------
+#                                                                      Report
+
+def report(**info):
+    '''
+    The stages of the last import as a dict that can be written as JSON. The
+    keyword arguments (e.g. the file, the version, the settings) are added
+    as they are.
+    '''
+    result = OrderedDict((('report_version', REPORT_VERSION),
+                          ('time', time.strftime('%Y-%m-%dT%H:%M:%S'))))
+    result.update(sorted(info.items()))
+    result['total'] = sum(span.seconds for span in SPANS.values())
+    result['peak_memory'] = peak_memory()
+    result['stages'] = [span.as_dict() for span in SPANS.values()]
+    return result
+
+
+def write_report(filepath, result):
+    '''
+    Append the report to the file as one line of JSON (JSON Lines), so that
+    one file collects the reports of many imports, e.g. to compare versions.
+    '''
+    with open(filepath, "a") as report_file:
+        report_file.write(json.dumps(result) + "\n")
@@ -0,0 +1,41 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import time
+
+
+# This is the class, which reports the progress of a long loop on the terminal.
+# The output is throttled to one line every 'interval' seconds, as printing a
+# line per item slows down the loop it reports on.
+class Progress(object):
+    __slots__ = ('label', 'total', 'interval', 'last_time')
+    def __init__(self, label, total, interval=0.5):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.last_time = time.perf_counter()
+    
+    def update(self, count):
+        current = time.perf_counter()
+        if current - self.last_time >= self.interval:
+            self.last_time = current
+            print("\r  {}: {}/{}".format(self.label, count, self.total),
+                  end='', flush=True)
+    
+    def finish(self):
+        print("\r  {}: {}/{}".format(self.label, self.total, self.total))
@@ -0,0 +1,119 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+from . import binary, pdb, trajectory
+from .elements import get_element
+from .structure import ElementGroup, Structure, group_atoms, make_bonds
+
+
+# -----------------------------------------------------------------------------
+#                                                                     Readers
+
+# The readers only decode the first frame, the other frames are decoded on
+# demand by the trajectory of the structure. If the indices of the frames
+# that are going to be used are given ('frames'), a text file is only read up
+# to the last of them (see trajectory.Trajectory). 'progress' (e.g. a
+# core.background.TaskProgress) gets the number of bytes of the file indexed,
+# and finish() when the first frame is decoded. read_elements() must have been
+# called before.
+
+
+def read_structure(filepath, radiustype, use_cache=True, frames=None,
+                   progress=None):
+    '''Read a .xyz, .pdb or binary file, depending on the extension.'''
+    if filepath[-3:] == 'xyz':
+        return read_xyz_file(filepath, radiustype, use_cache, frames, progress)
+    elif filepath[-3:] == 'pdb':
+        return read_pdb_file(filepath, radiustype, use_cache, frames, progress)
+    elif filepath.endswith(binary.EXTENSION):
+        return read_binary_file(filepath, radiustype, progress)
+    raise ValueError("Unknown file format: {}".format(filepath))
+
+
+# filepath_xyz: path to xyz file
+def read_xyz_file(filepath_xyz, radiustype, use_cache=True, frames=None,
+                  progress=None):
+    # Only the positions of the frames are read here, the first frame is the
+    # only one that is decoded.
+    frames = trajectory.Trajectory(filepath_xyz, use_cache=use_cache,
+                                   frames=frames, progress=progress)
+    # The atoms are the same in all frames.
+    structure = make_structure(frames.symbols, frames[0], frames, radiustype)
+    return finish(structure, progress)
+
+
+def read_pdb_file(filepath_pdb, radiustype, use_cache=True, frames=None,
+                  progress=None):
+    # Only the positions of the models and of the CONECT records are read
+    # here, the other models are decoded on demand. The first model and the
+    # CONECT records are decoded as arrays (see core.pdb), the atoms stay in
+    # the order of the file.
+    frames = trajectory.Trajectory(filepath_pdb, use_cache=use_cache,
+                                   frames=frames, progress=progress)
+    serials, symbols, coords, serial_pairs = frames.pdb_topology()
+    # The structure is made from the first model, with all CONECT records
+    # (which usually follow the last model). Bonds to atoms that are not in
+    # the structure are dropped.
+    pairs = pdb.serial_pairs_to_indices(serial_pairs, serials)
+    structure = make_structure(symbols, coords, frames, radiustype, pairs)
+    return finish(structure, progress)
+
+
+def read_binary_file(filepath, radiustype, progress=None):
+    # The elements, bonds and frame offsets are arrays in the file, nothing is
+    # parsed.
+    frames = trajectory.Trajectory(filepath)
+    structure = make_structure(frames.symbols, frames[0], frames, radiustype,
+                               frames.bonds)
+    return finish(structure, progress)
+
+
+def finish(structure, progress):
+    '''
+    Report the end of reading to 'progress' and return the structure. Its
+    file is closed, if the report raises (core.background.Cancelled).
+    '''
+    if progress is not None:
+        try:
+            progress.finish()
+        except BaseException:
+            structure.close()
+            raise
+    return structure
+
+
+def make_structure(symbols, coords, frames, radiustype, pairs=()):
+    '''
+    Make a Structure from the short names of the atoms as they are in the file
+    ('symbols'), the coordinates of the first frame and the bonds as pairs of
+    atom indices. The element data is looked up once per symbol, not per
+    atom.
+    '''
+    symbols, symbol_codes = group_atoms(symbols)
+    entries = [get_element(short_name, radiustype) for short_name in symbols]
+    # The atoms are grouped by their long names. A group takes the short name
+    # of its first atom.
+    long_names, group_of_symbol = group_atoms([entry[1] for entry in entries])
+    groups = []
+    for entry, k in zip(entries, group_of_symbol.tolist()):
+        if k == len(groups):
+            short_name, long_name, radius, color = entry
+            groups.append(ElementGroup(long_name, short_name, radius, color))
+    elements = group_of_symbol[symbol_codes]
+    return Structure(groups, elements, coords, frames,
+                     make_bonds(pairs, len(coords)))
@@ -0,0 +1,158 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import numpy
+
+
+# -----------------------------------------------------------------------------
+#                                                                   Atom data
+
+# A structure is stored as arrays, there are no objects per atom: the
+# coordinates of all atoms in one array, an element code per atom and the
+# bonds as an adjacency in compressed sparse row (CSR) form. What all atoms of
+# one element share is stored once, in an ElementGroup.
+
+
+# This is the class, which stores the properties of the atoms of one element
+# in a structure. The material is only set by the Blender layer.
+class ElementGroup(object):
+    __slots__ = ('long_name', 'short_name', 'radius', 'color', 'material')
+    def __init__(self, long_name, short_name, radius, color, material=None):
+        self.long_name = long_name
+        self.short_name = short_name
+        self.radius = radius
+        self.color = color
+        self.material = material
+
+
+# This is the class, which holds the bonds of a structure as a CSR adjacency:
+# the partners of atom i are indices[indptr[i]:indptr[i+1]], sorted. Every
+# bond is stored in both directions.
+class Bonds(object):
+    __slots__ = ('indptr', 'indices')
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+    
+    def __len__(self):
+        '''The number of bonds.'''
+        return len(self.indices) // 2
+    
+    def partners(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+    
+    def degrees(self):
+        '''The number of bonds of each atom.'''
+        return numpy.diff(self.indptr)
+    
+    def half_bonds(self):
+        '''
+        Both atoms of each bond in both directions, (2 * bonds, 2), sorted by
+        the first atom.
+        '''
+        return numpy.stack((numpy.repeat(numpy.arange(len(self.indptr) - 1),
+                                         self.degrees()),
+                            self.indices), axis=1)
+    
+    def pairs(self):
+        '''Each bond once, as (i, j) with i < j, (bonds, 2).'''
+        half_bonds = self.half_bonds()
+        return half_bonds[half_bonds[:, 0] < half_bonds[:, 1]]
+
+
+def make_bonds(pairs, number_atoms):
+    '''
+    The Bonds of the atom pairs (k, 2). Pairs may come in any order and in
+    one or both directions, bonds of an atom to itself are dropped.
+    '''
+    pairs = numpy.asarray(pairs, dtype=numpy.int64).reshape(-1, 2)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    # Both directions, as sorted unique keys i*n + j, which sort much faster
+    # than the rows of pairs.
+    keys = numpy.sort(numpy.concatenate((pairs[:, 0] * number_atoms
+                                         + pairs[:, 1],
+                                         pairs[:, 1] * number_atoms
+                                         + pairs[:, 0])))
+    keys = keys[numpy.concatenate((keys[:1] == keys[:1],
+                                   keys[1:] != keys[:-1]))]
+    indptr = numpy.zeros(number_atoms + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(keys // number_atoms, minlength=number_atoms),
+                 out=indptr[1:])
+    return Bonds(indptr, (keys % number_atoms).astype(numpy.int32))
+
+
+# This is the class, which holds what was read from a file:
+#
+# groups:   the ElementGroup of each element, in the order in which the
+#           elements first appear in the file
+# elements: the element of each atom, an index into groups
+# indices:  for each element an array with the indices of its atoms in a frame
+# coords:   the coordinates of the first frame, (number of atoms, 3), in the
+#           order of the file
+# bonds:    the Bonds of the atoms
+# frames:   the 'trajectory.Trajectory' of the file, which decodes the other
+#           frames on demand
+class Structure(object):
+    __slots__ = ('groups', 'elements', 'indices', 'coords', 'bonds', 'frames')
+    def __init__(self, groups, elements, coords, frames, bonds=None):
+        self.groups = groups
+        self.elements = elements
+        self.indices = [numpy.flatnonzero(elements == k)
+                        for k in range(len(groups))]
+        self.coords = coords
+        self.frames = frames
+        if bonds is None:
+            bonds = make_bonds((), len(coords))
+        self.bonds = bonds
+    
+    def __len__(self):
+        return len(self.coords)
+    
+    def short_names(self):
+        '''The short names of the atoms, in the order of the file.'''
+        names = [group.short_name for group in self.groups]
+        return [names[k] for k in self.elements.tolist()]
+    
+    def local_indices(self):
+        '''The index of each atom among the atoms of its element.'''
+        local = numpy.empty(len(self), dtype=numpy.int64)
+        for index in self.indices:
+            local[index] = numpy.arange(len(index))
+        return local
+    
+    def close(self):
+        self.frames.close()
+
+
+def group_atoms(keys):
+    '''
+    Group the atoms by a key, in the order in which the keys first appear.
+    Returns the keys of the groups and the group of each atom, as the
+    smallest unsigned integer type that holds it.
+    '''
+    keys = numpy.asarray(keys)
+    if not len(keys):
+        return [], numpy.empty(0, dtype=numpy.uint8)
+    unique, first, inverse = numpy.unique(keys, return_index=True,
+                                          return_inverse=True)
+    # renumber the groups in the order of their first atoms
+    order = numpy.argsort(first)
+    rank = numpy.empty(len(unique), dtype=numpy.intp)
+    rank[order] = numpy.arange(len(unique))
+    code_type = numpy.min_scalar_type(len(unique) - 1)
+    return unique[order].tolist(), rank[inverse.ravel()].astype(code_type)
@@ -0,0 +1,512 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import mmap
+import os
+
+import numpy
+
+from . import binary, index_cache, pdb, transform
+
+# The file is searched for line breaks in blocks of this size (in bytes).
+CHUNK_SIZE = 1 << 26
+# The first frame of an xyz file is searched in blocks of this size.
+FIRST_FRAME_CHUNK = 1 << 20
+# An xyz file is taken for one with frames of equal size, if the frames that
+# are read and this many frames spread over the file are in their place.
+UNIFORM_PROBES = 16
+# The indexing reports its progress at least every this many frames.
+PROGRESS_FRAMES = 1024
+
+
+# -----------------------------------------------------------------------------
+#                                                                 Frame index
+
+def iter_line_starts(buffer, chunk_size=CHUNK_SIZE):
+    '''
+    Generate arrays with the byte offsets of all lines in buffer, one array per
+    block of chunk_size bytes.
+    '''
+    size = len(buffer)
+    if size == 0:
+        return
+    yield numpy.zeros(1, dtype=numpy.int64)
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    for begin in range(0, size, chunk_size):
+        starts = numpy.flatnonzero(data[begin:begin + chunk_size] == 10)
+        starts += begin + 1
+        yield starts[starts < size]
+
+
+def find_record(buffer, name, start=0):
+    '''
+    Return the offset of the first line at or after start (which has to be the
+    beginning of a line) that begins with name, or -1.
+    '''
+    if buffer[start:start + len(name)] == name:
+        return start
+    found = buffer.find(b'\n' + name, start)
+    return found + 1 if found >= 0 else -1
+
+
+def line_end(buffer, start):
+    # offset of the line following the one at start
+    end = buffer.find(b'\n', start)
+    return len(buffer) if end < 0 else end + 1
+
+
+def index_xyz(buffer, max_frames=None, progress=None):
+    '''
+    Find the frames of an xyz file in one pass over buffer, or over the part
+    with the first 'max_frames' frames. 'progress' (e.g. a
+    core.background.TaskProgress) gets the offset reached, for every block of
+    lines and every PROGRESS_FRAMES frames.
+    
+    Returns the byte offsets of the atom count lines, the number of atoms of
+    the first frame, the offset of the end of the last frame and whether all
+    frames were found. Only the number of atoms of the first frame is used,
+    the index stops at a frame with fewer atoms and at a truncated frame.
+    '''
+    offsets = []
+    number_atoms = 0
+    # number of lines up to the next atom count
+    skip = 0
+    for starts in iter_line_starts(buffer):
+        if progress is not None:
+            progress.update(int(starts[0]) if len(starts) else len(buffer))
+        i = 0
+        n = len(starts)
+        while i < n:
+            if skip:
+                step = min(skip, n - i)
+                i += step
+                skip -= step
+                continue
+            start = int(starts[i])
+            i += 1
+            split_list = buffer[start:line_end(buffer, start)].split()
+            if len(split_list) != 1:
+                continue
+            try:
+                count = int(split_list[0])
+            except ValueError:
+                continue
+            if not offsets:
+                number_atoms = count
+            elif count < number_atoms:
+                return (numpy.array(offsets, dtype=numpy.int64), number_atoms,
+                        len(buffer), True)
+            if len(offsets) == max_frames:
+                # the last frame ends where the next one starts
+                return (numpy.array(offsets, dtype=numpy.int64), number_atoms,
+                        start, False)
+            offsets.append(start)
+            if progress is not None and not len(offsets) % PROGRESS_FRAMES:
+                progress.update(start)
+            # the comment line and the atoms
+            skip = count + 1
+    if skip:
+        offsets.pop()
+    return (numpy.array(offsets, dtype=numpy.int64), number_atoms, len(buffer),
+            True)
+
+
+def nth_line_start(buffer, n):
+    '''The offset of line n (counted from 0), or -1 if there are fewer.'''
+    seen = 0
+    for starts in iter_line_starts(buffer, FIRST_FRAME_CHUNK):
+        if seen + len(starts) > n:
+            return int(starts[n - seen])
+        seen += len(starts)
+    return -1
+
+
+def index_uniform_xyz(buffer, frames=None, probes=UNIFORM_PROBES):
+    '''
+    Compute the frames of an xyz file in which all frames have the same size
+    in bytes, as files written with fixed widths and a fixed comment do,
+    without reading the file. The layout is checked at the 'frames' that are
+    going to be decoded and at 'probes' frames spread over the file: each
+    has to start with the atom count and have its number of lines.
+    
+    Returns the byte offsets of the frames and the number of atoms, or None
+    if the file is not like this.
+    '''
+    split_list = buffer[:line_end(buffer, 0)].split()
+    if len(split_list) != 1 or not split_list[0].isdigit():
+        return None
+    count_line = split_list[0]
+    number_atoms = int(count_line)
+    frame_size = nth_line_start(buffer, number_atoms + 2)
+    if frame_size <= 0 or len(buffer) % frame_size:
+        return None
+    number_frames = len(buffer) // frame_size
+    
+    checked = set(numpy.linspace(0, number_frames - 1, probes).astype(int)
+                  .tolist())
+    checked.update(i for i in (frames or ()) if 0 <= i < number_frames)
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    for i in sorted(checked):
+        start = i * frame_size
+        if buffer[start:line_end(buffer, start)].split() != [count_line]:
+            return None
+        if numpy.count_nonzero(data[start:start + frame_size] == 10) \
+           != number_atoms + 2 or data[start + frame_size - 1] != 10:
+            return None
+    offsets = numpy.arange(number_frames, dtype=numpy.int64) * frame_size
+    return offsets, number_atoms
+
+
+def find_last_block(buffer, name, chunk_size=FIRST_FRAME_CHUNK):
+    '''
+    Return the offset of the first line of the last block of consecutive
+    lines that begin with name, or -1. The file is searched from its end, in
+    chunks of chunk_size bytes, the part before the block is not read.
+    '''
+    found = buffer.rfind(b'\n' + name)
+    if found < 0:
+        return 0 if buffer[:len(name)] == name else -1
+    start = found + 1
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    code = numpy.frombuffer(name, dtype=numpy.uint8)
+    while start > 0:
+        # the lines that begin in the chunk before start, all of them in
+        # the block, or the block begins after the last one that is not
+        begin = max(start - chunk_size, 0)
+        starts = numpy.flatnonzero(data[begin:start - 1] == 10) + begin + 1
+        if begin == 0:
+            starts = numpy.concatenate(([0], starts))
+        if not len(starts):
+            # a line longer than the chunk
+            previous = buffer.rfind(b'\n', 0, start - 1) + 1
+            starts = numpy.array([previous])
+        heads = data[numpy.minimum(starts[:, None] + numpy.arange(len(name)),
+                                   start - 1)]
+        other = numpy.flatnonzero((heads != code).any(axis=1))
+        if len(other):
+            return int(starts[other[-1] + 1]) if other[-1] + 1 < len(starts) \
+                   else start
+        start = int(starts[0])
+    return start
+
+
+def index_pdb(buffer, max_frames=None, progress=None):
+    '''
+    Find the models of a pdb file, or the first 'max_frames' models.
+    'progress' gets the offset reached for every model, like in index_xyz.
+    
+    Returns the (start, end) byte offsets of the models, each ending with its
+    ENDMDL record, the offset of the CONECT records at the end of the file
+    (-1 if there are none) and whether all models were found. Atoms after the
+    last ENDMDL, or in a file without models, make up the last model.
+    '''
+    spans = []
+    start = 0
+    complete = True
+    end = find_record(buffer, b'ENDMDL', start)
+    while end >= 0:
+        spans.append((start, end))
+        start = line_end(buffer, end)
+        if progress is not None:
+            progress.update(start)
+        if len(spans) == max_frames:
+            complete = False
+            break
+        end = find_record(buffer, b'ENDMDL', start)
+    if complete and (find_record(buffer, b'ATOM', start) >= 0
+                     or find_record(buffer, b'HETATM', start) >= 0):
+        spans.append((start, len(buffer)))
+    conect = find_last_block(buffer, b'CONECT')
+    return (numpy.array(spans, dtype=numpy.int64).reshape(-1, 2), conect,
+            complete)
+
+
+# -----------------------------------------------------------------------------
+#                                                                    Decoding
+
+def decode_lines(buffer, start, end):
+    return buffer[start:end].decode('utf-8', 'replace').splitlines()
+
+
+def decode_xyz_frame(lines, number_atoms, dtype=numpy.float64):
+    # lines start with the atom count and the comment line
+    return numpy.loadtxt(lines[2:2 + number_atoms], dtype=dtype,
+                         usecols=(1, 2, 3), ndmin=2)
+
+
+def decode_pdb_model(buffer, start, end, dtype=numpy.float64):
+    # the coordinates of all ATOM/HETATM records at once (see core.pdb)
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    starts, ends = pdb.dispatch(data, start, end)['atom']
+    return pdb.decode_coords(data, starts, ends, dtype)
+
+
+def decode_frame(buffer, file_format, start, end, number_atoms,
+                 dtype=numpy.float64):
+    '''
+    Decode the frame between the offsets start and end of a file in one of
+    the formats of Trajectory, as it is in the file.
+    '''
+    if file_format == binary.EXTENSION[1:]:
+        return binary.decode_frame(buffer, start, number_atoms, dtype)
+    if file_format == 'xyz':
+        return decode_xyz_frame(decode_lines(buffer, start, end),
+                                number_atoms, dtype)
+    return decode_pdb_model(buffer, start, end, dtype)
+
+
+def max_frames(frames):
+    '''The number of frames to index for the frames with indices 'frames'.'''
+    if frames is None:
+        return None
+    return max(list(frames) + [0]) + 1
+
+
+def build_index(buffer, file_format, frames=None, progress=None):
+    '''
+    Index an xyz or pdb file. Returns a dict with the (start, end) byte offsets
+    of the frames ('spans'), the number of atoms per frame ('number_atoms'),
+    the offset of the CONECT records of a pdb file ('conect') and whether all
+    frames are in the index ('complete').
+    
+    With 'frames' (the indices of the frames that are going to be decoded),
+    the file is only read up to the last of them. The frames of an xyz file
+    with frames of equal size are then computed without reading the file.
+    Only the given frames (and some probes) are checked, a frame in between
+    may have another size, so such an index is not complete and is not kept
+    in the cache ('checked' is False). 'progress' gets the offset reached
+    (see index_xyz).
+    '''
+    checked = True
+    if file_format == 'xyz':
+        uniform = None
+        if frames is not None:
+            uniform = index_uniform_xyz(buffer, frames)
+        if uniform is None:
+            offsets, number_atoms, end, complete = index_xyz(
+                                    buffer, max_frames(frames), progress)
+        else:
+            offsets, number_atoms = uniform
+            # up to the last of the frames, like index_xyz
+            number_frames = min(max_frames(frames), len(offsets))
+            end = (int(offsets[number_frames]) if number_frames < len(offsets)
+                   else len(buffer))
+            offsets = offsets[:number_frames]
+            complete = False
+            checked = False
+        spans = numpy.empty((len(offsets), 2), dtype=numpy.int64)
+        spans[:, 0] = offsets
+        spans[:-1, 1] = offsets[1:]
+        spans[-1:, 1] = end
+        conect = -1
+    else:
+        spans, conect, complete = index_pdb(buffer, max_frames(frames),
+                                            progress)
+        number_atoms = 0
+        if len(spans):
+            start, end = spans[0]
+            data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+            number_atoms = len(pdb.dispatch(data, int(start),
+                                            int(end))['atom'][0])
+    return {'spans': spans, 'number_atoms': number_atoms, 'conect': conect,
+            'complete': complete, 'checked': checked}
+
+
+def covers(index, frames):
+    '''Whether the index holds the frames with indices 'frames' (None: all).'''
+    if bool(index.get('complete', True)):
+        return True
+    return frames is not None and max_frames(frames) <= len(index['spans'])
+
+
+# This is the class, which gives access to the frames of an xyz file, the
+# models of a pdb file or the frames of a binary file (core.binary). Only the
+# positions of the frames in the file are kept in memory, the coordinates are
+# decoded from a memory map on demand. The positions of the text formats are
+# kept in the index cache, unless use_cache is False. If the indices of the
+# frames that are going to be used are given ('frames'), a text file is only
+# indexed up to the last of them, the frames after it are not in the
+# trajectory (see 'complete'). 'progress' (e.g. a core.background.TaskProgress)
+# gets the number of bytes indexed out of the size of the file.
+class Trajectory(object):
+    def __init__(self, filepath, dtype=numpy.float64, use_cache=True,
+                 frames=None, progress=None):
+        self.filepath = filepath
+        self.format = os.path.splitext(filepath)[1][1:].lower()
+        if self.format not in ('xyz', 'pdb', binary.EXTENSION[1:]):
+            raise ValueError("Unknown file format: {}".format(filepath))
+        self.dtype = dtype
+        # The decoded frames are put into the origin (if center is True, with
+        # the atoms weighted by 'weights', e.g. their masses) and scaled by
+        # 'scale'.
+        self.center = False
+        self.weights = None
+        self.scale = 1.0
+        # the short names of the atoms (xyz and binary files) and the bonds
+        # (binary files)
+        self.symbols = None
+        self.bonds = None
+        
+        self._file = open(filepath, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._buffer = mmap.mmap(self._file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        else:
+            self._buffer = b''
+        
+        try:
+            self._read_index(use_cache, frames, progress)
+        except BaseException:
+            # e.g. core.background.Cancelled, raised by 'progress'
+            self.close()
+            raise
+    
+    def _read_index(self, use_cache, frames, progress):
+        # the index from the file, the cache, or by reading the file
+        if self.format == binary.EXTENSION[1:]:
+            # the binary format stores its index
+            index = binary.build_index(self._buffer)
+        else:
+            index = (index_cache.load_index(self.filepath) if use_cache
+                     else None)
+            if index is not None and not covers(index, frames):
+                index = None
+        if index is None:
+            index = build_index(self._buffer, self.format, frames, progress)
+            if use_cache and index.get('checked', True):
+                index_cache.save_index(self.filepath, index)
+        self.spans = index['spans']
+        self.number_atoms = int(index['number_atoms'])
+        self.conect = int(index['conect'])
+        # False if the file was only indexed up to the frames given
+        self.complete = bool(index.get('complete', True))
+        
+        if self.format == 'xyz' and len(self):
+            lines = self.lines(0)[2:2 + self.number_atoms]
+            self.symbols = numpy.array([line.split(None, 1)[0]
+                                        for line in lines])
+        elif self.format == binary.EXTENSION[1:]:
+            symbols, self.bonds = binary.read_topology(self._buffer)
+            self.symbols = numpy.array(symbols)
+    
+    def __len__(self):
+        return len(self.spans)
+    
+    def __getitem__(self, i):
+        return transform.transform(self.decode_checked(i), self.center,
+                                   self.weights, self.scale)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def lines(self, i):
+        '''
+        Return the lines of frame i as strings.
+        '''
+        start, end = self.spans[i]
+        return decode_lines(self._buffer, int(start), int(end))
+    
+    def pdb_topology(self):
+        '''
+        Decode the first model of a pdb file and the CONECT records, in one
+        pass over each. Returns the serial numbers, the element symbols and
+        the coordinates of the atoms and the bonds as pairs of serial numbers
+        (see core.pdb).
+        '''
+        data = numpy.frombuffer(self._buffer, dtype=numpy.uint8)
+        start, end = (int(offset) for offset in self.spans[0])
+        records = pdb.dispatch(data, start, end)
+        serials, symbols = pdb.decode_atoms(data, *records['atom'])
+        coords = pdb.decode_coords(data, *records['atom'], dtype=self.dtype)
+        bonds = [pdb.decode_conect(data, *records['conect'])]
+        # The CONECT records usually follow the last model.
+        if self.conect >= end:
+            records = pdb.dispatch(data, self.conect, len(data))
+            bonds.append(pdb.decode_conect(data, *records['conect']))
+        return serials, symbols, coords, numpy.concatenate(bonds)
+    
+    def decode_checked(self, i):
+        '''
+        Decode frame i as it is in the file, and check its number of atoms.
+        '''
+        coords = self.decode(i)
+        if len(coords) != self.number_atoms:
+            raise ValueError("Frame {} has {} atoms instead of {}.".format(
+                                        i, len(coords), self.number_atoms))
+        return coords
+    
+    def decode(self, i):
+        start, end = self.spans[i]
+        return decode_frame(self._buffer, self.format, int(start), int(end),
+                            self.number_atoms, self.dtype)
+    
+    def iter_frames(self, indices=None):
+        '''
+        Yield (index, coordinates) for the frames with the given indices (all
+        frames by default), decoding one frame at a time.
+        '''
+        if indices is None:
+            indices = range(len(self))
+        for i in indices:
+            yield i, self[i]
+    
+    def frames(self, indices):
+        '''
+        Return the coordinates of the frames with the given indices as one
+        array of shape (frames, atoms, 3).
+        '''
+        indices = list(indices)
+        coords = numpy.empty((len(indices), self.number_atoms, 3),
+                             dtype=self.dtype)
+        for k, i in enumerate(indices):
+            coords[k] = self.decode_checked(i)
+        # centered and scaled as one block
+        return transform.transform(coords, self.center, self.weights,
+                                   self.scale)
+    
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+
+def iter_frames(filepath, indices=None, dtype=numpy.float64, use_cache=True):
+    '''
+    Yield (index, coordinates) for the frames of a file, one frame at a time,
+    so that a trajectory can be processed in constant memory. The file is
+    closed when the loop is done or stops early.
+    '''
+    with Trajectory(filepath, dtype, use_cache) as frames:
+        for item in frames.iter_frames(indices):
+            yield item
+
+
+def read_xyz(filepath, dtype=numpy.float64, use_cache=True):
+    '''
+    Read all frames of an xyz file.
+    
+    Returns the element symbols of the atoms (a numpy array of strings) and the
+    coordinates of all frames as one array of shape (frames, atoms, 3).
+    '''
+    with Trajectory(filepath, dtype, use_cache) as frames:
+        if not len(frames):
+            return numpy.array([], dtype=str), numpy.zeros((0, 0, 3), dtype)
+        return frames.symbols, frames.frames(range(len(frames)))
@@ -0,0 +1,77 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import numpy
+from .elements import get_mass
+
+
+# -----------------------------------------------------------------------------
+#                                                  Centering, scaling and size
+
+# These work on a single frame (atoms, 3) as well as on a block of frames
+# (frames, atoms, 3), as array operations over all atoms (and frames) at once.
+# The sums over the atoms are matrix products, which are much faster than
+# reductions along the middle axis of a block.
+
+# bounding_size works through a block in slices of this many frames, so that
+# the temporary arrays stay small.
+SIZE_CHUNK = 8
+
+
+def atom_masses(structure):
+    '''The masses of the atoms of a structure, in the order of a frame.'''
+    group_masses = numpy.array([get_mass(group.short_name)
+                                for group in structure.groups])
+    return group_masses[structure.elements]
+
+
+def centers(coords, weights=None):
+    '''
+    The centers of the frames, (3,) or (frames, 3). With weights (e.g. the
+    masses of the atoms) this is the weighted center, e.g. the center of mass.
+    '''
+    if weights is None or not weights.sum() > 0:
+        weights = numpy.ones(coords.shape[-2])
+    weights = weights.astype(coords.dtype)
+    return numpy.matmul(weights, coords) / weights.sum()
+
+
+def transform(coords, center=False, weights=None, scale=1.0):
+    '''
+    Put the frames into the origin (if 'center'), and scale them, in place.
+    Returns coords.
+    '''
+    if center:
+        coords -= centers(coords, weights)[..., None, :]
+    if scale != 1.0:
+        coords *= scale
+    return coords
+
+
+def bounding_size(coords, origin):
+    '''The largest distance of an atom (in any of the frames) from origin.'''
+    if not coords.size:
+        return 0.0
+    frames = coords.reshape(-1, coords.shape[-2], 3)
+    origin = numpy.asarray(origin, dtype=coords.dtype)
+    ones = numpy.ones(3, dtype=coords.dtype)
+    largest = 0.0
+    for k in range(0, len(frames), SIZE_CHUNK):
+        squares = numpy.square(frames[k:k + SIZE_CHUNK] - origin)
+        largest = max(largest, float(numpy.matmul(squares, ones).max()))
+    return largest ** 0.5
@@ -0,0 +1,123 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+from itertools import chain, repeat
+import numpy
+
+
+# -----------------------------------------------------------------------------
+#                                                                     Writers
+
+# The writers take the frames one by one (any iterable of (n, 3) coordinate
+# arrays), so that a trajectory is written without holding all frames. Each
+# frame is formatted into one string with a single % operation and written
+# into a buffered file.
+
+BUFFER_SIZE = 1 << 20
+
+XYZ_COMMENT = ("This XYZ file has been created with Blender "
+               "and the addon Atomic Blender - XYZ. "
+               "For more details see: wiki.blender.org/index.php/"
+               "Extensions:2.6/Py/Scripts/Import-Export/XYZ")
+
+XYZ_ATOM = "%3s%15.5f%15.5f%15.5f\n"
+
+# HETATM record: serial, atom name, residue, chain, residue number,
+# coordinates, occupancy, temperature factor and element in columns 77-78.
+PDB_ATOM = "HETATM%5d  %-3s %3s %1s%4d    %8.3f%8.3f%8.3f%6.2f%6.2f          %2s\n"
+
+# The serial numbers of a pdb file have 5 columns.
+PDB_MAX_ATOMS = 99999
+
+
+def _interleave(*columns):
+    '''The rows of the columns (sequences) as one flat tuple.'''
+    return tuple(chain.from_iterable(zip(*columns)))
+
+
+def _columns(coords):
+    '''x, y and z of all atoms as lists of floats.'''
+    return numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 3).T.tolist()
+
+
+def format_xyz(names, coords, comment=XYZ_COMMENT):
+    '''One frame in the XYZ format.'''
+    return ("{}\n{}\n".format(len(names), comment)
+            + (XYZ_ATOM * len(names)) % _interleave(names, *_columns(coords)))
+
+
+def format_pdb(names, coords, model=None):
+    '''One frame as HETATM records, in a MODEL if 'model' is given.'''
+    number_atoms = len(names)
+    text = (PDB_ATOM * number_atoms) % _interleave(
+                range(1, number_atoms + 1), names, repeat("UNK"),
+                repeat("A"), repeat(1), *(_columns(coords)
+                + [repeat(1.0), repeat(0.0), [name.upper() for name in names]]))
+    if model is None:
+        return text
+    return "MODEL     {:4d}\n{}ENDMDL\n".format(model, text)
+
+
+def format_conect(pairs):
+    '''
+    CONECT records of the bonds 'pairs' (k, 2), indices of the atoms
+    starting at 0. Each record lists up to four partners.
+    '''
+    pairs = numpy.asarray(pairs, dtype=numpy.int64).reshape(-1, 2)
+    # both directions, sorted by the first atom
+    both = numpy.concatenate((pairs, pairs[:, ::-1])) + 1
+    both = both[numpy.lexsort((both[:, 1], both[:, 0]))]
+    lines = []
+    atoms, starts = numpy.unique(both[:, 0], return_index=True)
+    ends = numpy.append(starts[1:], len(both))
+    for atom, start, end in zip(atoms.tolist(), starts.tolist(), ends.tolist()):
+        partners = both[start:end, 1].tolist()
+        for k in range(0, len(partners), 4):
+            chunk = partners[k:k + 4]
+            lines.append(("CONECT%5d" + "%5d" * len(chunk) + "\n")
+                         % tuple([atom] + chunk))
+    return "".join(lines)
+
+
+def write_xyz(filepath, names, frames, comment=XYZ_COMMENT):
+    '''Write all frames into a (multi-frame) XYZ file. Returns their number.'''
+    number_frames = 0
+    with open(filepath, 'w', buffering=BUFFER_SIZE) as xyz_file:
+        for coords in frames:
+            xyz_file.write(format_xyz(names, coords, comment))
+            number_frames += 1
+    return number_frames
+
+
+def write_pdb(filepath, names, frames, bonds=None):
+    '''
+    Write all frames into a pdb file, one MODEL each, followed by the CONECT
+    records of 'bonds' (see format_conect). Returns the number of frames.
+    '''
+    if len(names) > PDB_MAX_ATOMS:
+        raise ValueError("A pdb file holds at most {} atoms, not {}.".format(
+                                                PDB_MAX_ATOMS, len(names)))
+    number_frames = 0
+    with open(filepath, 'w', buffering=BUFFER_SIZE) as pdb_file:
+        for coords in frames:
+            number_frames += 1
+            pdb_file.write(format_pdb(names, coords, number_frames))
+        if bonds is not None and len(bonds):
+            pdb_file.write(format_conect(bonds))
+        pdb_file.write("END\n")
+    return number_frames
@@ -16,74 +16,212 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import bpy
+import numpy
+from .core import binary, bonds, writers
+from .core.elements import ELEMENTS, read_elements, get_short_name
 
-#TODO export to other formats as well
 
+# -----------------------------------------------------------------------------
+#                                                            Atoms and bonds
 
-import bpy
-from . import import_molecule
+# An imported molecule has one object per element, named after the element,
+# with one vertex per atom and the balls as dupli children. Objects without
+# children and without parent are single atoms. Bond objects are not atoms.
+
+
+def atom_objects(objects, only_elements):
+    '''
+    The objects which hold atoms, with the short names of their elements.
+    With 'only_elements' objects with an unknown name are left out, otherwise
+    their atoms are called '?'.
+    '''
+    atom_objects = []
+    for ob in objects:
+        if ("Stick" in ob.name or ob.name.startswith("bond_")
+            or ob.name.split('.')[0].endswith("_bonds")):
+            continue
+        if ob.type not in {'MESH', 'SURFACE', 'META'}:
+            continue
+        if ob.children:
+            if ob.type != 'MESH':
+                continue
+        elif ob.parent:
+            continue
+        short_name = get_short_name(ob.name)
+        if short_name is None:
+            if only_elements:
+                continue
+            short_name = "?"
+        atom_objects.append((ob, short_name))
+    return atom_objects
 
 
-class AtomsExport(object):  
-    __slots__ = ('element', 'location')
-    def __init__(self, element, location):
-        self.element  = element
-        self.location = location
+def mesh_coords(ob, scene, evaluated=False):
+    '''
+    The vertices of a mesh object in world space, (n, 3). They are read with
+    one foreach_get and moved with one matrix product. With 'evaluated' the
+    shape keys and modifiers of the current frame are applied.
+    '''
+    if evaluated and (ob.data.shape_keys or ob.modifiers):
+        mesh = ob.to_mesh(scene, True, 'PREVIEW')
+    else:
+        mesh = ob.data
+    coords = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", coords)
+    if mesh is not ob.data:
+        bpy.data.meshes.remove(mesh)
+    matrix = numpy.array(ob.matrix_world)
+    return numpy.dot(coords.reshape(-1, 3), matrix[:3, :3].T) + matrix[:3, 3]
 
 
-def export_xyz(obj_type, filepath_xyz):
+def world_coords(ob, scene, evaluated=False):
+    '''The coordinates of the atoms of an object in world space, (n, 3).'''
+    if ob.children:
+        return mesh_coords(ob, scene, evaluated)
+    return numpy.array(ob.matrix_world)[None, :3, 3].copy()
 
-    list_atoms = []
-    counter = 0
-    for obj in bpy.context.selected_objects:
-    
-        if "Stick" in obj.name:
+
+def bond_objects(scene, atoms):
+    '''
+    The bond objects of the atom objects 'atoms' (see atom_objects), whether
+    they are selected or not. The half bonds of bond objects mode are the
+    children of the _bonds objects, which share the meshes of the element
+    objects. A bond mesh of single mesh mode is named after its element
+    object.
+    '''
+    meshes = set(ob.data.name for ob, short_name in atoms if ob.type == 'MESH')
+    names = set(ob.name.split('.')[0] + "_bonds" for ob, short_name in atoms)
+    found = []
+    for ob in scene.objects:
+        if ob.type != 'MESH':
+            continue
+        name = ob.name.split('.')[0]
+        if ob.data.name in meshes and name.endswith("_bonds"):
+            found.extend(ob.children)
+        elif name in names:
+            found.append(ob)
+    return found
+
+
+def stretch_bonds(objects, offsets):
+    '''
+    The bonds of the bond objects among 'objects' (bond objects mode): each
+    half bond is parented to the vertex of its atom and stretched to the
+    vertex group of the bonded atom. 'offsets' maps the names of the meshes
+    of the exported element objects to the index of their first atom.
+    '''
+    pairs = []
+    for ob in objects:
+        if ob.parent is None or ob.parent_type != 'VERTEX':
             continue
-            
-        if obj.type not in {'MESH', 'SURFACE', 'META'}:
-            continue 
-       
-        name = ""
-        for element in import_molecule.ELEMENTS_DEFAULT:
-            if element[1] in obj.name:
-                if element[2] == "Vac":
-                    name = "X"
-                else:
-                    name = element[2]
-        
-        if name == "":
-            if obj_type == "0":
-                name = "?"
-            else:
+        start = offsets.get(ob.parent.data.name)
+        if start is None:
+            continue
+        for constraint in ob.constraints:
+            if constraint.type != 'STRETCH_TO' or constraint.target is None:
                 continue
+            end = offsets.get(constraint.target.data.name)
+            if end is not None and constraint.subtarget.isdigit():
+                pairs.append((start + ob.parent_vertices[0],
+                              end + int(constraint.subtarget)))
+    return numpy.array(pairs, dtype=numpy.int64).reshape(-1, 2)
 
-        if len(obj.children) != 0:
-            for vertex in obj.data.vertices:
-                location = obj.matrix_world*vertex.co
-                list_atoms.append(AtomsExport(name, location))
-                counter += 1                                       
-        else:
-            if not obj.parent:
-                location = obj.location
-                list_atoms.append(AtomsExport(name, location))                                   
-                counter += 1                                               
-
-    xyz_file_p = open(filepath_xyz, "w")
-    xyz_file_p.write("%d\n" % counter)
-    xyz_file_p.write("This XYZ file has been created with Blender "
-                     "and the addon Atomic Blender - XYZ. "
-                     "For more details see: wiki.blender.org/index.php/"
-                     "Extensions:2.6/Py/Scripts/Import-Export/XYZ\n")
-
-    for i, atom in enumerate(list_atoms):
-        string = "%3s%15.5f%15.5f%15.5f\n" % (
-                                      atom.element,
-                                      atom.location[0],
-                                      atom.location[1],
-                                      atom.location[2])
-        xyz_file_p.write(string)
-
-    xyz_file_p.close()
 
-    return True
+def mesh_bonds(objects, scene, atom_coords, tolerance=1e-3):
+    '''
+    The bonds of the bond meshes among 'objects' (single mesh mode). The
+    atoms at both ends of each half bond are found from the centers of its
+    two rings and matched with 'atom_coords' (world space). Half bonds of
+    radius 0 (bonds, which do not exist in this frame) are left out.
+    '''
+    ends = []
+    for ob in objects:
+        if (ob.type != 'MESH' or not ob.name.split('.')[0].endswith("_bonds")
+            or ob.children or not ob.data.polygons):
+            continue
+        # The first quad of a half bond is (k, k+1, k+1+sectors, k+sectors).
+        polygon = ob.data.polygons[0].vertices
+        sectors = polygon[3] - polygon[0]
+        rings = mesh_coords(ob, scene, True).reshape(-1, 2, sectors, 3)
+        centers = rings.mean(axis=2)
+        present = numpy.linalg.norm(rings[:, 0, 0] - centers[:, 0], axis=1) > 0.0
+        starts = centers[present, 0]
+        ends.append(numpy.stack((starts, 2.0 * centers[present, 1] - starts),
+                                axis=1))
+    if not ends:
+        return numpy.empty((0, 2), dtype=numpy.int64)
+    ends = numpy.concatenate(ends).reshape(-1, 3)
+    
+    # match the ends with the atoms
+    number_atoms = len(atom_coords)
+    points = numpy.concatenate((atom_coords, ends))
+    pairs = bonds.split_keys(bonds.neighbour_pairs(points, tolerance,
+                            numpy.arange(number_atoms, len(points))),
+                            len(points))
+    pairs = pairs[(pairs[:, 0] < number_atoms) & (pairs[:, 1] >= number_atoms)]
+    atom_of_end = numpy.full(len(ends), -1, dtype=numpy.int64)
+    atom_of_end[pairs[:, 1] - number_atoms] = pairs[:, 0]
+    half_bonds = atom_of_end.reshape(-1, 2)
+    half_bonds = half_bonds[(half_bonds >= 0).all(axis=1)]
+    return numpy.unique(numpy.sort(half_bonds, axis=1), axis=0)
+
+
+# -----------------------------------------------------------------------------
+#                                                                     Export
 
+def export_molecule(obj_type, filepath, use_frames=False):
+    '''
+    Export the atoms of the selected objects into a .xyz, .pdb or binary
+    file (core.binary), depending on the extension. obj_type '0' exports all objects, '1' only
+    those named after an element. With 'use_frames' every frame of the scene
+    is written, as a multi-frame XYZ file or one MODEL per frame. The CONECT
+    records of a pdb file and the bonds of a binary file are rebuilt from the
+    bonds of the exported atoms in the current frame, the bond objects need
+    not be selected.
+    '''
+    if not ELEMENTS:
+        read_elements()
+    scene = bpy.context.scene
+    objects = list(bpy.context.selected_objects)
+    atoms = atom_objects(objects, obj_type != "0")
+    
+    names = []
+    offsets = {}
+    for ob, short_name in atoms:
+        number_atoms = len(ob.data.vertices) if ob.children else 1
+        if ob.type == 'MESH':
+            offsets[ob.data.name] = len(names)
+        names.extend([short_name] * number_atoms)
+    
+    def coords():
+        return numpy.concatenate([world_coords(ob, scene, True)
+                                  for ob, short_name in atoms]).reshape(-1, 3)
+    
+    # the frames are written one by one, as they are read
+    def frames():
+        if not use_frames:
+            yield coords()
+            return
+        current = scene.frame_current
+        try:
+            for frame in range(scene.frame_start, scene.frame_end + 1,
+                               scene.frame_step):
+                scene.frame_set(frame)
+                yield coords()
+        finally:
+            scene.frame_set(current)
+    
+    if filepath[-3:] == 'pdb' or filepath.endswith(binary.EXTENSION):
+        # every bond is found from both of its half bonds
+        bond_obs = bond_objects(scene, atoms)
+        pairs = numpy.concatenate((stretch_bonds(bond_obs, offsets),
+                                   mesh_bonds(bond_obs, scene, coords())))
+        pairs = numpy.unique(numpy.sort(pairs, axis=1), axis=0)
+        if filepath[-3:] == 'pdb':
+            writers.write_pdb(filepath, names, frames(), pairs)
+        else:
+            binary.write_binary(filepath, names, frames(), pairs)
+    else:
+        writers.write_xyz(filepath, names, frames())
+    return True
@@ -19,151 +19,32 @@
 import bpy
 from math import pi, sqrt
 from mathutils import Vector, Matrix
+import os
 import time
-import re
-DEBUG = True
-TIME = 0
-LAST_TIME = 0
+import numpy
+from .core import geometry, parallel, pc2, readers, transform
+from .core.bonds import find_bonds, iter_bond_changes, split_keys
+from .core.background import Cancelled, TaskProgress
+from .core.profile import reset, stage_done
+from .core.progress import Progress
+from .core.elements import (ELEMENTS_DEFAULT, ELEMENTS, ELEMENT_TABLE,
+                            ElementProp, read_elements, get_element)
+
+# Blender 2.7x is its own sys.executable, the workers of core.parallel run in
+# the Python that comes with it (newer versions: sys.executable).
+parallel.EXECUTABLE = getattr(bpy.app, 'binary_path_python', None)
+
+# The stages of an import (and of its frames) are timed by core.profile:
+# read, bonds, materials, scene, atoms, bond_objects, constraints,
+# frame_bonds and frames.
+
 # -----------------------------------------------------------------------------
-#                                                  Atom and element data
+#                                                                   Atom data
 
 
-# This is a list that contains some data of all possible elements. The structure
-# is as follows:
-#
-# 1, "Hydrogen", "H", (0.0,0.0,1.0), 0.32, 0.32, 0.32 , -1 , 1.54   means
-#
-# atomic_n, long_name, short_name, color, radius (pre-defined), radius (covalent), radius (vdW),
-# charge state 1, radius (ionic) 1, charge state 2, radius (ionic) 2, ... 
-
-# all charge states for any atom are listed, if existing.
-# The list is fixed and cannot be changed ... (see below)
-
-ELEMENTS_DEFAULT = (
-( 1,      "Hydrogen",        "H", (  1.0,   1.0,   1.0), 0.32, 0.32, 0.79 , -1 , 1.54 ),
-( 2,        "Helium",       "He", ( 0.85,   1.0,   1.0), 0.93, 0.93, 0.49 ),
-( 3,       "Lithium",       "Li", (  0.8,  0.50,   1.0), 1.23, 1.23, 2.05 ,  1 , 0.68 ),
-( 4,     "Beryllium",       "Be", ( 0.76,   1.0,   0.0), 0.90, 0.90, 1.40 ,  1 , 0.44 ,  2 , 0.35 ),
-( 5,         "Boron",        "B", (  1.0,  0.70,  0.70), 0.82, 0.82, 1.17 ,  1 , 0.35 ,  3 , 0.23 ),
-( 6,        "Carbon",        "C", ( 0.56,  0.56,  0.56), 0.77, 0.77, 0.91 , -4 , 2.60 ,  4 , 0.16 ),
-( 7,      "Nitrogen",        "N", ( 0.18,  0.31,  0.97), 0.75, 0.75, 0.75 , -3 , 1.71 ,  1 , 0.25 ,  3 , 0.16 ,  5 , 0.13 ),
-( 8,        "Oxygen",        "O", (  1.0,  0.05,  0.05), 0.73, 0.73, 0.65 , -2 , 1.32 , -1 , 1.76 ,  1 , 0.22 ,  6 , 0.09 ),
-( 9,      "Fluorine",        "F", ( 0.56,  0.87,  0.31), 0.72, 0.72, 0.57 , -1 , 1.33 ,  7 , 0.08 ),
-(10,          "Neon",       "Ne", ( 0.70,  0.89,  0.96), 0.71, 0.71, 0.51 ,  1 , 1.12 ),
-(11,        "Sodium",       "Na", ( 0.67,  0.36,  0.94), 1.54, 1.54, 2.23 ,  1 , 0.97 ),
-(12,     "Magnesium",       "Mg", ( 0.54,   1.0,   0.0), 1.36, 1.36, 1.72 ,  1 , 0.82 ,  2 , 0.66 ),
-(13,     "Aluminium",       "Al", ( 0.74,  0.65,  0.65), 1.18, 1.18, 1.82 ,  3 , 0.51 ),
-(14,       "Silicon",       "Si", ( 0.94,  0.78,  0.62), 1.11, 1.11, 1.46 , -4 , 2.71 , -1 , 3.84 ,  1 , 0.65 ,  4 , 0.42 ),
-(15,    "Phosphorus",        "P", (  1.0,  0.50,   0.0), 1.06, 1.06, 1.23 , -3 , 2.12 ,  3 , 0.44 ,  5 , 0.35 ),
-(16,        "Sulfur",        "S", (  1.0,   1.0,  0.18), 1.02, 1.02, 1.09 , -2 , 1.84 ,  2 , 2.19 ,  4 , 0.37 ,  6 , 0.30 ),
-(17,      "Chlorine",       "Cl", ( 0.12,  0.94,  0.12), 0.99, 0.99, 0.97 , -1 , 1.81 ,  5 , 0.34 ,  7 , 0.27 ),
-(18,         "Argon",       "Ar", ( 0.50,  0.81,  0.89), 0.98, 0.98, 0.88 ,  1 , 1.54 ),
-(19,     "Potassium",        "K", ( 0.56,  0.25,  0.83), 2.03, 2.03, 2.77 ,  1 , 0.81 ),
-(20,       "Calcium",       "Ca", ( 0.23,   1.0,   0.0), 1.74, 1.74, 2.23 ,  1 , 1.18 ,  2 , 0.99 ),
-(21,      "Scandium",       "Sc", ( 0.90,  0.90,  0.90), 1.44, 1.44, 2.09 ,  3 , 0.73 ),
-(22,      "Titanium",       "Ti", ( 0.74,  0.76,  0.78), 1.32, 1.32, 2.00 ,  1 , 0.96 ,  2 , 0.94 ,  3 , 0.76 ,  4 , 0.68 ),
-(23,      "Vanadium",        "V", ( 0.65,  0.65,  0.67), 1.22, 1.22, 1.92 ,  2 , 0.88 ,  3 , 0.74 ,  4 , 0.63 ,  5 , 0.59 ),
-(24,      "Chromium",       "Cr", ( 0.54,   0.6,  0.78), 1.18, 1.18, 1.85 ,  1 , 0.81 ,  2 , 0.89 ,  3 , 0.63 ,  6 , 0.52 ),
-(25,     "Manganese",       "Mn", ( 0.61,  0.47,  0.78), 1.17, 1.17, 1.79 ,  2 , 0.80 ,  3 , 0.66 ,  4 , 0.60 ,  7 , 0.46 ),
-(26,          "Iron",       "Fe", ( 0.87,   0.4,   0.2), 1.17, 1.17, 1.72 ,  2 , 0.74 ,  3 , 0.64 ),
-(27,        "Cobalt",       "Co", ( 0.94,  0.56,  0.62), 1.16, 1.16, 1.67 ,  2 , 0.72 ,  3 , 0.63 ),
-(28,        "Nickel",       "Ni", ( 0.31,  0.81,  0.31), 1.15, 1.15, 1.62 ,  2 , 0.69 ),
-(29,        "Copper",       "Cu", ( 0.78,  0.50,   0.2), 1.17, 1.17, 1.57 ,  1 , 0.96 ,  2 , 0.72 ),
-(30,          "Zinc",       "Zn", ( 0.49,  0.50,  0.69), 1.25, 1.25, 1.53 ,  1 , 0.88 ,  2 , 0.74 ),
-(31,       "Gallium",       "Ga", ( 0.76,  0.56,  0.56), 1.26, 1.26, 1.81 ,  1 , 0.81 ,  3 , 0.62 ),
-(32,     "Germanium",       "Ge", (  0.4,  0.56,  0.56), 1.22, 1.22, 1.52 , -4 , 2.72 ,  2 , 0.73 ,  4 , 0.53 ),
-(33,       "Arsenic",       "As", ( 0.74,  0.50,  0.89), 1.20, 1.20, 1.33 , -3 , 2.22 ,  3 , 0.58 ,  5 , 0.46 ),
-(34,      "Selenium",       "Se", (  1.0,  0.63,   0.0), 1.16, 1.16, 1.22 , -2 , 1.91 , -1 , 2.32 ,  1 , 0.66 ,  4 , 0.50 ,  6 , 0.42 ),
-(35,       "Bromine",       "Br", ( 0.65,  0.16,  0.16), 1.14, 1.14, 1.12 , -1 , 1.96 ,  5 , 0.47 ,  7 , 0.39 ),
-(36,       "Krypton",       "Kr", ( 0.36,  0.72,  0.81), 1.31, 1.31, 1.24 ),
-(37,      "Rubidium",       "Rb", ( 0.43,  0.18,  0.69), 2.16, 2.16, 2.98 ,  1 , 1.47 ),
-(38,     "Strontium",       "Sr", (  0.0,   1.0,   0.0), 1.91, 1.91, 2.45 ,  2 , 1.12 ),
-(39,       "Yttrium",        "Y", ( 0.58,   1.0,   1.0), 1.62, 1.62, 2.27 ,  3 , 0.89 ),
-(40,     "Zirconium",       "Zr", ( 0.58,  0.87,  0.87), 1.45, 1.45, 2.16 ,  1 , 1.09 ,  4 , 0.79 ),
-(41,       "Niobium",       "Nb", ( 0.45,  0.76,  0.78), 1.34, 1.34, 2.08 ,  1 , 1.00 ,  4 , 0.74 ,  5 , 0.69 ),
-(42,    "Molybdenum",       "Mo", ( 0.32,  0.70,  0.70), 1.30, 1.30, 2.01 ,  1 , 0.93 ,  4 , 0.70 ,  6 , 0.62 ),
-(43,    "Technetium",       "Tc", ( 0.23,  0.61,  0.61), 1.27, 1.27, 1.95 ,  7 , 0.97 ),
-(44,     "Ruthenium",       "Ru", ( 0.14,  0.56,  0.56), 1.25, 1.25, 1.89 ,  4 , 0.67 ),
-(45,       "Rhodium",       "Rh", ( 0.03,  0.49,  0.54), 1.25, 1.25, 1.83 ,  3 , 0.68 ),
-(46,     "Palladium",       "Pd", (  0.0,  0.41,  0.52), 1.28, 1.28, 1.79 ,  2 , 0.80 ,  4 , 0.65 ),
-(47,        "Silver",       "Ag", ( 0.75,  0.75,  0.75), 1.34, 1.34, 1.75 ,  1 , 1.26 ,  2 , 0.89 ),
-(48,       "Cadmium",       "Cd", (  1.0,  0.85,  0.56), 1.48, 1.48, 1.71 ,  1 , 1.14 ,  2 , 0.97 ),
-(49,        "Indium",       "In", ( 0.65,  0.45,  0.45), 1.44, 1.44, 2.00 ,  3 , 0.81 ),
-(50,           "Tin",       "Sn", (  0.4,  0.50,  0.50), 1.41, 1.41, 1.72 , -4 , 2.94 , -1 , 3.70 ,  2 , 0.93 ,  4 , 0.71 ),
-(51,      "Antimony",       "Sb", ( 0.61,  0.38,  0.70), 1.40, 1.40, 1.53 , -3 , 2.45 ,  3 , 0.76 ,  5 , 0.62 ),
-(52,     "Tellurium",       "Te", ( 0.83,  0.47,   0.0), 1.36, 1.36, 1.42 , -2 , 2.11 , -1 , 2.50 ,  1 , 0.82 ,  4 , 0.70 ,  6 , 0.56 ),
-(53,        "Iodine",        "I", ( 0.58,   0.0,  0.58), 1.33, 1.33, 1.32 , -1 , 2.20 ,  5 , 0.62 ,  7 , 0.50 ),
-(54,         "Xenon",       "Xe", ( 0.25,  0.61,  0.69), 1.31, 1.31, 1.24 ),
-(55,       "Caesium",       "Cs", ( 0.34,  0.09,  0.56), 2.35, 2.35, 3.35 ,  1 , 1.67 ),
-(56,        "Barium",       "Ba", (  0.0,  0.78,   0.0), 1.98, 1.98, 2.78 ,  1 , 1.53 ,  2 , 1.34 ),
-(57,     "Lanthanum",       "La", ( 0.43,  0.83,   1.0), 1.69, 1.69, 2.74 ,  1 , 1.39 ,  3 , 1.06 ),
-(58,        "Cerium",       "Ce", (  1.0,   1.0,  0.78), 1.65, 1.65, 2.70 ,  1 , 1.27 ,  3 , 1.03 ,  4 , 0.92 ),
-(59,  "Praseodymium",       "Pr", ( 0.85,   1.0,  0.78), 1.65, 1.65, 2.67 ,  3 , 1.01 ,  4 , 0.90 ),
-(60,     "Neodymium",       "Nd", ( 0.78,   1.0,  0.78), 1.64, 1.64, 2.64 ,  3 , 0.99 ),
-(61,    "Promethium",       "Pm", ( 0.63,   1.0,  0.78), 1.63, 1.63, 2.62 ,  3 , 0.97 ),
-(62,      "Samarium",       "Sm", ( 0.56,   1.0,  0.78), 1.62, 1.62, 2.59 ,  3 , 0.96 ),
-(63,      "Europium",       "Eu", ( 0.38,   1.0,  0.78), 1.85, 1.85, 2.56 ,  2 , 1.09 ,  3 , 0.95 ),
-(64,    "Gadolinium",       "Gd", ( 0.27,   1.0,  0.78), 1.61, 1.61, 2.54 ,  3 , 0.93 ),
-(65,       "Terbium",       "Tb", ( 0.18,   1.0,  0.78), 1.59, 1.59, 2.51 ,  3 , 0.92 ,  4 , 0.84 ),
-(66,    "Dysprosium",       "Dy", ( 0.12,   1.0,  0.78), 1.59, 1.59, 2.49 ,  3 , 0.90 ),
-(67,       "Holmium",       "Ho", (  0.0,   1.0,  0.61), 1.58, 1.58, 2.47 ,  3 , 0.89 ),
-(68,        "Erbium",       "Er", (  0.0,  0.90,  0.45), 1.57, 1.57, 2.45 ,  3 , 0.88 ),
-(69,       "Thulium",       "Tm", (  0.0,  0.83,  0.32), 1.56, 1.56, 2.42 ,  3 , 0.87 ),
-(70,     "Ytterbium",       "Yb", (  0.0,  0.74,  0.21), 1.74, 1.74, 2.40 ,  2 , 0.93 ,  3 , 0.85 ),
-(71,      "Lutetium",       "Lu", (  0.0,  0.67,  0.14), 1.56, 1.56, 2.25 ,  3 , 0.85 ),
-(72,       "Hafnium",       "Hf", ( 0.30,  0.76,   1.0), 1.44, 1.44, 2.16 ,  4 , 0.78 ),
-(73,      "Tantalum",       "Ta", ( 0.30,  0.65,   1.0), 1.34, 1.34, 2.09 ,  5 , 0.68 ),
-(74,      "Tungsten",        "W", ( 0.12,  0.58,  0.83), 1.30, 1.30, 2.02 ,  4 , 0.70 ,  6 , 0.62 ),
-(75,       "Rhenium",       "Re", ( 0.14,  0.49,  0.67), 1.28, 1.28, 1.97 ,  4 , 0.72 ,  7 , 0.56 ),
-(76,        "Osmium",       "Os", ( 0.14,   0.4,  0.58), 1.26, 1.26, 1.92 ,  4 , 0.88 ,  6 , 0.69 ),
-(77,       "Iridium",       "Ir", ( 0.09,  0.32,  0.52), 1.27, 1.27, 1.87 ,  4 , 0.68 ),
-(78,     "Platinium",       "Pt", ( 0.81,  0.81,  0.87), 1.30, 1.30, 1.83 ,  2 , 0.80 ,  4 , 0.65 ),
-(79,          "Gold",       "Au", (  1.0,  0.81,  0.13), 1.34, 1.34, 1.79 ,  1 , 1.37 ,  3 , 0.85 ),
-(80,       "Mercury",       "Hg", ( 0.72,  0.72,  0.81), 1.49, 1.49, 1.76 ,  1 , 1.27 ,  2 , 1.10 ),
-(81,      "Thallium",       "Tl", ( 0.65,  0.32,  0.30), 1.48, 1.48, 2.08 ,  1 , 1.47 ,  3 , 0.95 ),
-(82,          "Lead",       "Pb", ( 0.34,  0.34,  0.38), 1.47, 1.47, 1.81 ,  2 , 1.20 ,  4 , 0.84 ),
-(83,       "Bismuth",       "Bi", ( 0.61,  0.30,  0.70), 1.46, 1.46, 1.63 ,  1 , 0.98 ,  3 , 0.96 ,  5 , 0.74 ),
-(84,      "Polonium",       "Po", ( 0.67,  0.36,   0.0), 1.46, 1.46, 1.53 ,  6 , 0.67 ),
-(85,      "Astatine",       "At", ( 0.45,  0.30,  0.27), 1.45, 1.45, 1.43 , -3 , 2.22 ,  3 , 0.85 ,  5 , 0.46 ),
-(86,         "Radon",       "Rn", ( 0.25,  0.50,  0.58), 1.00, 1.00, 1.34 ),
-(87,      "Francium",       "Fr", ( 0.25,   0.0,   0.4), 1.00, 1.00, 1.00 ,  1 , 1.80 ),
-(88,        "Radium",       "Ra", (  0.0,  0.49,   0.0), 1.00, 1.00, 1.00 ,  2 , 1.43 ),
-(89,      "Actinium",       "Ac", ( 0.43,  0.67,  0.98), 1.00, 1.00, 1.00 ,  3 , 1.18 ),
-(90,       "Thorium",       "Th", (  0.0,  0.72,   1.0), 1.65, 1.65, 1.00 ,  4 , 1.02 ),
-(91,  "Protactinium",       "Pa", (  0.0,  0.63,   1.0), 1.00, 1.00, 1.00 ,  3 , 1.13 ,  4 , 0.98 ,  5 , 0.89 ),
-(92,       "Uranium",        "U", (  0.0,  0.56,   1.0), 1.42, 1.42, 1.00 ,  4 , 0.97 ,  6 , 0.80 ),
-(93,     "Neptunium",       "Np", (  0.0,  0.50,   1.0), 1.00, 1.00, 1.00 ,  3 , 1.10 ,  4 , 0.95 ,  7 , 0.71 ),
-(94,     "Plutonium",       "Pu", (  0.0,  0.41,   1.0), 1.00, 1.00, 1.00 ,  3 , 1.08 ,  4 , 0.93 ),
-(95,     "Americium",       "Am", ( 0.32,  0.36,  0.94), 1.00, 1.00, 1.00 ,  3 , 1.07 ,  4 , 0.92 ),
-(96,        "Curium",       "Cm", ( 0.47,  0.36,  0.89), 1.00, 1.00, 1.00 ),
-(97,     "Berkelium",       "Bk", ( 0.54,  0.30,  0.89), 1.00, 1.00, 1.00 ),
-(98,   "Californium",       "Cf", ( 0.63,  0.21,  0.83), 1.00, 1.00, 1.00 ),
-(99,   "Einsteinium",       "Es", ( 0.70,  0.12,  0.83), 1.00, 1.00, 1.00 ),
-(100,       "Fermium",       "Fm", ( 0.70,  0.12,  0.72), 1.00, 1.00, 1.00 ),
-(101,   "Mendelevium",       "Md", ( 0.70,  0.05,  0.65), 1.00, 1.00, 1.00 ),
-(102,      "Nobelium",       "No", ( 0.74,  0.05,  0.52), 1.00, 1.00, 1.00 ),
-(103,    "Lawrencium",       "Lr", ( 0.78,   0.0,   0.4), 1.00, 1.00, 1.00 ),
-(104,       "Vacancy",      "Vac", (  0.5,   0.5,   0.5), 1.00, 1.00, 1.00),
-(105,       "Default",  "Default", (  1.0,   1.0,   1.0), 1.00, 1.00, 1.00),
-(106,         "Stick",    "Stick", (  0.5,   0.5,   0.5), 1.00, 1.00, 1.00),
-)
-
-# This list here contains all data of the elements and will be used during
-# runtime. It is a list of classes.
-# During executing Atomic Blender, the list will be initialized with the fixed
-# data from above via the class structure below (ElementProp). We
-# have then one fixed list (above), which will never be changed, and a list of
-# classes with same data. The latter can be modified via loading a separate
-# custom data file for instance.
-ELEMENTS = []
-
-# This is the list, which contains all atoms of all frames! Each item is a 
-# list which contains the atoms of a single frame. It is a list of  
-# 'AtomProp'.
-ALL_FRAMES = []
-
-# A list of ALL balls which are put into the scene
-STRUCTURE = []
+# The data blocks of the balls, which are shared by all elements (and imports)
+# with the same ball. Maps the shape of the ball to the name of the data block.
+PROTOTYPES = {}
 
 # TODO
 # add aminoacid connectivity parser
@@ -171,475 +52,222 @@ STRUCTURE = []
 # add a GUI in the tool panel to control the drivers
 
 
-# This is the class, which stores the properties for one element.
-class ElementProp(object):
-    __slots__ = ('number', 'long_name', 'short_name', 'color', 'radii', 'radii_ionic')
-    def __init__(self, number, long_name, short_name, color, radii, radii_ionic):
-        self.number = number
-        self.long_name = long_name
-        self.short_name = short_name
-        self.color = color
-        self.radii = radii
-        self.radii_ionic = radii_ionic
-
-# This is the class, which stores the properties of one atom.
-class AtomProp(object):  
-    __slots__ = ('long_name', 'short_name', 'location', 'radius', 'color', 'material', 'bonds')
-    def __init__(self, long_name, short_name, location, radius, color, material, bonds):
-        self.long_name = long_name # self.name = name
-        self.short_name = short_name # self.element = element
-        self.location = location
+# This is the class, which holds one imported molecule: the structure that was
+# read from the file (a core.structure.Structure, which also gives access to
+# all frames), the objects of the elements, and the bond meshes of the single
+# mesh bond mode with the material of the bonds of each element (also of the
+# elements without bonds). Nothing of an import is kept in module globals.
+class MoleculeProp(object):
+    __slots__ = ('structure', 'element_objects', 'bond_meshes',
+                 'bond_materials', 'twin_objects')
+    def __init__(self, structure, element_objects, bond_meshes):
+        self.structure = structure
+        self.element_objects = element_objects
+        self.bond_meshes = bond_meshes
+        self.bond_materials = []
+        # The _bonds objects of bond_mode 'OBJECTS', one per element object,
+        # in the same order. They share the meshes of the element objects.
+        self.twin_objects = []
+    
+    def close(self):
+        # release the memory map of the file
+        self.structure.close()
+
+
+# This is the class, which stores one mesh of half bonds: the object, the
+# indices of the atoms (in a frame) at both ends of each bond and the shape of
+# the cylinders. With bonds per frame, 'bonds' holds for each half bond its
+# index in all bonds of the trajectory (see track_bonds).
+class BondMeshProp(object):
+    __slots__ = ('object', 'starts', 'ends', 'radius', 'sectors', 'bonds')
+    def __init__(self, object, starts, ends, radius, sectors, bonds=None):
+        self.object = object
+        self.starts = starts
+        self.ends = ends
         self.radius = radius
-        self.color = color
-        self.material = material
-        self.bonds = bonds #list of numbers
+        self.sectors = sectors
+        self.bonds = bonds
+    
+    def vertices(self, coords, present=None):
+        '''
+        The vertices of the mesh in the frame 'coords', relative to the
+        object. Half bonds, whose bond is not 'present' (an array over all
+        bonds of the trajectory), get the radius 0.
+        '''
+        origin = numpy.array(self.object.location)
+        radius = self.radius
+        if present is not None:
+            radius = numpy.where(present[self.bonds], radius, 0.0)
+        return geometry.half_bond_vertices(coords[self.starts] - origin,
+                                           coords[self.ends] - origin,
+                                           radius, self.sectors)
 
 
 # -----------------------------------------------------------------------------
 #                                                           Some basic routines        
 
-def read_elements():
-
-    ELEMENTS[:] = []
-
-    for item in ELEMENTS_DEFAULT:
-
-        # All three radii into a list and add 1.0 for the constant
-        radii = [item[4],item[5],item[6], 1.0]
-        # The handling of the ionic radii will be done later. So far, it is an
-        # empty list.
-        radii_ionic = []
-
-        li = ElementProp(item[0],item[1],item[2],item[3],
-                                     radii,radii_ionic)
-        ELEMENTS.append(li)
-
-
-# filepath_pdb: path to pdb file
-def read_xyz_file(filepath_xyz,radiustype):
-
-    number_frames = 0
-    total_number_atoms = 0
-
-    # Open the file ...
-    filepath_xyz_p = open(filepath_xyz, "r")
+def fill_mesh(mesh, vertices, faces=(), smooth=False):
+    '''
+    Fill an empty mesh with vertices (n, 3) and faces, array by array through
+    foreach_set instead of vertex by vertex. 'faces' is a sequence of index
+    arrays, one per face size, e.g. quads (m, 4) and triangles (k, 3).
+    '''
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", numpy.ascontiguousarray(
+                                  vertices, dtype=numpy.float32).ravel())
+    faces = [f for f in faces if len(f)]
+    if faces:
+        loops = numpy.concatenate([f.ravel() for f in faces]).astype(numpy.int32)
+        loop_total = numpy.concatenate([numpy.full(len(f), f.shape[1],
+                                        dtype=numpy.int32) for f in faces])
+        loop_start = numpy.zeros(len(loop_total), dtype=numpy.int32)
+        numpy.cumsum(loop_total[:-1], out=loop_start[1:])
+        mesh.loops.add(len(loops))
+        mesh.loops.foreach_set("vertex_index", loops)
+        mesh.polygons.add(len(loop_total))
+        mesh.polygons.foreach_set("loop_start", loop_start)
+        mesh.polygons.foreach_set("loop_total", loop_total)
+        if smooth:
+            mesh.polygons.foreach_set("use_smooth",
+                                      numpy.ones(len(loop_total), dtype=bool))
+    mesh.update(calc_edges=True)
+
+
+def ball_prototype(ball_type, radius, azimuth=32, zenith=32):
+    '''
+    The data of the ball of an atom, built through bpy.data instead of with
+    operators. 'ball_type' is one of 'MESH', 'CUBE', 'NURBS' and 'META'.
+    Meshes are cached in PROTOTYPES and shared, NURBS and meta balls are new
+    data blocks.
+    '''
+    if ball_type in {'MESH', 'CUBE'}:
+        if ball_type == 'MESH':
+            key = ('MESH', azimuth, zenith, round(radius, 6))
+        else:
+            key = ('CUBE', round(radius, 6))
+        # the data block may have been deleted since the last import
+        mesh = bpy.data.meshes.get(PROTOTYPES.get(key, ''))
+        if mesh is None:
+            if ball_type == 'MESH':
+                vertices, quads, triangles = geometry.uv_sphere(azimuth, zenith,
+                                                                radius)
+                faces = (quads, triangles)
+            else:
+                vertices, quads = geometry.cube(radius)
+                faces = (quads,)
+            mesh = bpy.data.meshes.new("Ball_"+ball_type.lower())
+            fill_mesh(mesh, vertices, faces)
+            # one empty material slot, the material is set by the objects
+            mesh.materials.append(None)
+            PROTOTYPES[key] = mesh.name
+        return mesh
+    
+    elif ball_type == 'NURBS':
+        surface = bpy.data.curves.get(PROTOTYPES.get('NURBS', ''))
+        if surface is None:
+            # The point grid of a NURBS surface cannot be built through
+            # bpy.data, so the unit sphere is added by the operator once and
+            # copied afterwards.
+            bpy.ops.surface.primitive_nurbs_surface_sphere_add(
+                        view_align=False, enter_editmode=False,
+                        location=(0,0,0), rotation=(0.0, 0.0, 0.0))
+            sphere = bpy.context.scene.objects.active
+            surface = sphere.data
+            bpy.context.scene.objects.unlink(sphere)
+            bpy.data.objects.remove(sphere)
+            PROTOTYPES['NURBS'] = surface.name
+        surface = surface.copy()
+        # Something distorts the NURBS in the z-direction compared to scaling it manually in Edit mode
+        points = surface.splines[0].points
+        co = numpy.empty(len(points) * 4, dtype=numpy.float32)
+        points.foreach_get("co", co)
+        co.reshape(-1, 4)[:, :3] *= radius
+        points.foreach_set("co", co)
+        # set resolution down
+        surface.resolution_u = 2
+        surface.resolution_v = 2
+        surface.render_resolution_u = 4
+        surface.render_resolution_v = 4
+        return surface
+    
+    elif ball_type == 'META':
+        mball = bpy.data.metaballs.new("Ball_meta")
+        element = mball.elements.new()
+        element.co = (0.0, 0.0, 0.0)
+        # metaball_add made balls of radius 2, which were scaled by the radius
+        element.radius = 2.0 * radius
+        return mball
 
-    #Go through the whole file.
-    FLAG = False
-    for line in filepath_xyz_p:
 
-        # ... the loop is broken here (EOF) ...
-        if line == "":
-            continue
-
-        split_list = line.rsplit()
+# -----------------------------------------------------------------------------
+#                                                            The main routine
 
-        if len(split_list) == 1:
-            number_atoms = int(split_list[0])
-            FLAG = True
-            
-        if FLAG == True:
-        
-            line = filepath_xyz_p.readline()
-            line = line.rstrip()
-            
-            all_atoms= []
-            for i in range(number_atoms):
-
-
-                # This is a guarantee that only the total number of atoms of the
-                # first frame is used. Condition is, so far, that the number of
-                # atoms in a xyz file is constant. However, sometimes the number
-                # may increase (or decrease). If it decreases, the addon crashes.
-                # If it increases, only the tot number of atoms of the first frame
-                # is used.
-                # By time, I will allow varying atom numbers ... but this takes 
-                # some time ...            
-                if number_frames != 0:
-                    if i >= total_number_atoms:
-                        break
-                        
-       
-                line = filepath_xyz_p.readline()
-                line = line.rstrip()
-                split_list = line.rsplit()
-                short_name = str(split_list[0])
-                     
-                # Go through all elements and find the element of the current atom.
-                FLAG_FOUND = False
-                for element in ELEMENTS:
-                    if str.upper(short_name) == str.upper(element.short_name):
-                        # Give the atom its proper name, color and radius:
-                        long_name = element.long_name
-                        # int(radiustype) => type of radius:
-                        # pre-defined (0), atomic (1) or van der Waals (2)
-                        radius = float(element.radii[int(radiustype)])
-                        color = element.color
-                        FLAG_FOUND = True
-                        break
-                
-                # Is it a vacancy or an 'unknown atom' ?
-                if FLAG_FOUND == False:
-                    # Give this atom also a name. If it is an 'X' then it is a
-                    # vacancy. Otherwise ...
-                    if "X" in short_name:
-                        short_name = "VAC"
-                        long_name = "Vacancy"
-                        radius = float(ELEMENTS[-3].radii[int(radiustype)])
-                        color = ELEMENTS[-3].color
-                    # ... take what is written in the xyz file. These are somewhat
-                    # unknown atoms. This should never happen, the element list is
-                    # almost complete. However, we do this due to security reasons.
-                    else:
-                        long_name = str.upper(short_name)
-                        radius = float(ELEMENTS[-2].radii[int(radiustype)])
-                        color = ELEMENTS[-2].color
-              
-                x = float(split_list[1])
-                y = float(split_list[2])
-                z = float(split_list[3])
-                
-                location = Vector((x,y,z))
-            
-                all_atoms.append([long_name, short_name, location, radius, color])
-            
-            # We note here all elements. This needs to be done only once. 
-            if number_frames == 0:
-            
-                # This is a guarantee that only the total number of atoms of the
-                # first frame is used. Condition is, so far, that the number of
-                # atoms in a xyz file is constant. However, sometimes the number
-                # may increase (or decrease). If it decreases, the addon crashes.
-                # If it increases, only the tot number of atoms of the first frame
-                # is used.
-                # By time, I will allow varying atom numbers ... but this takes 
-                # some time ...
-                total_number_atoms = number_atoms
-                
-                # create a list of long_names
-                elements = []
-                for atom in all_atoms:
-                    FLAG_FOUND = False
-                    for element in elements:                    
-                        # If the atom name is already in the list, 
-                        # FLAG on 'True'.
-                        if element == atom[0]:
-                            FLAG_FOUND = True
-                            break
-                    # No name in the current list has been found? => New entry.
-                    if FLAG_FOUND == False:
-                        elements.append(atom[0])
-            
-            # Sort the atoms: create lists of atoms of one type
-            structure = []
-            for element in elements:
-                atoms_one_type = []
-                for atom in all_atoms:
-                    if atom[0] == element:
-                        atoms_one_type.append(AtomProp(atom[0],
-                                                       atom[1],
-                                                       atom[2],
-                                                       atom[3],
-                                                       atom[4], [], []))
-                structure.append(atoms_one_type)
-
-            ALL_FRAMES.append(structure)
-            number_frames += 1
-            FLAG = False
-
-    filepath_xyz_p.close()
-    
-    
+def add_bond_mesh(long_name, coords, starts, ends, radius, sectors, material,
+                  location, bonds=None):
+    '''
+    Make the object with the half bonds from the atoms 'starts' towards the
+    atoms 'ends' (indices into coords) of one element. Returns its
+    BondMeshProp.
+    '''
+    bond_mesh = bpy.data.meshes.new("Mesh_"+long_name+"_bonds")
+    bonds_ob = bpy.data.objects.new(long_name+'_bonds', bond_mesh)
+    bonds_ob.location = location
+    prop = BondMeshProp(bonds_ob, starts, ends, radius, sectors, bonds)
     
-    return total_number_atoms
+    faces = geometry.half_bond_faces(len(starts), sectors)
+    fill_mesh(bond_mesh, prop.vertices(coords), (faces,), smooth=True)
+    if material is not None:
+        bond_mesh.materials.append(material)
+    bpy.context.scene.objects.link(bonds_ob)
+    return prop
 
 
-def read_pdb_file(filepath_pdb, radiustype):
-    global TIME, LAST_TIME
-    if DEBUG:
-        print("Start reading pdb file. ", end='')
-        current = time.time()
-        LAST_TIME = TIME
-    
-    number_frames = 0
-    total_number_atoms = 0
-
-    # Open the file ...
-    filepath_pdb_p = open(filepath_pdb, "r")
-
-    #Go through the whole file.
-    all_atoms = {}
-    bonds = {}
-    elements = []
-    # TODO include as GUI option
-    # if double == False: exclude double bonds
-    double = False
-    
-    ## cut out unit cell
-    #import bpy
-    #uc = bpy.data.objects['Cell_b']
-    #O = uc.location
-    #b = uc.data.vertices[6].co
-    #c = uc.data.vertices[3].co
-    #d = uc.data.vertices[4].co
-
-    #B = b/(b.length*b.length)
-    #C = c/(c.length*c.length)
-    #D = d/(d.length*d.length)
+# The part of the progress of read_molecule, which is reading the file; the
+# rest is guessing the bonds.
+READ_FRACTION = 0.2
 
-    
-    for line in filepath_pdb_p:
 
-        # ... the loop is broken here (EOF) ...
-        if line == "":
-            continue
-        
-        # get atom information
-        if line[:6] == 'HETATM' or line[:4] == 'ATOM':
-            # get atom number
-            atomID = int(line[6:11])
-            # get atom type, remove whitespace and capitalize first letter
-            short_name = line[76:78].strip().capitalize()
-            #charge = line[78:80].strip()
-            # slice coordinates
-            x, y, z = map(float, (line[30:38], line[38:46], line[46:54]))
-            
-            location = Vector((x,y,z))
-            
-            ## check if it lies in unit cell, discard otherwise
-            #p = location - O
-            
-            #if (0 < B.dot(p) < 1
-                #and 0 < C.dot(p) < 1
-                #and 0 < D.dot(p) < 1):
-                #pass
-            #else:
-                #continue
-            
-            # Go through all elements and find the element of the current atom.
-            FLAG_FOUND = False
-            for element in ELEMENTS:
-                if str.upper(short_name) == str.upper(element.short_name):
-                    # Give the atom its proper name, color and radius:
-                    long_name = element.long_name
-                    # int(radiustype) => type of radius:
-                    # pre-defined (0), atomic (1) or van der Waals (2)
-                    radius = float(element.radii[int(radiustype)])
-                    color = element.color
-                    FLAG_FOUND = True
-                    break
-            
-            # Is it a vacancy or an 'unknown atom' ?
-            if FLAG_FOUND == False:
-                # Give this atom also a name. If it is an 'X' then it is a
-                # vacancy. Otherwise ...
-                if "X" in short_name:
-                    short_name = "VAC"
-                    long_name = "Vacancy"
-                    radius = float(ELEMENTS[-3].radii[int(radiustype)])
-                    color = ELEMENTS[-3].color
-                # ... take what is written in the pdb file. These are somewhat
-                # unknown atoms. This should never happen, the element list is
-                # almost complete. However, we do this due to security reasons.
-                else:
-                    long_name = str.upper(short_name)
-                    radius = float(ELEMENTS[-2].radii[int(radiustype)])
-                    color = ELEMENTS[-2].color
-            
-            all_atoms[atomID] = [long_name, short_name, location, radius, color]
-        
-        # get bond information
-        elif line[:6] == 'CONECT':
-            # takes care of strange hyperchem bonds to atom 0
-            if int(line[6:11]) > 0:
-                # base atom
-                atomID1 = int(line[6:11])
-                if not atomID1 in bonds:
-                    bonds[atomID1] = []
-                # loop over conect entries
-                for i in range((len(line) - 11) // 5): # // floor division: 1//2=0 
-                    # get connected atomID
-                    atomID2 = int(line[11 + i*5 : 16 + i*5])
-                    # for hyperchem bonds to atom 0
-                    if atomID2 > 0:
-                        if double or not atomID2 in bonds[atomID1]:
-                            # append to list
-                            bonds[atomID1].append(atomID2)
-        
-        # if the model ends
-        elif line[:6] == 'ENDMDL':
-            if DEBUG: 
-                current = time.time()
-                print("{:4.1f}  {:4.1f}".format(current-TIME, current-LAST_TIME))
-                LAST_TIME = current
-                print("ENDMDL found.")
-            
-            if number_frames == 0:
-                # As the number of atoms in a pdb Model is not explicitely given,
-                # we just figure it out here, after the first model. If there are
-                # different numbers of atoms in different models, than this script
-                # can not handle it (yet) and will very likely do something weird.
-                total_number_atoms = len(all_atoms)
-            
-            structure, elements = make_structure_from_pdb(all_atoms, bonds, elements)
-            
-            ALL_FRAMES.append(structure)
-            number_frames += 1
-            all_atoms = {}
-    
-    # if there was only one model and no ENDMDL present
-    if DEBUG: 
-        current = time.time()
-        print("{:4.1f}  {:4.1f}".format(current-TIME, current-LAST_TIME))
-        LAST_TIME = current
-        print("Finished reading file. Cleaning up.", end='')
-    if all_atoms:
-        if number_frames == 0:
-            total_number_atoms = len(all_atoms)
-        
-        structure, elements = make_structure_from_pdb(all_atoms, bonds, elements)
-            
-        ALL_FRAMES.append(structure)
-    
-    filepath_pdb_p.close()
-    if DEBUG: 
-        current = time.time()
-        print("{:4.1f}  {:4.1f}".format(current-TIME, current-LAST_TIME))
-        LAST_TIME = current
-        print("Done reading file.")
-    return total_number_atoms
-        
-def make_structure_from_pdb(all_atoms, bonds, elements):
-    global TIME, LAST_TIME
+def read_molecule(filepath, radiustype, guess_bonds, use_index_cache=True,
+                  frame_indices=None, task=None):
     '''
-    This does NOT work if all_atoms comes from an xyz file!
+    Read the structure of a file and guess its bonds. This is the part of an
+    import that does not touch bpy, so that it can run in a background thread
+    as a core.background.Task ('task'), which gets the progress and may be
+    cancelled. Only the part of the file up to the last of the frame_indices
+    (None: all frames) is read.
     '''
-    if DEBUG: 
-        current = time.time()
-        print("{:4.1f}  {:4.1f}".format(current-TIME, current-LAST_TIME))
-        LAST_TIME = current
-        print("Making structure", end='')
-    # We note here all elements. This needs to be done only once. 
-    if not elements:
-        for atomID, atom in all_atoms.items():
-            FLAG_FOUND = False
-            for element in elements:
-                # If the atom name is already in the list, 
-                # FLAG on 'True'.
-                if element == atom[0]:
-                    FLAG_FOUND = True
-                    break
-            # No name in the current list has been found? => New entry.
-            if FLAG_FOUND == False:
-                elements.append(atom[0])
-    if DEBUG:
-        current = time.time()
-        print("{:4.1f}  {:4.1f}".format(current-TIME, current-LAST_TIME))
-        LAST_TIME = current
-        print("Sorting atoms", end='')
-    # Sort the atoms: create lists of atoms of one type
-    structure = []
-    for element in elements:
-        atoms_one_type = []
-        for atomID, atom in all_atoms.items():
-            if atom[0] == element:
-                atoms_one_type.append(AtomProp(atom[0],
-                                                atom[1],
-                                                atom[2],
-                                                atom[3],
-                                                atom[4], [], []))
-                # now that we know the final "location" of the AtomProp, let's
-                # change all the atomIDs in the bonds dict
-                new_ID = '{0}_{1}'.format(atom[1], len(atoms_one_type)-1)
-                if atomID in bonds:
-                    bonds[new_ID] = bonds[atomID]
-                    del bonds[atomID]
-                    # if atomID is not a key in bonds, it won't be a value either
-                    for bond_list in bonds.values():
-                        for i, bID in enumerate(bond_list):
-                            if bID == atomID:
-                                bond_list[i] = new_ID
-
-        structure.append(atoms_one_type)
-    # all the atomIDs in the bonds should have been changed now, let's add them
-    # to the AtomProps
-    if DEBUG:
-        current = time.time()
-        print("{:4.1f}  {:4.1f}".format(current-TIME, current-LAST_TIME))
-        LAST_TIME = current
-        print("Sorting Bonds", end='')
-    for atoms_of_one_type in structure:
-        print(atoms_of_one_type[0].short_name)
-        for i, atom in enumerate(atoms_of_one_type):
-            print("\r{}".format(i), end='')
-            atomID = '{0}_{1}'.format(atom.short_name, i)
-            atom.bonds = bonds.get(atomID, [])
-        print()
-    return structure, elements
-
-
+    reset()
+    start = time.perf_counter()
     
+    # The element list is read once and kept for all further imports.
+    if not ELEMENTS:
+        read_elements()
     
-def find_bonds(structure):
-    # try connecting atoms
-    # do H atoms first
-    for atoms_of_one_type in structure:
-        if atoms_of_one_type[0].short_name == 'H':
-            short_name1 = 'H'
-            for h, H1 in enumerate(atoms_of_one_type):
-                if not H1.bonds: # if there is already a bond recorded
-                    FOUND = False
-                    # loop through all elements
-                    for atoms_of_one_type in structure:
-                        # do not check bonds with other H atoms or if bond was already found
-                        if not FOUND and atoms_of_one_type[0].short_name != 'H':
-                            short_name2 = atoms_of_one_type[0].short_name
-                            for i, atom2 in enumerate(atoms_of_one_type):
-                                # no bonds between two H atoms
-                                distance = (H1.location - atom2.location).length
-                                if (0.6 < distance < 1.6
-                                   or ((short_name1 == 'S' or short_name2 == 'S') and 0.6 < distance < 1.9)): # long sulfur bonds
-                                    # append the one bond and break the loop
-                                    H1.bonds.append('{0}_{1}'.format(short_name2, i))
-                                    atom2.bonds.append('{0}_{1}'.format("H", h))
-                                    FOUND = True
-                                    break
+    # Indexing the file is most of the work of reading it, it is reported
+    # (and may be cancelled) block by block, as the first READ_FRACTION.
+    progress = None
+    if task is not None:
+        progress = TaskProgress(task, 'read', os.path.getsize(filepath),
+                                0.0, READ_FRACTION)
+    structure = readers.read_structure(filepath, radiustype, use_index_cache,
+                                       frame_indices, progress)
+    start = stage_done('read', start, atoms=len(structure),
+                       frames=len(structure.frames))
     
-    for atoms_of_one_type in structure:
-        # now go through the other elements
-        if atoms_of_one_type[0].short_name != 'H':
-            for j, atom1 in enumerate(atoms_of_one_type):
-                # preliminary check if bonds are already saturated
-                bonds = atom1.bonds
-                short_name1 = atom1.short_name
-                if not ((short_name1 == 'C' and len(bonds) == 4)
-                    or (short_name1 == 'N' and len(bonds) == 3)
-                    or (short_name1 == 'O' and len(bonds) == 2)):
-                    FOUND = False
-                    # now go through all elements except H to check for bonds
-                    for atoms_of_one_type in structure:
-                        if not FOUND and atoms_of_one_type[0].short_name != 'H':
-                            short_name2 = atoms_of_one_type[0].short_name
-                            for i, atom2 in enumerate(atoms_of_one_type):
-                                # no bonds between two H atoms
-                                distance = (atom1.location - atom2.location).length
-                                if (0.6 < distance < 1.6
-                                or ((short_name1 == 'S' or short_name2 == 'S') and 0.6 < distance < 1.9)): # long sulfur bonds
-                                    bond_name = '{0}_{1}'.format(short_name2, i)
-                                    if bond_name not in bonds:
-                                        bonds.append(bond_name)
-                                        # check number of bonds to speed up calculation
-                                        if ((short_name1 == 'C' and len(bonds) == 4)
-                                            or (short_name1 == 'N' and len(bonds) == 3)
-                                            or (short_name1 == 'O' and len(bonds) == 2)):
-                                            FOUND = True
-                                            break
-                                    reverse_bond = '{0}_{1}'.format(short_name1, j)
-                                    if reverse_bond not in atom2.bonds:
-                                        atom2.bonds.append(reverse_bond)
-                                    
-# -----------------------------------------------------------------------------
-#                                                            The main routine
+    try:
+        progress = None
+        if task is not None:
+            progress = TaskProgress(task, 'bonds', 2 * len(structure),
+                                    READ_FRACTION)
+        if guess_bonds:
+            find_bonds(structure, progress)
+    except Cancelled:
+        # release the memory map of the file
+        structure.close()
+        raise
+    stage_done('bonds', start, bonds=len(structure.bonds))
+    return structure
+
 
 def import_molecule(
                Style,
@@ -659,32 +287,26 @@ def import_molecule(
                put_to_center_all,
                use_camera,
                use_lamp,
-               filepath):
-    global TIME
-    TIME = time.time()
+               filepath,
+               use_index_cache=True,
+               bond_mode='OBJECTS',
+               use_mass_weights=False,
+               frame_indices=None,
+               structure=None):
     # List of materials
     atom_material_list = []
 
-    # ------------------------------------------------------------------------
-    # INITIALIZE THE ELEMENT LIST
-
-    read_elements()
-
     # ------------------------------------------------------------------------
     # READING DATA OF ATOMS
-    if filepath[-3:] == 'xyz':
-        Number_of_total_atoms = read_xyz_file(filepath, radiustype)
-    elif filepath[-3:] == 'pdb':
-        Number_of_total_atoms = read_pdb_file(filepath, radiustype)
-    
-    # We show the atoms of the first frame.
-    first_frame = ALL_FRAMES[0]
-    
-    # guess bonds
-    if Style != 'BALLS' and guess_bonds:
-        if DEBUG: print('Guessing bonds.')
-        find_bonds(first_frame)
-        if DEBUG: print('Done.')
+    # We show the atoms of the first frame. The structure may have been read
+    # by read_molecule already, in a background thread.
+    if structure is None:
+        structure = read_molecule(filepath, radiustype,
+                                  Style != 'BALLS' and guess_bonds,
+                                  use_index_cache, frame_indices)
+    start = time.perf_counter()
+    groups = structure.groups
+    molecule = MoleculeProp(structure, [], [])
         
     # ------------------------------------------------------------------------
     # MATERIAL PROPERTIES FOR ATOMS
@@ -692,17 +314,13 @@ def import_molecule(
     # Create first a new list of materials for each type of atom
     # (e.g. hydrogen)
     if bpy.context.scene.render.engine == 'BLENDER_RENDER':
-        for atoms_of_one_type in first_frame:
-            # Take the first atom
-            atom = atoms_of_one_type[0]
+        for atom in groups:
             material = bpy.data.materials.new(atom.long_name)
             material.name = atom.long_name
             material.diffuse_color = atom.color
             atom_material_list.append(material)
     elif bpy.context.scene.render.engine == 'CYCLES':
-        for atoms_of_one_type in first_frame:
-            # Take the first atom
-            atom = atoms_of_one_type[0]
+        for atom in groups:
             material = bpy.data.materials.new(atom.long_name)
             material.name = atom.long_name
             material.use_nodes = True
@@ -711,120 +329,75 @@ def import_molecule(
             material.node_tree.nodes['Diffuse BSDF'].inputs[0].default_value = color
             atom_material_list.append(material)
             
-    if DEBUG: print("Make materials")
-    # Now, we go through all atoms and give them a material. For all atoms ...
-    for atoms_of_one_type in first_frame:
-        for atom in atoms_of_one_type:
-            # ... and all materials ...
-            for material in atom_material_list:
-                # ... select the correct material for the current atom via
-                # comparison of names ...
-                if atom.long_name in material.name:
-                    # ... and give the atom its material properties.
-                    # However, before we check if it is a vacancy
-                    # The vacancy is represented by a transparent cube.
-                    if atom.long_name == "Vacancy":
-                        material.transparency_method = 'Z_TRANSPARENCY'
-                        material.alpha = 1.3
-                        material.raytrace_transparency.fresnel = 1.6
-                        material.raytrace_transparency.fresnel_factor = 1.6
-                        material.use_transparency = True
-                    # The atom gets its properties.
-                    atom.material = material
+    # Now, we go through all elements and give them a material. For all
+    # elements ...
+    for atom in groups:
+        # ... and all materials ...
+        for material in atom_material_list:
+            # ... select the correct material for the current element via
+            # comparison of names ...
+            if atom.long_name in material.name:
+                # ... and give the element its material properties.
+                # However, before we check if it is a vacancy
+                # The vacancy is represented by a transparent cube.
+                if atom.long_name == "Vacancy":
+                    material.transparency_method = 'Z_TRANSPARENCY'
+                    material.alpha = 1.3
+                    material.raytrace_transparency.fresnel = 1.6
+                    material.raytrace_transparency.fresnel_factor = 1.6
+                    material.use_transparency = True
+                # The atoms of the element get its properties.
+                atom.material = material
+
+    start = stage_done('materials', start, materials=len(groups))
 
     # ------------------------------------------------------------------------
     # TRANSLATION OF THE STRUCTURE TO THE ORIGIN
 
     # It may happen that the structure in a XYZ file already has an offset
 
-    if DEBUG: print("Center.")
-
-    # If chosen, the structure is put into the center of the scene
-    # (only the first frame).
-    if put_to_center == True and put_to_center_all == False:
-
-        sum_vec = Vector((0.0,0.0,0.0))
-
-        # Sum of all atom coordinates
-        for atoms_of_one_type in first_frame:
-            sum_vec = sum([atom.location for atom in atoms_of_one_type], sum_vec)
-
-        # Then the average is taken
-        sum_vec = sum_vec / Number_of_total_atoms
+    
+    # All operations work in place on structure.coords, so the locations of
+    # the atoms in the first frame (views into it) are updated as well.
 
-        # After, for each atom the center of gravity is substracted
-        for atoms_of_one_type in first_frame:
-            for atom in atoms_of_one_type:
-                atom.location -= sum_vec
+    # The atoms are weighted by their masses, if chosen.
+    weights = transform.atom_masses(structure) if use_mass_weights else None
 
     # If chosen, the structure is put into the center of the scene
-    # (all frames).
-    if put_to_center_all == True:
-
-        # For all frames
-        for frame in ALL_FRAMES:
-
-            sum_vec = Vector((0.0,0.0,0.0))
-
-            # Sum of all atom coordinates
-            for (i, atoms_of_one_type) in enumerate(frame):
-
-                # This is a guarantee that only the total number of atoms of the
-                # first frame is used. Condition is, so far, that the number of
-                # atoms in a xyz file is constant. However, sometimes the number
-                # may increase (or decrease). If it decreases, the addon crashes.
-                # If it increases, only the tot number of atoms of the first frame
-                # is used.
-                # By time, I will allow varying atom numbers ... but this takes 
-                # some time ...
-                if i >= Number_of_total_atoms:
-                    break
-
-                sum_vec = sum([atom.location for atom in atoms_of_one_type], sum_vec)
+    # (only the first frame, or all frames).
+    # The center (of gravity or of mass) is substracted from each atom.
+    transform.transform(structure.coords,
+                        put_to_center == True or put_to_center_all == True,
+                        weights)
 
-            # Then the average is taken
-            sum_vec = sum_vec / Number_of_total_atoms
-
-            # After, for each atom the center of gravity is substracted
-            for atoms_of_one_type in frame:
-                for atom in atoms_of_one_type:
-                    atom.location -= sum_vec
+    # The other frames are put into the center when they are decoded.
+    structure.frames.center = put_to_center_all
+    structure.frames.weights = weights
 
    
     # ------------------------------------------------------------------------
     # SCALING
-    if DEBUG: print("Scale.")
 
-    # Take all atoms and adjust their radii and scale the distances.
-    for atoms_of_one_type in first_frame:
-        for atom in atoms_of_one_type:
-            atom.location *= Ball_distance_factor
+    # Take all atoms and adjust their radii and scale the distances, in all
+    # frames.
+    transform.transform(structure.coords, scale=Ball_distance_factor)
+    structure.frames.scale = Ball_distance_factor
     
     # ------------------------------------------------------------------------
     # DETERMINATION OF SOME GEOMETRIC PROPERTIES
-    if DEBUG: print("Geometry, Camera and Lamp.")
 
     # In the following, some geometric properties of the whole object are
     # determined: center, size, etc.
-    sum_vec = Vector((0.0,0.0,0.0))
-
-    # First the center is determined. All coordinates are summed up ...
-    for atoms_of_one_type in first_frame:
-        sum_vec = sum([atom.location for atom in atoms_of_one_type], sum_vec)
+    first_coords = structure.coords
 
-    # ... and the average is taken. This gives the center of the object.
-    object_center_vec = sum_vec / Number_of_total_atoms
+    # The average of all coordinates gives the center of the object.
+    object_center = first_coords.mean(axis=0)
+    object_center_vec = Vector(object_center)
 
     # Now, we determine the size.The farthest atom from the object center is
     # taken as a measure. The size is used to place well the camera and light
     # into the scene.
-
-    object_size_vec = []
-    for atoms_of_one_type in first_frame:
-        object_size_vec += [atom.location - object_center_vec for atom in atoms_of_one_type]
-
-    object_size = 0.0
-    object_size = max(object_size_vec).length
+    object_size = transform.bounding_size(first_coords, object_center)
 
     # ------------------------------------------------------------------------
     # CAMERA AND LAMP
@@ -908,131 +481,64 @@ def import_molecule(
         bpy.context.scene.world.light_settings.ao_factor = 0.2
         
 
+    start = stage_done('scene', start)
+
     # ------------------------------------------------------------------------
     # DRAWING THE ATOMS
-    if DEBUG: print("Draw Atoms.")
 
     bpy.ops.object.select_all(action='DESELECT')
     
     # store actual object names, as .xxx might be appended
     element_objects = {}
     # For each list of atoms of ONE type (e.g. Hydrogen)
-    for atoms_of_one_type in first_frame:
-        if DEBUG: print("{}: {} of atoms".format(atoms_of_one_type[0].short_name, len(atoms_of_one_type)))
+    for atom, atom_indices in zip(groups, structure.indices):
         # Create first the vertices composed of the coordinates of all
         # atoms of one type
-        atom_vertices = []
-        if DEBUG: print('  Jobs: verts', end=', ')
-        for atom in atoms_of_one_type:
-            # In fact, the object is created in the World's origin.
-            # This is why 'object_center_vec' is substracted. At the end
-            # the whole object is translated back to 'object_center_vec'.
-            atom_vertices.append( atom.location - object_center_vec )
-        
-        if DEBUG: print('mesh', end=', ')
+        # In fact, the object is created in the World's origin.
+        # This is why 'object_center' is substracted. At the end
+        # the whole object is translated back to 'object_center_vec'.
+        atom_vertices = first_coords[atom_indices] - object_center
+
 
         # Build the mesh
         atom_mesh = bpy.data.meshes.new("Mesh_"+atom.long_name)
-        atom_mesh.from_pydata(atom_vertices, [], [])
-        atom_mesh.update()
+        fill_mesh(atom_mesh, atom_vertices)
         new_atom_mesh = bpy.data.objects.new(atom.long_name, atom_mesh)
         element_objects[atom.long_name] = new_atom_mesh
         bpy.context.scene.objects.link(new_atom_mesh)
 
-        if DEBUG: print('vertgroups', end=', ')
-        # assign each vertex its own vertex group
-        for i, atom in enumerate(atoms_of_one_type):
-            vg = new_atom_mesh.vertex_groups.new(str(i))
-            vg.add((i,), 1.0, 'ADD')
-        
-        if DEBUG: print('baseatom')
 
         # Now, build a representative sphere (atom)
         current_layers=bpy.context.scene.layers
         
         # if style is sticks: set Ball radius to bond_radius
+        if Style == 'STICKS':
+            ball_radius = bond_radius
+        elif Style == 'BAS':
+            # minimum radius is bond radius
+            ball_radius = (atom.radius - bond_radius) * Ball_radius_factor + bond_radius
+        elif Style == 'BALLS':
+            ball_radius = atom.radius * Ball_radius_factor
         
-        print("Style %s" % Style)
+        # The ball is built through bpy.data, without operators.
         if atom.long_name == "Vacancy":
-            bpy.ops.mesh.primitive_cube_add(
-                            view_align=False, enter_editmode=False,
-                            location=(0.0, 0.0, 0.0),
-                            rotation=(0.0, 0.0, 0.0),
-                            layers=current_layers)
-            ball = bpy.context.scene.objects.active
-            if Style == 'STICKS':
-                ball_radius = bond_radius
-            elif Style == 'BAS':
-                # minimum radius is bond radius
-                ball_radius = (atom.radius - bond_radius) * Ball_radius_factor + bond_radius
-            elif Style == 'BALLS':
-                ball_radius = atom.radius * Ball_radius_factor
-            for v in ball.data.vertices:
-                v.co *= ball_radius
+            ball_data = ball_prototype('CUBE', ball_radius)
         else:
-            # NURBS balls
-            if Ball_type == 'NURBS':
-                bpy.ops.surface.primitive_nurbs_surface_sphere_add(
-                            view_align=False, enter_editmode=False,
-                            location=(0,0,0), rotation=(0.0, 0.0, 0.0),
-                            layers=current_layers)
-                ball = bpy.context.scene.objects.active
-                if Style == 'STICKS':
-                    ball_radius = bond_radius
-                elif Style == 'BAS':
-                    # minimum radius is bond radius
-                    ball_radius = (atom.radius - bond_radius) * Ball_radius_factor + bond_radius
-                elif Style == 'BALLS':
-                    ball_radius = atom.radius * Ball_radius_factor
-                # Something distorts the NURBS in the z-direction compared to scaling it manually in Edit mode
-                for p in ball.data.splines[0].points:
-                    p.co.xyz *= ball_radius
-                # set resolution down
-                ball.data.resolution_u = 2
-                ball.data.resolution_v = 2
-                ball.data.render_resolution_u = 4
-                ball.data.render_resolution_v = 4
-            # UV balls
-            elif Ball_type == "MESH":
-                bpy.ops.mesh.primitive_uv_sphere_add(
-                            segments=Ball_azimuth, ring_count=Ball_zenith,
-                            size=1, view_align=False, enter_editmode=False,
-                            location=(0,0,0), rotation=(0, 0, 0),
-                            layers=current_layers)
-                ball = bpy.context.scene.objects.active
-                if Style == 'STICKS':
-                    ball_radius = bond_radius
-                elif Style == 'BAS':
-                    # minimum radius is bond radius
-                    ball_radius = (atom.radius - bond_radius) * Ball_radius_factor + bond_radius
-                elif Style == 'BALLS':
-                    ball_radius = atom.radius * Ball_radius_factor
-                for v in ball.data.vertices:
-                    v.co *= ball_radius
-
-            # Meta balls
-            elif Ball_type == "META":
-                bpy.ops.object.metaball_add(type='BALL', view_align=False, 
-                            enter_editmode=False, location=(0, 0, 0), 
-                            rotation=(0, 0, 0), layers=current_layers)
-                ball = bpy.context.scene.objects.active
-                if Style == 'STICKS':
-                    ball_radius = bond_radius
-                elif Style == 'BAS':
-                    # minimum radius is bond radius
-                    ball_radius = (atom.radius - bond_radius) * Ball_radius_factor + bond_radius
-                elif Style == 'BALLS':
-                    ball_radius = atom.radius * Ball_radius_factor
-                bpy.ops.object.editmode_toggle()
-                bpy.ops.transform.resize(value=(ball_radius,) * 3)
-                bpy.ops.object.editmode_toggle()
+            ball_data = ball_prototype(Ball_type, ball_radius,
+                                       Ball_azimuth, Ball_zenith)
         
         ## scale ball
-        if DEBUG: print("Making objects.")
         if atom.long_name == "Vacancy":
-            ball.name = "Cube_"+atom.long_name
+            ball_name = "Cube_"+atom.long_name
         else:
-            ball.name = "Ball (NURBS)_"+atom.long_name
+            ball_name = "Ball (NURBS)_"+atom.long_name
+        ball = bpy.data.objects.new(ball_name, ball_data)
+        bpy.context.scene.objects.link(ball)
+        ball.layers = current_layers
+        if ball.material_slots:
+            # The prototype mesh is shared with other elements, so the
+            # material is linked to the object.
+            ball.material_slots[0].link = 'OBJECT'
         ball.active_material = atom.material
         
         parenting = 'dupli'
@@ -1042,51 +548,87 @@ def import_molecule(
             new_atom_mesh.dupli_type = 'VERTS'
         elif parenting == 'vertex':
             # Parent to vertex groups
+            bpy.context.scene.objects.active = ball
+            progress = Progress("object", len(atom_indices))
             for i, vert in enumerate(new_atom_mesh.data.vertices):
-                print("\r  object: {}".format(i), end='')
+                progress.update(i)
                 bpy.ops.object.duplicate(linked=True)
                 new_ball = bpy.context.scene.objects.active
                 new_ball.parent = new_atom_mesh
                 new_ball.parent_type = 'VERTEX'
                 new_ball.parent_vertices[0] = vert.index
-            print()
+            progress.finish()
             bpy.context.scene.objects.unlink(ball)
         # The object is back translated to 'object_center_vec'.
         new_atom_mesh.location = object_center_vec
-        STRUCTURE.append(new_atom_mesh)
-
-    if DEBUG: print("Draw Bonds.")
-    if Style != 'BALLS': # if not balls style
-        # make bond material if generic
-        if bond_material_type == 'GENERIC':
-            if bpy.context.scene.render.engine == 'BLENDER_RENDER':
-                bond_material = bpy.data.materials.new('bond_generic')
-                bond_material.name = 'bond_generic'
-                bond_material.diffuse_color = bond_color
-            elif bpy.context.scene.render.engine == 'CYCLES':
-                bond_material = bpy.data.materials.new('bond_generic')
-                bond_material.name = 'bond_generic'
-                bond_material.use_nodes = True
-                # add alpha value to atom.color
-                color = list(bond_color) + [1.0]
-                bond_material.node_tree.nodes['Diffuse BSDF'].inputs[0].default_value = color
-        
+        molecule.element_objects.append(new_atom_mesh)
+
+    start = stage_done('atoms', start, atoms=len(structure),
+                       objects=2 * len(groups))
+
+    # make bond material if generic
+    if Style != 'BALLS' and bond_material_type == 'GENERIC':
+        if bpy.context.scene.render.engine == 'BLENDER_RENDER':
+            bond_material = bpy.data.materials.new('bond_generic')
+            bond_material.name = 'bond_generic'
+            bond_material.diffuse_color = bond_color
+        elif bpy.context.scene.render.engine == 'CYCLES':
+            bond_material = bpy.data.materials.new('bond_generic')
+            bond_material.name = 'bond_generic'
+            bond_material.use_nodes = True
+            # add alpha value to atom.color
+            color = list(bond_color) + [1.0]
+            bond_material.node_tree.nodes['Diffuse BSDF'].inputs[0].default_value = color
+    
+    if Style != 'BALLS' and bond_mode == 'MESH':
+        # All half bonds starting at the atoms of one element are put into one
+        # mesh. The cylinders are computed from the coordinate arrays, there
+        # are no objects or constraints per bond.
+        # indices (in a frame) of the atoms at both ends of each bond, in
+        # both directions
+        half_bonds = structure.bonds.half_bonds()
+        start_elements = structure.elements[half_bonds[:, 0]]
+        for k, atom in enumerate(groups):
+            long_name = atom.long_name
+            if bond_material_type == 'ATOMS':
+                molecule.bond_materials.append(atom.material)
+            elif bond_material_type == 'GENERIC':
+                molecule.bond_materials.append(bond_material)
+            else:
+                molecule.bond_materials.append(None)
+            starts, ends = half_bonds[start_elements == k].T
+            if not len(starts):
+                continue
+            molecule.bond_meshes.append(add_bond_mesh(
+                            long_name, first_coords, starts, ends,
+                            bond_radius, bond_sectors,
+                            molecule.bond_materials[-1], object_center_vec))
+        start = stage_done('bond_objects', start,
+                           bonds=len(structure.bonds),
+                           objects=len(molecule.bond_meshes))
+    
+    elif Style != 'BALLS': # if not balls style
         # if we use dupliverts we need to create a second object, linked to the same
-        # mesh as our element meshes, that doesn't do duplivert parenting
+        # mesh as our element meshes, that doesn't do duplivert parenting.
+        # Bonds are parented to its vertices by index, so it needs no vertex
+        # groups.
         bond_objects = {}
         for long_name, ob in element_objects.items():
             bonds_mesh = bpy.data.objects.new(long_name+'_bonds', ob.data)
-            for i, v in enumerate(bonds_mesh.data.vertices):
-                vg = bonds_mesh.vertex_groups.new(str(i))
-                vg.add((i,), 1.0, 'ADD')
             bpy.context.scene.objects.link(bonds_mesh)
             bonds_mesh.location = object_center_vec
             bond_objects[long_name] = bonds_mesh
+        molecule.twin_objects = [bond_objects[atom.long_name]
+                                 for atom in groups]
+        
+        # the index of each atom among the atoms (vertices) of its element
+        local_indices = structure.local_indices()
         
         all_bonds = []
+        # (long name, vertex index) of the far end of each bond in all_bonds
+        bond_targets = []
         # go through all elements and make a mesh for each element
-        for atoms_of_one_type in first_frame:
-            print('{}: {} atoms'.format(atoms_of_one_type[0].long_name, len(atoms_of_one_type)))
+        for atom, atom_indices in zip(groups, structure.indices):
             # create mesh for half a bond
             if Stick_type == 'NURBS':
                 bpy.ops.surface.primitive_nurbs_surface_cylinder_add()
@@ -1121,16 +663,19 @@ def import_molecule(
                     vert.co.z = -tmp_co.y
             
             if bond_material_type == 'ATOMS':
-                bond_mesh.active_material = atoms_of_one_type[0].material
+                bond_mesh.active_material = atom.material
                 #print(new_bond_ob.active_material)
             elif bond_material_type == 'GENERIC':
                 bond_mesh.active_material = bond_material
             
             # now that all atom meshes have been drawn, add bonds
-            for i, atom in enumerate(atoms_of_one_type):
-                print("\r  object: {}".format(i), end='')
-                for bond in atom.bonds:
-                    short_name2, id2 = bond.split('_')
+            progress = Progress("object", len(atom_indices))
+            for i, g in enumerate(atom_indices.tolist()):
+                progress.update(i)
+                for partner in structure.bonds.partners(g).tolist():
+                    atom2 = groups[structure.elements[partner]]
+                    short_name2 = atom2.short_name
+                    id2 = local_indices[partner]
                     
                     # duplicate bond
                     new_bond_ob = bpy.data.objects.new('bond_{}{}-{}{}'.format(
@@ -1144,11 +689,15 @@ def import_molecule(
                     new_bond_ob.parent_vertices[0] = i
                     
                     all_bonds.append(new_bond_ob)
+                    bond_targets.append((atom2.long_name, int(id2)))
                     
                     #print("find name {:5.3f}, make object {:5.3f}, parent {:5.3f}, constraint {:5.3f}".format(*t))
-            print()
+            progress.finish()
             bpy.context.scene.objects.unlink(bond_mesh)
 
+        start = stage_done('bond_objects', start,
+                           bonds=len(structure.bonds), objects=len(all_bonds))
+        
         # add one constraint to one bond
         #add constraint to stretch towards bonded vertex group
         bpy.context.scene.objects.active = all_bonds[0]
@@ -1164,29 +713,29 @@ def import_molecule(
         # copy constraint to all selected objects
         bpy.ops.object.constraints_copy()
         
-        # map short names to long names
-        element_dict = {}
-        for atoms_of_one_type in first_frame:
-            sn = atoms_of_one_type[0].short_name
-            for element in ELEMENTS:
-                if sn == element.short_name:
-                    element_dict[sn] = element.long_name
-        
-        print("Loop through constraints: {} bonds".format(len(all_bonds)))
+        # STRETCH_TO can only address a vertex through a vertex group, so
+        # only the atoms at the far end of a bond get one, named after the
+        # vertex index. The groups live on the element objects (the
+        # constraint target is no parent, so dupliverts don't matter), their
+        # weights are stored in the mesh shared with the _bonds objects.
+        targets = set()
         # loop through all object constraints and set targets
-        for i, o in enumerate(all_bonds):
-            print("\r  constraint: {}".format(i), end='')
-            atom1, atom2 = o.name.split('_')[1].split('-')
-            m = re.match('([A-Za-z]+)([0-9]+)', atom2)
-            short2 = m.group(1)
-            id2 = m.group(2)
+        progress = Progress("constraint", len(all_bonds))
+        for i, (o, target) in enumerate(zip(all_bonds, bond_targets)):
+            progress.update(i)
+            long_name2, id2 = target
+            element_ob = element_objects[long_name2]
+            if target not in targets:
+                vg = element_ob.vertex_groups.new(str(id2))
+                vg.add((id2,), 1.0, 'REPLACE')
+                targets.add(target)
             
             c = o.constraints[-1]
-            c.target = bond_objects[element_dict[short2]]
-            c.subtarget = id2
-        print()
-            
-            
+            c.target = element_ob
+            c.subtarget = str(id2)
+        progress.finish()
+        start = stage_done('constraints', start, constraints=len(all_bonds))
+
     # ------------------------------------------------------------------------
     # SELECT ALL LOADED OBJECTS
     
@@ -1194,64 +743,198 @@ def import_molecule(
     
     bpy.ops.object.select_all(action='DESELECT')
     obj = None
-    for obj in STRUCTURE:
+    for obj in molecule.element_objects:
         obj.select = True
     # activate the last selected object (perhaps another should be active?)
     if obj:
         bpy.context.scene.objects.active = obj
+    
+    return molecule
 
 
 
-def build_frames(frame_delta, frame_skip=1, frame_list=[], interpolation='BEZIER'):
-    if DEBUG: print("Build frames.")
+def select_frames(structure, frame_skip=1, frame_list=[]):
+    '''
+    The indices of the frames to animate. frame_list holds frame numbers
+    (starting at 1), without a list every frame_skip-th frame is used.
+    '''
+    if frame_list:
+        return [j - 1 for j in frame_list if 0 < j <= len(structure.frames)]
+    return range(0, len(structure.frames), max(frame_skip, 1))
 
-    scn = bpy.context.scene
 
-    # Introduce the basis for all elements that appear in the structure.     
-    for element_ob in STRUCTURE:
-     
-        bpy.ops.object.select_all(action='DESELECT')   
-        bpy.context.scene.objects.active = element_ob
-        element_ob.select = True
-        bpy.ops.object.shape_key_add(True)
+def track_bonds(molecule, frame_indices, workers=1):
+    '''
+    Recompute the bonds in each of the frames (single mesh bond mode). The
+    bonds are followed from frame to frame by core.bonds.iter_bond_changes,
+    then the bond meshes are rebuilt with all bonds that appear in any frame.
+    Returns the number of bonds and for each frame the change set (formed,
+    broken): the indices of the bonds, which appear and disappear in this
+    frame (see BondMeshProp.bonds).
+    '''
+    start = time.perf_counter()
+    
+    structure = molecule.structure
+    number_atoms = len(structure)
+    short_names = structure.short_names()
+    element = structure.elements
+    
+    # The bonds are computed in the unscaled frames, where the bond criteria
+    # hold.
+    def unscaled_frames():
+        for j, frame in parallel.iter_frames(structure.frames, frame_indices,
+                                             workers):
+            if j == 0:
+                frame = structure.coords
+            yield j, frame / structure.frames.scale
+    changes = [(formed, broken) for j, formed, broken
+               in iter_bond_changes(short_names, unscaled_frames())]
+    
+    # all bonds of the trajectory, sorted by key
+    all_bonds = numpy.unique(numpy.concatenate(
+                    [formed for formed, broken in changes]
+                    + [numpy.empty(0, dtype=numpy.int64)]))
+    changes = [(numpy.searchsorted(all_bonds, formed),
+                numpy.searchsorted(all_bonds, broken))
+               for formed, broken in changes]
+    present = numpy.zeros(len(all_bonds), dtype=bool)
+    if changes:
+        present[changes[0][0]] = True
     
-    # old version used different definition
-    #frame_skip += 1
+    # Replace the bond meshes. Every bond is cut into the half bonds from
+    # both of its atoms; they go into the meshes of the elements of the atoms.
+    old_meshes = molecule.bond_meshes
+    location = old_meshes[0].object.location.copy() if old_meshes else \
+               molecule.element_objects[0].location.copy()
+    radius = old_meshes[0].radius if old_meshes else 0.0
+    sectors = old_meshes[0].sectors if old_meshes else 8
+    for bond_mesh in old_meshes:
+        ob = bond_mesh.object
+        mesh = ob.data
+        bpy.context.scene.objects.unlink(ob)
+        bpy.data.objects.remove(ob)
+        bpy.data.meshes.remove(mesh)
+    molecule.bond_meshes = []
+    
+    pairs = split_keys(all_bonds, number_atoms)
+    bond_indices = numpy.arange(len(all_bonds))
+    for k, atom in enumerate(structure.groups):
+        first = element[pairs[:, 0]] == k
+        second = element[pairs[:, 1]] == k
+        if not (first.any() or second.any()):
+            continue
+        bond_mesh = add_bond_mesh(
+                        atom.long_name, structure.coords,
+                        numpy.concatenate((pairs[first, 0], pairs[second, 1])),
+                        numpy.concatenate((pairs[first, 1], pairs[second, 0])),
+                        radius, sectors, molecule.bond_materials[k], location,
+                        numpy.concatenate((bond_indices[first],
+                                           bond_indices[second])))
+        # the basis shows the bonds of the first frame
+        vertices = bond_mesh.vertices(structure.coords, present)
+        bond_mesh.object.data.vertices.foreach_set("co",
+                            vertices.astype(numpy.float32).ravel())
+        molecule.bond_meshes.append(bond_mesh)
+    
+    stage_done('frame_bonds', start, bonds=len(all_bonds),
+               frames=len(changes))
+    return len(all_bonds), changes
 
-    # Introduce the keys and reference the atom positions for each key.     
-    i = 0
-    if not frame_list:
-        for j, frame in enumerate(ALL_FRAMES):
-            
-            if j % frame_skip == 0:
-            
-                for elements_frame, elements_structure in zip(frame,STRUCTURE):
-                
-                    key = elements_structure.shape_key_add()
-        
-                    for atom_frame, atom_structure in zip(elements_frame, key.data):
-        
-                        atom_structure.co = (atom_frame.location 
-                                        - elements_structure.location)
-        
-                    key.name = atom_frame.name + "_frame_" + str(i) 
 
-                i += 1
-    else:
-        for j in frame_list:
-            frame = ALL_FRAMES[j]
-            for elements_frame, elements_structure in zip(frame,STRUCTURE):
-                
-                key = elements_structure.shape_key_add()
-    
-                for atom_frame, atom_structure in zip(elements_frame, key.data):
+def apply_bond_changes(present, change):
+    '''Update the bonds that are 'present' with a change set of track_bonds.'''
+    formed, broken = change
+    present[formed] = True
+    present[broken] = False
+
+
+# The interpolation modes of keyframes, as they are written by foreach_set.
+INTERPOLATION_MODES = {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2}
+
+
+def animate_shape_keys(shape_keys, key_blocks, frame_delta, interpolation):
+    '''
+    Key k of key_blocks (one per frame) gets the value 1.0 at scene frame
+    k*frame_delta and 0.0 at the frames of the keys before and after it. The
+    fcurves are filled in bulk instead of by keyframe_insert.
+    '''
+    if shape_keys.animation_data is None:
+        shape_keys.animation_data_create()
+    action = bpy.data.actions.new(shape_keys.name + "Action")
+    shape_keys.animation_data.action = action
     
-                    atom_structure.co = (atom_frame.location 
-                                    - elements_structure.location)
+    number_keys = len(key_blocks)
+    mode = INTERPOLATION_MODES[interpolation]
+    for k, key in enumerate(key_blocks):
+        neighbours = numpy.arange(max(k - 1, 0), min(k + 2, number_keys))
+        co = numpy.empty((len(neighbours), 2), dtype=numpy.float32)
+        co[:, 0] = neighbours * frame_delta
+        co[:, 1] = neighbours == k
+        
+        fcurve = action.fcurves.new(key.path_from_id("value"))
+        fcurve.keyframe_points.add(len(co))
+        fcurve.keyframe_points.foreach_set("co", co.ravel())
+        fcurve.keyframe_points.foreach_set("interpolation",
+                                           [mode] * len(co))
+        # sort the points and compute the handles
+        fcurve.update()
+
+
+def build_frames(molecule, frame_delta, frame_skip=1, frame_list=[],
+                 interpolation='BEZIER', workers=1, bond_frames=False):
+    '''
+    Animate the molecule (a MoleculeProp, as returned by import_molecule) with
+    one shape key per frame. With 'bond_frames' the bonds of the single mesh
+    bond mode are recomputed in each frame, bonds that do not exist in a
+    frame are shrunk to radius 0.
+    '''
+    frame_indices = select_frames(molecule.structure, frame_skip, frame_list)
+    changes = None
+    if bond_frames and molecule.bond_materials:
+        number_bonds, changes = track_bonds(molecule, frame_indices, workers)
+        present = numpy.zeros(number_bonds, dtype=bool)
+    start = time.perf_counter()
+
+    scn = bpy.context.scene
     
-                key.name = atom_frame.name + "_frame_" + str(i) 
+    # the bond meshes (single mesh bond mode) are animated just like the atoms
+    structure = molecule.structure
+    element_objects = molecule.element_objects
+    bond_meshes = molecule.bond_meshes
+    animated = element_objects + [bond_mesh.object for bond_mesh in bond_meshes]
+
+    # Introduce the basis for all elements that appear in the structure.     
+    for element_ob in animated:
+        element_ob.shape_key_add(name="Basis", from_mix=False)
 
-            i += 1
+    # Introduce the keys and reference the atom positions for each key.     
+    # Only the frames that are used are decoded, by 'workers' processes. The
+    # coordinates of a key are written in one foreach_set call.
+    i = 0
+    for j, frame in parallel.iter_frames(structure.frames, frame_indices,
+                                         workers):
+        if j == 0:
+            frame = structure.coords
+        for element_ob, atom_indices in zip(element_objects, structure.indices):
+            key = element_ob.shape_key_add(
+                        name=element_ob.name + "_frame_" + str(i),
+                        from_mix=False)
+            coords = frame[atom_indices] - numpy.array(element_ob.location)
+            key.data.foreach_set("co", coords.astype(numpy.float32).ravel())
+        
+        if changes is None:
+            present = None
+        else:
+            apply_bond_changes(present, changes[i])
+        for bond_mesh in bond_meshes:
+            bonds_ob = bond_mesh.object
+            key = bonds_ob.shape_key_add(
+                        name=bonds_ob.name + "_frame_" + str(i),
+                        from_mix=False)
+            coords = bond_mesh.vertices(frame, present)
+            key.data.foreach_set("co", coords.astype(numpy.float32).ravel())
+
+        i += 1
         
     num_frames = i
         
@@ -1259,40 +942,106 @@ def build_frames(frame_delta, frame_skip=1, frame_list=[], interpolation='BEZIER
     scn.frame_end = frame_delta * num_frames
 
     # Manage the values of the keys
-    for element in STRUCTURE:
-        
-        scn.frame_current = 0 
-        
-        element.data.shape_keys.key_blocks[1].value = 1.0
-        element.data.shape_keys.key_blocks[2].value = 0.0
-        element.data.shape_keys.key_blocks[1].keyframe_insert("value")
-        element.data.shape_keys.key_blocks[2].keyframe_insert("value")
-        
-        scn.frame_current += frame_delta
+    for element in animated:
+        shape_keys = element.data.shape_keys
+        # the basis is not animated
+        animate_shape_keys(shape_keys, shape_keys.key_blocks[1:], frame_delta,
+                           interpolation)
+    
+    stage_done('frames', start, frames=num_frames,
+               keys=num_frames * len(animated))
+
+
 
-        number = 0
+def build_mesh_cache(molecule, frame_delta, frame_skip=1, frame_list=[],
+                     interpolation='BEZIER', workers=1, cache_dir='',
+                     bond_frames=False):
+    '''
+    Animate the molecule with Mesh Cache modifiers instead of shape keys. The
+    frames are written into one PC2 file per object, in 'cache_dir' (by
+    default a directory next to the imported file), frame by frame. The .blend
+    file and the memory stay the same size for any number of frames.
+    'bond_frames' is the same as in build_frames.
+    '''
+    frame_indices = select_frames(molecule.structure, frame_skip, frame_list)
+    changes = None
+    present = None
+    if bond_frames and molecule.bond_materials:
+        number_bonds, changes = track_bonds(molecule, frame_indices, workers)
+        present = numpy.zeros(number_bonds, dtype=bool)
+    start = time.perf_counter()
     
-        for number in range(num_frames)[2:]:#-1]:
+    structure = molecule.structure
+    if not cache_dir:
+        stem = os.path.splitext(structure.frames.filepath)[0]
+        cache_dir = stem + "_cache"
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
     
-            element.data.shape_keys.key_blocks[number-1].value = 0.0
-            element.data.shape_keys.key_blocks[number].value = 1.0
-            element.data.shape_keys.key_blocks[number+1].value = 0.0
-            element.data.shape_keys.key_blocks[number-1].keyframe_insert("value")     
-            element.data.shape_keys.key_blocks[number].keyframe_insert("value")     
-            element.data.shape_keys.key_blocks[number+1].keyframe_insert("value")         
-                
-            scn.frame_current += frame_delta
-            
-        number += 1    
-            
-        element.data.shape_keys.key_blocks[number].value = 1.0
-        element.data.shape_keys.key_blocks[number-1].value = 0.0
-        element.data.shape_keys.key_blocks[number].keyframe_insert("value")     
-        element.data.shape_keys.key_blocks[number-1].keyframe_insert("value")    
+    number_frames = len(frame_indices)
+    
+    # one cache per object: the element objects and the bond meshes
+    writers = []
+    for element_ob, atom_indices in zip(molecule.element_objects,
+                                        structure.indices):
+        writers.append((element_ob, atom_indices, None))
+    for bond_mesh in molecule.bond_meshes:
+        writers.append((bond_mesh.object, None, bond_mesh))
+    caches = []
+    try:
+        for ob, atom_indices, bond_mesh in writers:
+            filepath = os.path.join(cache_dir, bpy.path.clean_name(ob.name) + ".pc2")
+            if bond_mesh is None:
+                number_points = len(atom_indices)
+            else:
+                number_points = len(bond_mesh.starts) * 2 * bond_mesh.sectors
+            caches.append(pc2.PC2Writer(filepath, number_points, number_frames))
         
-        for f in element.data.shape_keys.animation_data.action.fcurves:
-            for kf in f.keyframe_points:
-                kf.interpolation = interpolation
+        # Only the frames that are used are decoded, by 'workers' processes.
+        for i, (j, frame) in enumerate(parallel.iter_frames(
+                            structure.frames, frame_indices, workers)):
+            if j == 0:
+                frame = structure.coords
+            if changes is not None:
+                apply_bond_changes(present, changes[i])
+            for (ob, atom_indices, bond_mesh), cache in zip(writers, caches):
+                if bond_mesh is None:
+                    coords = frame[atom_indices] - numpy.array(ob.location)
+                else:
+                    coords = bond_mesh.vertices(frame, present)
+                cache.write(coords)
+    finally:
+        for cache in caches:
+            cache.close()
+    
+    # Frame k of the cache is shown at scene frame k*frame_delta. A modifier
+    # belongs to an object, not to the shared mesh: the _bonds twin of an
+    # element object reads the same cache, so that the bonds parented to its
+    # vertices move with the atoms.
+    twins = molecule.twin_objects or [None] * len(molecule.element_objects)
+    twins = twins + [None] * len(molecule.bond_meshes)
+    for (ob, atom_indices, bond_mesh), cache, twin in zip(writers, caches,
+                                                          twins):
+        for target in (ob, twin):
+            if target is None:
+                continue
+            modifier = target.modifiers.new("Trajectory", 'MESH_CACHE')
+            modifier.cache_format = 'PC2'
+            modifier.filepath = cache.filepath
+            modifier.play_mode = 'SCENE'
+            modifier.time_mode = 'FRAME'
+            modifier.frame_start = 0.0
+            modifier.frame_scale = 1.0 / frame_delta
+            if interpolation == 'CONSTANT':
+                modifier.interpolation = 'NONE'
+            else:
+                modifier.interpolation = 'LINEAR'
+    
+    scn = bpy.context.scene
+    scn.frame_start = 0
+    scn.frame_end = frame_delta * number_frames
+    
+    stage_done('frames', start, frames=number_frames, caches=len(caches))
 
 
     
@@ -1300,4 +1049,4 @@ def build_frames(frame_delta, frame_skip=1, frame_list=[], interpolation='BEZIER
 # make cylinder with length 0.5 and move negative side in edit mode to origin.
 # Put object center -0.5 along y-axis:  o    |||||
 # put object center on atom1 and add constraint "Stretch To" to atom2.
-# Repeat for atom2 and atom1
\ No newline at end of file
+# Repeat for atom2 and atom1